@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic ERPNext-shaped dataset for the dashboard benchmarks
+
+Only the tables and columns the dashboard queries read are created. The data is
+generated from a fixed seed relative to an anchor date, so the same scale always
+produces the same rows and the same metric values.
+"""
+
+import random
+from datetime import timedelta
+
+# يتغير مع تغير الجداول فتُبنى البيانات المخزنة في .data من جديد
+VERSION = 2
+
+# عدد السنوات قبل تاريخ المقياس (التحليلات المتقدمة تقارن 5 سنوات)
+YEARS = 5
+CHUNK_SIZE = 50000
+
+COMPANIES = ["Benchmark Co A", "Benchmark Co B"]
+COST_CENTERS_PER_COMPANY = 4
+PROJECTS = ["PROJ-0001", "PROJ-0002", "PROJ-0003", "PROJ-0004", "PROJ-0005"]
+WAREHOUSES_PER_COMPANY = 4
+ITEM_GROUPS = ["Raw Material", "Products", "Consumable", "Services"]
+
+# الحسابات لكل شركة: (الاسم، root_type، account_type، العدد)
+ACCOUNTS = [
+    ("Cash", "Asset", "Cash", 2),
+    ("Bank", "Asset", "Bank", 2),
+    ("Debtors", "Asset", "Receivable", 1),
+    ("Stock In Hand", "Asset", "Stock", 1),
+    ("Creditors", "Liability", "Payable", 1),
+    ("Capital", "Equity", "", 1),
+    ("Sales", "Income", "Income Account", 3),
+    ("Expenses", "Expense", "Expense Account", 6),
+]
+
+# أنواع القيود: (حساب المدين، حساب الدائن، نطاق المبلغ)
+GL_PATTERNS = [
+    ("Debtors", "Sales", (500, 50000)),
+    ("Cash", "Debtors", (500, 40000)),
+    ("Bank", "Debtors", (500, 40000)),
+    ("Expenses", "Cash", (100, 15000)),
+    ("Expenses", "Bank", (100, 15000)),
+    ("Stock In Hand", "Creditors", (1000, 60000)),
+    ("Creditors", "Bank", (1000, 50000)),
+]
+
+STOCK_VOUCHERS = ["Purchase Receipt", "Sales Invoice", "Delivery Note", "Stock Entry"]
+
+SCHEMA = {
+    "Company": "name TEXT PRIMARY KEY",
+    "Account": """name TEXT PRIMARY KEY, company TEXT, root_type TEXT, account_type TEXT,
+        is_group INTEGER""",
+    "Warehouse": "name TEXT PRIMARY KEY, company TEXT",
+    "GL Entry": """name TEXT PRIMARY KEY, company TEXT, account TEXT, posting_date TEXT,
+        debit REAL, credit REAL, is_cancelled INTEGER, cost_center TEXT, project TEXT,
+        voucher_type TEXT""",
+    "Sales Invoice": """name TEXT PRIMARY KEY, company TEXT, customer TEXT, customer_name TEXT,
+        posting_date TEXT, due_date TEXT, grand_total REAL, outstanding_amount REAL,
+        docstatus INTEGER, cost_center TEXT, project TEXT""",
+    "Payment Ledger Entry": """name TEXT PRIMARY KEY, company TEXT, posting_date TEXT,
+        against_voucher_type TEXT, against_voucher_no TEXT, amount_in_account_currency REAL,
+        delinked INTEGER""",
+    "Item": """name TEXT PRIMARY KEY, item_code TEXT, item_name TEXT, item_group TEXT,
+        stock_uom TEXT, disabled INTEGER""",
+    "Item Price": """name TEXT PRIMARY KEY, item_code TEXT, price_list TEXT, price_list_rate REAL,
+        customer TEXT, valid_from TEXT""",
+    "Bin": """name TEXT PRIMARY KEY, item_code TEXT, warehouse TEXT, actual_qty REAL,
+        reorder_level REAL, stock_value REAL""",
+    "Stock Ledger Entry": """name TEXT PRIMARY KEY, company TEXT, project TEXT, item_code TEXT,
+        warehouse TEXT, posting_date TEXT, posting_time TEXT, creation TEXT, actual_qty REAL,
+        stock_value REAL, stock_value_difference REAL, voucher_type TEXT, is_cancelled INTEGER""",
+    "Stock Entry": "name TEXT PRIMARY KEY, company TEXT, project TEXT, posting_date TEXT, docstatus INTEGER",
+    "Quotation": "name TEXT PRIMARY KEY, company TEXT, docstatus INTEGER",
+    "Sales Order": "name TEXT PRIMARY KEY, company TEXT, docstatus INTEGER",
+}
+
+# فهارس ERPNext القياسية التي تعتمد عليها الاستعلامات (فهارس التطبيق تُنشأ من indexes.py)
+STANDARD_INDEXES = [
+    ("GL Entry", ["account"]),
+    ("GL Entry", ["posting_date"]),
+    ("Sales Invoice", ["posting_date"]),
+    ("Payment Ledger Entry", ["against_voucher_no"]),
+    ("Item", ["item_name"]),
+    ("Item Price", ["item_code", "price_list"]),
+    ("Bin", ["item_code", "warehouse"]),
+    ("Stock Ledger Entry", ["item_code", "warehouse", "posting_date"]),
+    ("Warehouse", ["company"]),
+]
+
+
+def get_row_counts(scale):
+    """عدد الصفوف لكل جدول: scale هو عدد قيود دفتر الأستاذ"""
+    items = max(200, scale // 500)
+    return {
+        "gl_entries": scale,
+        "sales_invoices": max(scale // 5, 1),
+        "stock_ledger_entries": max(scale // 2, 1),
+        "stock_entries": max(scale // 50, 1),
+        "quotations": max(scale // 20, 1),
+        "sales_orders": max(scale // 30, 1),
+        "items": items,
+        "customers": max(100, scale // 200),
+    }
+
+
+def build(db, scale, today, seed=42):
+    """إنشاء الجداول وتعبئتها في قاعدة frappe_shim.Database"""
+    rng = random.Random(seed)
+    counts = get_row_counts(scale)
+    start = today - timedelta(days=365 * YEARS)
+    days = (today - start).days
+
+    for doctype, columns in SCHEMA.items():
+        db.conn.execute(f"CREATE TABLE `tab{doctype}` ({columns})")
+
+    insert(db, "Company", ((company,) for company in COMPANIES))
+
+    accounts = {}
+    account_rows = []
+    for company in COMPANIES:
+        suffix = company[-1]
+        for group in ("Application of Funds", "Income", "Expenses"):
+            account_rows.append((f"{group} (Group) - {suffix}", company, "", "", 1))
+        for name, root_type, account_type, count in ACCOUNTS:
+            for i in range(count):
+                account = f"{name} {i + 1} - {suffix}"
+                accounts.setdefault((company, name), []).append(account)
+                account_rows.append((account, company, root_type, account_type, 0))
+    insert(db, "Account", account_rows)
+
+    warehouses = {
+        company: [f"Store {i + 1} - {company[-1]}" for i in range(WAREHOUSES_PER_COMPANY)]
+        for company in COMPANIES
+    }
+    insert(db, "Warehouse", ((w, company) for company in COMPANIES for w in warehouses[company]))
+    cost_centers = {
+        company: [f"CC {i + 1} - {company[-1]}" for i in range(COST_CENTERS_PER_COMPANY)]
+        for company in COMPANIES
+    }
+
+    def random_date():
+        return start + timedelta(days=rng.randrange(days + 1))
+
+    def random_project():
+        return rng.choice(PROJECTS) if rng.random() < 0.4 else None
+
+    def gl_entries():
+        # قيود متوازنة: سطر مدين وسطر دائن لكل مستند
+        for voucher in range(counts["gl_entries"] // 2 + counts["gl_entries"] % 2):
+            company = rng.choice(COMPANIES)
+            debit_group, credit_group, amount_range = rng.choice(GL_PATTERNS)
+            amount = round(rng.uniform(*amount_range), 2)
+            posting_date = random_date().isoformat()
+            cancelled = 1 if rng.random() < 0.02 else 0
+            cost_center = rng.choice(cost_centers[company])
+            project = random_project()
+            for line, (group, debit, credit) in enumerate((
+                (debit_group, amount, 0), (credit_group, 0, amount)
+            )):
+                if voucher * 2 + line >= counts["gl_entries"]:
+                    break
+                yield (f"GLE-{voucher:09d}-{line}", company, rng.choice(accounts[(company, group)]),
+                       posting_date, debit, credit, cancelled, cost_center, project, "Journal Entry")
+    insert(db, "GL Entry", gl_entries())
+
+    def sales_invoices():
+        for i in range(counts["sales_invoices"]):
+            company = rng.choice(COMPANIES)
+            posting_date = random_date()
+            grand_total = round(rng.uniform(100, 50000), 2)
+            paid = rng.random()
+            outstanding = 0 if paid < 0.7 else round(grand_total * rng.uniform(0.1, 1), 2)
+            customer = f"CUST-{rng.randrange(counts['customers']):05d}"
+            docstatus = rng.choices((1, 0, 2), weights=(90, 5, 5))[0]
+            yield (f"SINV-{i:09d}", company, customer, f"Customer {customer[5:]}",
+                   posting_date.isoformat(), (posting_date + timedelta(days=30)).isoformat(),
+                   grand_total, outstanding, docstatus, rng.choice(cost_centers[company]), random_project())
+    insert(db, "Sales Invoice", sales_invoices())
+
+    # سطر الفاتورة وسطر الدفعة بعد 20 يوماً (لا يتجاوز تاريخ المقياس)، فمجموعها اليوم = outstanding_amount
+    db.conn.execute("""
+        INSERT INTO `tabPayment Ledger Entry`
+        SELECT name || '-PLE', company, posting_date, 'Sales Invoice', name, grand_total, docstatus = 2
+        FROM `tabSales Invoice` WHERE docstatus > 0
+        UNION ALL
+        SELECT name || '-PAY', company, MIN(date(posting_date, '+20 days'), ?), 'Sales Invoice', name,
+            outstanding_amount - grand_total, docstatus = 2
+        FROM `tabSales Invoice` WHERE docstatus > 0 AND outstanding_amount < grand_total
+    """, (today.isoformat(),))
+
+    items = [f"ITEM-{i:06d}" for i in range(counts["items"])]
+    rates = {item: round(rng.uniform(5, 500), 2) for item in items}
+    insert(db, "Item", (
+        (item, item, f"Item {item[5:]}", rng.choice(ITEM_GROUPS), "Nos", 1 if rng.random() < 0.03 else 0)
+        for item in items
+    ))
+    insert(db, "Item Price", (
+        (f"PRICE-{item}", item, "Standard Selling", round(rates[item] * 1.3, 2), None, start.isoformat())
+        for item in items
+    ))
+
+    def bins():
+        all_warehouses = [w for company in COMPANIES for w in warehouses[company]]
+        for item in items:
+            for warehouse in rng.sample(all_warehouses, rng.randint(1, 4)):
+                qty = rng.randint(0, 500)
+                reorder_level = rng.choice((0, 0, 20, 50, 100))
+                yield (f"BIN-{item}-{warehouse}", item, warehouse, qty, reorder_level, round(qty * rates[item], 2))
+    insert(db, "Bin", bins())
+
+    def stock_ledger_entries():
+        for i in range(counts["stock_ledger_entries"]):
+            company = rng.choice(COMPANIES)
+            item = rng.choice(items)
+            voucher_type = rng.choice(STOCK_VOUCHERS)
+            qty = rng.randint(1, 50) * (1 if voucher_type == "Purchase Receipt" else -1)
+            posting_date = random_date().isoformat()
+            posting_time = f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+            yield (f"SLE-{i:09d}", company, random_project(), item, rng.choice(warehouses[company]),
+                   posting_date, posting_time, f"{posting_date} {posting_time}", qty,
+                   round(rng.uniform(0, 200) * rates[item], 2), round(qty * rates[item], 2),
+                   voucher_type, 1 if rng.random() < 0.02 else 0)
+    insert(db, "Stock Ledger Entry", stock_ledger_entries())
+
+    insert(db, "Stock Entry", (
+        (f"STE-{i:09d}", company, random_project(), random_date().isoformat(), rng.choice((0, 1, 1, 1)))
+        for i, company in ((i, rng.choice(COMPANIES)) for i in range(counts["stock_entries"]))
+    ))
+    insert(db, "Quotation", (
+        (f"QTN-{i:09d}", rng.choice(COMPANIES), rng.choice((0, 1, 1, 2))) for i in range(counts["quotations"])
+    ))
+    insert(db, "Sales Order", (
+        (f"SO-{i:09d}", rng.choice(COMPANIES), rng.choice((0, 1, 1, 2))) for i in range(counts["sales_orders"])
+    ))
+
+    for doctype, fields in STANDARD_INDEXES:
+        db.add_index(doctype, fields)
+    db.conn.commit()
+    db.conn.execute("ANALYZE")
+    return counts
+
+
+def insert(db, doctype, rows):
+    """إدراج الصفوف على دفعات حتى لا تُحمل كلها في الذاكرة"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            _insert_chunk(db, doctype, chunk)
+            chunk = []
+    if chunk:
+        _insert_chunk(db, doctype, chunk)
+
+
+def _insert_chunk(db, doctype, rows):
+    placeholders = ", ".join("?" * len(rows[0]))
+    db.conn.executemany(f"INSERT INTO `tab{doctype}` VALUES ({placeholders})", rows)
@@ -0,0 +1,499 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal stand-in for the parts of frappe used by the dashboard modules
+
+Installs `frappe` and `frappe.utils` modules backed by SQLite and an in-process
+key-value store, so api.py can run without a bench, a site or Redis.
+Only what the app actually calls is implemented; MariaDB-only SQL functions
+used by the dashboard queries are registered as SQLite functions.
+"""
+
+import re
+import sys
+import json
+import time
+import types
+import logging
+import secrets
+import sqlite3
+import calendar
+import fnmatch
+from datetime import date, datetime, timedelta
+
+
+class _dict(dict):
+    """frappe._dict: dict مع الوصول للمفاتيح كخصائص"""
+
+    def __getattr__(self, key):
+        return self.get(key)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def __getstate__(self):
+        return self
+
+    def __setstate__(self, state):
+        self.update(state)
+
+
+class ValidationError(Exception):
+    pass
+
+
+# ===== frappe.utils =====
+
+def flt(value, precision=None):
+    try:
+        value = float(value or 0)
+    except (TypeError, ValueError):
+        value = 0.0
+    return round(value, precision) if precision is not None else value
+
+
+def cint(value):
+    try:
+        return int(float(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def getdate(value=None):
+    if value is None or value == "":
+        return date.fromisoformat(nowdate())
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def nowdate():
+    """التاريخ المثبت من المقياس (حتى تكون النتائج قابلة للمقارنة) أو تاريخ اليوم"""
+    return getattr(local, "today", None) or date.today().isoformat()
+
+
+def add_days(value, days):
+    return getdate(value) + timedelta(days=days)
+
+
+def add_months(value, months):
+    value = getdate(value)
+    month_index = value.year * 12 + value.month - 1 + months
+    year, month = divmod(month_index, 12)
+    day = min(value.day, calendar.monthrange(year, month + 1)[1])
+    return date(year, month + 1, day)
+
+
+def get_first_day(value, d_years=0, d_months=0):
+    value = add_months(getdate(value), d_years * 12 + d_months)
+    return value.replace(day=1)
+
+
+def get_last_day(value):
+    value = getdate(value)
+    return value.replace(day=calendar.monthrange(value.year, value.month)[1])
+
+
+def get_quarter_start(value):
+    value = getdate(value)
+    return date(value.year, (value.month - 1) // 3 * 3 + 1, 1)
+
+
+def date_diff(to_date, from_date):
+    return (getdate(to_date) - getdate(from_date)).days
+
+
+# ===== SQLite database =====
+
+def _year(value):
+    return int(str(value)[:4]) if value else None
+
+
+def _month(value):
+    return int(str(value)[5:7]) if value else None
+
+
+def _yearweek(value, mode=3):
+    if not value:
+        return None
+    iso = getdate(value).isocalendar()
+    return iso[0] * 100 + iso[1]
+
+
+def _curdate():
+    return nowdate()
+
+
+def _to_sqlite(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+PARAM_PATTERN = re.compile(r"%\((\w+)\)s")
+
+
+class AfterCommit(list):
+    def add(self, fn):
+        self.append(fn)
+
+
+class Database(object):
+    """frappe.db فوق SQLite مع عداد للاستعلامات والصفوف المرجعة"""
+
+    db_type = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.create_function("YEAR", 1, _year, deterministic=True)
+        self.conn.create_function("MONTH", 1, _month, deterministic=True)
+        self.conn.create_function("YEARWEEK", 2, _yearweek, deterministic=True)
+        self.conn.create_function("CURDATE", 0, _curdate)
+        self.defaults = {}
+        self.after_commit = AfterCommit()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.queries = 0
+        self.rows = 0
+
+    def sql(self, query, values=(), as_dict=False, **kwargs):
+        query, params = self.translate(query, values)
+        cursor = self.conn.execute(query, params)
+        rows = cursor.fetchall()
+        self.queries += 1
+        self.rows += len(rows)
+        if as_dict and cursor.description:
+            columns = [column[0] for column in cursor.description]
+            return [_dict(zip(columns, row)) for row in rows]
+        return tuple(rows)
+
+    def translate(self, query, values):
+        """%(name)s -> :name، والقوائم تُوسع إلى (:name_0, :name_1, ...) كما يفعل pymysql"""
+        if not values:
+            return query, ()
+        if isinstance(values, (list, tuple)):
+            return query.replace("%%", "%").replace("%s", "?"), [_to_sqlite(v) for v in values]
+
+        params = {}
+
+        def replace(match):
+            name = match.group(1)
+            value = values[name]
+            if isinstance(value, (list, tuple, set)):
+                names = []
+                for i, item in enumerate(value):
+                    params[f"{name}_{i}"] = _to_sqlite(item)
+                    names.append(f":{name}_{i}")
+                return "({0})".format(", ".join(names) or "NULL")
+            params[name] = _to_sqlite(value)
+            return f":{name}"
+
+        query = PARAM_PATTERN.sub(replace, query).replace("%%", "%")
+        return query, params
+
+    def commit(self):
+        self.conn.commit()
+        callbacks, self.after_commit[:] = list(self.after_commit), []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self.conn.rollback()
+        self.after_commit[:] = []
+
+    def add_index(self, doctype, fields, index_name=None):
+        index_name = index_name or "_".join(fields)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS `{0}` ON `tab{1}` ({2})".format(
+            f"{doctype}_{index_name}".replace(" ", "_"), doctype, ", ".join(f"`{f}`" for f in fields)
+        ))
+
+    def has_index(self, table_name, index_name):
+        return bool(self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+            (f"{table_name[3:]}_{index_name}".replace(" ", "_"),)
+        ).fetchone())
+
+    def sql_ddl(self, query):
+        """ALTER TABLE `tabX` DROP INDEX `name` فقط (صيغة MariaDB) -> DROP INDEX في SQLite"""
+        match = re.match(r"\s*ALTER TABLE `tab(.+?)` DROP INDEX `(.+?)`", query)
+        self.conn.execute("DROP INDEX IF EXISTS `{0}`".format(
+            f"{match.group(1)}_{match.group(2)}".replace(" ", "_")
+        ))
+
+    def get_default(self, key):
+        return self.defaults.get(key)
+
+    def set_default(self, key, value):
+        self.defaults[key] = value
+
+    def get_single_value(self, doctype, field):
+        return None
+
+    def get_value(self, doctype, filters, fields, as_dict=False):
+        fields = [fields] if isinstance(fields, str) else list(fields)
+        rows = get_all(doctype, filters=filters if isinstance(filters, dict) else {"name": filters},
+                       fields=fields, limit=1)
+        if not rows:
+            return None
+        if as_dict:
+            return rows[0]
+        return rows[0][fields[0]] if len(fields) == 1 else tuple(rows[0][f] for f in fields)
+
+    def exists(self, doctype, name):
+        return self.get_value(doctype, name, "name")
+
+
+def get_all(doctype, filters=None, fields=None, pluck=None, limit=None):
+    fields = [pluck] if pluck else (fields or ["name"])
+    filters = filters or {}
+    conditions = " AND ".join(f"`{field}` = %({field})s" for field in filters) or "1 = 1"
+    rows = db.sql("SELECT {fields} FROM `tab{doctype}` WHERE {conditions}{limit}".format(
+        fields=", ".join(f"`{field}`" for field in fields),
+        doctype=doctype,
+        conditions=conditions,
+        limit=f" LIMIT {int(limit)}" if limit else ""
+    ), filters, as_dict=True)
+    return [row[pluck] for row in rows] if pluck else rows
+
+
+# ===== Redis stand-in =====
+
+class Cache(object):
+    """مخزن مفاتيح داخل العملية بنفس واجهة RedisWrapper المستخدمة في التطبيق"""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    def make_key(self, key):
+        return f"{local.site}|{key}"
+
+    def _get(self, key):
+        if key in self.expiry and self.expiry[key] < time.time():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return self.data.get(key)
+
+    def flushall(self):
+        self.data.clear()
+        self.expiry.clear()
+
+    # مفاتيح تمر عبر make_key
+    def get_value(self, key):
+        return self._get(self.make_key(key))
+
+    def set_value(self, key, value, expires_in_sec=None):
+        self.set(self.make_key(key), value, ex=expires_in_sec)
+
+    def delete_value(self, keys):
+        keys = [keys] if isinstance(keys, str) else keys
+        self.delete(*(self.make_key(key) for key in keys))
+
+    def delete_keys(self, prefix):
+        pattern = self.make_key(prefix) + "*"
+        self.delete(*[key for key in list(self.data) if fnmatch.fnmatchcase(key, pattern)])
+
+    def get_keys(self, key):
+        pattern = self.make_key(key) + "*"
+        return [name for name in list(self.data) if fnmatch.fnmatchcase(name, pattern)]
+
+    def exists(self, *names):
+        # RedisWrapper.exists في v15 تمرر الأسماء عبر make_key
+        return sum(self._get(self.make_key(name)) is not None for name in names)
+
+    def hset(self, name, key, value):
+        self.data.setdefault(self.make_key(name), {})[key] = value
+
+    def hget(self, name, key):
+        return (self._get(self.make_key(name)) or {}).get(key)
+
+    def hgetall(self, name):
+        return dict(self._get(self.make_key(name)) or {})
+
+    def hdel(self, name, key):
+        (self._get(self.make_key(name)) or {}).pop(key, None)
+
+    # مفاتيح خام (بعد make_key)
+    def get(self, key):
+        return self._get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and self._get(key) is not None:
+            return False
+        self.data[key] = value
+        if ex:
+            self.expiry[key] = time.time() + ex
+        else:
+            self.expiry.pop(key, None)
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+
+    def rename(self, src, dst):
+        self.data[dst] = self.data.pop(src)
+        self.expiry.pop(dst, None)
+
+    def mget(self, keys):
+        return [self._get(key) for key in keys]
+
+    def incr(self, key):
+        self.data[key] = cint(self._get(key)) + 1
+        return self.data[key]
+
+    def hincrby(self, key, field, amount=1):
+        hash_ = self.data.setdefault(key, {})
+        hash_[field] = cint(hash_.get(field)) + amount
+        return hash_[field]
+
+    def hincrbyfloat(self, key, field, amount=1.0):
+        hash_ = self.data.setdefault(key, {})
+        hash_[field] = flt(hash_.get(field)) + amount
+        return hash_[field]
+
+    def hlen(self, key):
+        return len(self._get(key) or {})
+
+    def sadd(self, name, *members):
+        self.data.setdefault(self.make_key(name), set()).update(members)
+
+    def smembers(self, name):
+        return set(self._get(self.make_key(name)) or ())
+
+    def pipeline(self):
+        return Pipeline(self)
+
+
+class Pipeline(object):
+    """أوامر Redis خام (بدون make_key) تُجمع وتُنفذ في execute"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.commands = []
+
+    def sadd(self, key, *members):
+        self.commands.append(lambda: self.cache.data.setdefault(key, set()).update(members))
+
+    def hgetall(self, key):
+        self.commands.append(lambda: dict(self.cache.get(key) or {}))
+
+    def __getattr__(self, name):
+        method = getattr(self.cache, name)
+        return lambda *args, **kwargs: self.commands.append(lambda: method(*args, **kwargs))
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [command() for command in commands]
+
+
+# ===== frappe module =====
+
+local = types.SimpleNamespace(site="benchmark", today=None)
+session = _dict(user="Administrator")
+conf = _dict()
+db = None
+_cache = Cache()
+errors = []
+whitelisted = []
+
+
+def cache():
+    return _cache
+
+
+def whitelist(*args, **kwargs):
+    def register(fn):
+        whitelisted.append(fn)
+        return fn
+    # @frappe.whitelist() و @frappe.whitelist
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return register(args[0])
+    return register
+
+
+def _(text, *args, **kwargs):
+    return text
+
+
+def throw(message, exc=ValidationError, *args, **kwargs):
+    raise exc(message)
+
+
+def log_error(message=None, *args, **kwargs):
+    errors.append(str(message))
+
+
+def logger(name=None, *args, **kwargs):
+    return logging.getLogger(name or "frappe")
+
+
+def parse_json(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def as_json(obj, indent=1, *args, **kwargs):
+    return json.dumps(obj, indent=indent, sort_keys=True, default=str, ensure_ascii=False)
+
+
+def set_user(user):
+    session.user = user
+
+
+def get_roles(user=None):
+    return ["System Manager"]
+
+
+def only_for(roles, *args, **kwargs):
+    pass
+
+
+_cached_values = {}
+
+
+def get_cached_value(doctype, name, field):
+    # في الموقع الحقيقي القيمة في ذاكرة المستندات، فلا تُحسب كاستعلام في كل مرة
+    key = (doctype, name, field)
+    if key not in _cached_values:
+        _cached_values[key] = db.get_value(doctype, name, field)
+    return _cached_values[key]
+
+
+def generate_hash(txt=None, length=56):
+    return secrets.token_hex(length // 2 + 1)[:length]
+
+
+def enqueue(*args, **kwargs):
+    pass
+
+
+def publish_realtime(*args, **kwargs):
+    pass
+
+
+def install(path):
+    """تسجيل frappe و frappe.utils في sys.modules وفتح قاعدة SQLite في path"""
+    module = sys.modules[__name__]
+    module.db = Database(path)
+
+    frappe = types.ModuleType("frappe")
+    for name in ("_dict", "ValidationError", "local", "conf", "db", "cache", "whitelist", "_", "throw",
+                 "session", "set_user", "log_error", "logger", "parse_json", "as_json", "get_roles", "only_for", "get_all",
+                 "get_cached_value", "generate_hash", "enqueue", "publish_realtime"):
+        setattr(frappe, name, getattr(module, name))
+
+    utils = types.ModuleType("frappe.utils")
+    for name in ("flt", "cint", "getdate", "nowdate", "add_days", "add_months", "get_first_day",
+                 "get_last_day", "get_quarter_start", "date_diff"):
+        setattr(utils, name, getattr(module, name))
+    frappe.utils = utils
+
+    sys.modules["frappe"] = frappe
+    sys.modules["frappe.utils"] = utils
+    return frappe
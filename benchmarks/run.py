@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmarks for the dashboard API
+
+Times every whitelisted endpoint in api.py and every metric helper (functions
+taking only `filters`) against a synthetic SQLite dataset, without a bench or
+a site. Each run starts cold: the request cache and the Redis stand-in are
+cleared, so cached results never hide a slow query.
+
+    python benchmarks/run.py --scale 100000 --save-baseline
+    python benchmarks/run.py --scale 100000          # compare with the baseline
+
+The exit status is 1 when an endpoint got slower than the tolerance, runs more
+queries, returns a different result or serves fallback data.
+"""
+
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import logging
+import hashlib
+import functools
+import statistics
+from datetime import date
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+import frappe_shim  # noqa: E402
+import dataset  # noqa: E402
+
+DATA_DIR = os.path.join(BENCHMARKS_DIR, ".data")
+BASELINE_DIR = os.path.join(BENCHMARKS_DIR, "baselines")
+
+# تاريخ ثابت تُبنى حوله البيانات وتُحسب منه الفترات، فتبقى النتائج قابلة للمقارنة
+BENCHMARK_DATE = "2025-06-15"
+
+# endpoints لا تقيس أداء لوحات التحكم (الإحصائيات والتصدير في الخلفية)
+SKIPPED_ENDPOINTS = ("get_dashboard_stats", "reset_dashboard_stats", "export_dataset", "get_export_progress")
+
+# حقول تتغير مع كل تشغيل ولا تدخل في بصمة النتيجة
+VOLATILE_FIELDS = ("timestamp", "crossed_at", "filename")
+
+# أقل فرق (ملي ثانية) يُعد تراجعاً في الزمن، حتى لا يُبلغ عن ضجيج القياس للدوال السريعة
+NOISE_FLOOR_MS = 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scale", type=int, default=100000, help="عدد قيود دفتر الأستاذ (10k - 10M)")
+    parser.add_argument("--repeat", type=int, default=5, help="عدد مرات تشغيل كل دالة")
+    parser.add_argument("--company", help="تشغيل الدوال مصفاة بشركة")
+    parser.add_argument("--only", help="أسماء دوال مفصولة بفواصل")
+    parser.add_argument("--baseline", help="ملف الأساس (افتراضياً baselines/scale-<scale>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="حفظ النتائج كأساس جديد")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="نسبة الإبطاء المسموحة (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    api = setup(args.scale)
+    targets = get_targets(api, args.only)
+    results = {}
+    for name, fn in targets:
+        results[name] = measure(fn, args.repeat, args.company)
+        print_result(name, results[name])
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"scale-{args.scale}.json")
+    if args.save_baseline:
+        save_baseline(baseline_path, args, results)
+        print(f"\nBaseline saved to {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f"\nNo baseline at {baseline_path} (run with --save-baseline first)")
+        return 0
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("company") != args.company:
+        print(f"\nBaseline was recorded with company={baseline['meta'].get('company')!r}")
+        return 2
+    problems = compare(results, baseline["results"], args.tolerance)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    print(f"\n{len(problems)} regression(s) against {baseline_path}")
+    return 1 if problems else 0
+
+
+def setup(scale, seed=42):
+    """تثبيت frappe_shim وفتح (أو بناء) قاعدة البيانات ثم استيراد api"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"dataset-v{dataset.VERSION}-{scale}-{seed}-{BENCHMARK_DATE}.sqlite")
+    is_new = not os.path.exists(path)
+    building = path + ".building"
+    if is_new and os.path.exists(building):
+        os.remove(building)
+
+    frappe = frappe_shim.install(building if is_new else path)
+    frappe.local.today = BENCHMARK_DATE
+    frappe.conf.financial_dashboard_instrumentation = 0
+    # frappe_shim لا يدعم frappe.init لكل خيط، فتُقاس دوال المؤشرات متتابعة (زمن الاستعلامات نفسها)
+    frappe.conf.financial_dashboard_metric_workers = 0
+
+    if is_new:
+        started = time.perf_counter()
+        print(f"Building dataset for scale {scale:,} ...")
+        counts = dataset.build(frappe.db, scale, date.fromisoformat(BENCHMARK_DATE), seed)
+        print("  " + ", ".join(f"{name}: {count:,}" for name, count in counts.items()))
+        print(f"  built in {time.perf_counter() - started:.1f}s")
+
+    from financial_dashboard_final.financial_dashboard_final import api
+    from financial_dashboard_final.financial_dashboard_final.indexes import create_dashboard_indexes
+
+    # فهارس التطبيق الحالية، فيظهر أثر تعديلها بدون إعادة بناء البيانات
+    create_dashboard_indexes()
+    frappe.db.conn.execute("PRAGMA optimize")
+    frappe.db.conn.commit()
+
+    if is_new:
+        frappe.db.conn.close()
+        os.rename(building, path)
+        frappe.db.__init__(path)
+    return api
+
+
+def get_targets(api, only=None):
+    """endpoints المسموحة في api.py ودوال المؤشرات التي تأخذ filters فقط"""
+    from financial_dashboard_final.financial_dashboard_final import metrics
+
+    whitelisted = [
+        fn for fn in frappe_shim.whitelisted
+        if fn.__module__ == api.__name__ and fn.__name__ not in SKIPPED_ENDPOINTS
+    ]
+    helpers = [
+        fn for name, fn in inspect.getmembers(api, inspect.isfunction)
+        if fn.__module__ == api.__name__ and fn not in whitelisted
+        and list(inspect.signature(fn).parameters) == ["filters"]
+    ]
+    targets = [(f"endpoint:{fn.__name__}", fn) for fn in whitelisted]
+    targets += [(f"helper:{fn.__name__}", fn) for fn in sorted(helpers, key=lambda fn: fn.__name__)]
+    # بطاقات كل workspace بالترتيب كما يطلبها Frappe (بطاقة في كل طلب) من ذاكرة باردة
+    targets += [
+        (f"workspace:{cards[0]}", functools.partial(load_workspace_cards, api, cards))
+        for cards in api.WORKSPACE_NUMBER_CARDS
+    ]
+    # كل مؤشرات السجل في خطة واحدة (عدد الاستعلامات = عدد المصادر + المزودات)
+    targets.append(("metrics:all", functools.partial(metrics.compute_metrics, list(metrics.METRICS))))
+    if only:
+        names = {name.strip() for name in only.split(",")}
+        targets = [(name, fn) for name, fn in targets if name.split(":", 1)[1] in names]
+    return targets
+
+
+def load_workspace_cards(api, cards, company=None):
+    return {name: getattr(api, name)(company=company) for name in cards}
+
+
+class FallbackCounter(logging.Handler):
+    """يلتقط تحذيرات "FALLBACK served by" من instrumentation.fallback"""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        message = record.getMessage()
+        if message.startswith("FALLBACK"):
+            self.messages.append(message)
+
+
+fallback_counter = FallbackCounter()
+logging.getLogger("financial_dashboard").addHandler(fallback_counter)
+logging.getLogger("financial_dashboard").propagate = False
+
+
+def measure(fn, repeat=5, company=None):
+    """زمن وعدد استعلامات كل تشغيل (بارد) وبصمة النتيجة
+
+    تشغيل أول غير محسوب يحمّل صفحات SQLite وذاكرة Python قبل القياس.
+    """
+    db = frappe_shim.db
+    parameters = inspect.signature(fn).parameters
+    if "filters" in parameters:
+        kwargs = {"filters": frappe_shim._dict(company=company, cost_center=None, project=None)}
+    else:
+        kwargs = {"company": company} if "company" in parameters else {}
+
+    timings = []
+    queries = rows = 0
+    result = None
+    for i in range(repeat + 1):
+        reset_state()
+        fallback_counter.messages = []
+        started = time.perf_counter()
+        result = fn(**kwargs)
+        if i:
+            timings.append((time.perf_counter() - started) * 1000)
+        queries, rows = db.queries, db.rows
+
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "queries": queries,
+        "rows": rows,
+        "fallbacks": fallback_counter.messages,
+        "result_hash": get_result_hash(result)
+    }
+
+
+def reset_state():
+    frappe_shim.local.financial_dashboard_cache = {}
+    frappe_shim.cache().flushall()
+    frappe_shim.db.reset_counters()
+
+
+def get_result_hash(result):
+    return hashlib.md5(json.dumps(
+        strip_volatile(result), sort_keys=True, default=str, ensure_ascii=False
+    ).encode()).hexdigest()[:12]
+
+
+def strip_volatile(value):
+    if isinstance(value, dict):
+        return {k: strip_volatile(v) for k, v in value.items() if k not in VOLATILE_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [strip_volatile(v) for v in value]
+    if isinstance(value, float):
+        return round(value, 4)
+    return value
+
+
+def compare(results, baseline, tolerance):
+    """قائمة التراجعات: زمن أبطأ، استعلامات أكثر، نتيجة مختلفة، أو بيانات احتياطية"""
+    problems = []
+    for name, result in results.items():
+        for message in result["fallbacks"]:
+            problems.append(f"{name}: {message}")
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        # أسرع تشغيل أقل تأثراً بانشغال الجهاز من الوسيط
+        slower = result["min_ms"] - previous["min_ms"]
+        if slower > NOISE_FLOOR_MS and result["min_ms"] > previous["min_ms"] * (1 + tolerance):
+            problems.append(f"{name}: {previous['min_ms']:.1f}ms -> {result['min_ms']:.1f}ms")
+        if result["queries"] > previous["queries"]:
+            problems.append(f"{name}: {previous['queries']} -> {result['queries']} queries")
+        if result["result_hash"] != previous["result_hash"]:
+            problems.append(f"{name}: result changed")
+    return problems
+
+
+def save_baseline(path, args, results):
+    import sqlite3
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "meta": {
+                "scale": args.scale,
+                "repeat": args.repeat,
+                "company": args.company,
+                "benchmark_date": BENCHMARK_DATE,
+                "python": sys.version.split()[0],
+                "sqlite": sqlite3.sqlite_version,
+            },
+            "results": results
+        }, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def print_result(name, result):
+    flag = f"  FALLBACK x{len(result['fallbacks'])}" if result["fallbacks"] else ""
+    print(f"{name:<55} {result['median_ms']:>10.2f}ms {result['queries']:>4} queries "
+          f"{result['rows']:>7} rows{flag}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import click
+from frappe.commands import pass_context, get_site
+
+
+@click.command("backfill-dashboard-rollup")
+@click.option("--from-date", help="أول تاريخ للتجميع (افتراضياً أقدم قيد)")
+@click.option("--to-date", help="آخر تاريخ للتجميع (افتراضياً اليوم)")
+@pass_context
+def backfill_dashboard_rollup(context, from_date=None, to_date=None):
+    """تعبئة جداول التجميع اليومي من القيود والفواتير السابقة"""
+    import frappe
+    from financial_dashboard_final.financial_dashboard_final.rollup import backfill
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        backfill(from_date, to_date)
+    finally:
+        frappe.destroy()
+
+
+@click.command("audit-dashboard-queries")
+@click.option("--company", help="تشغيل الاستعلامات مصفاة بشركة محددة")
+@pass_context
+def audit_dashboard_queries(context, company=None):
+    """تشغيل EXPLAIN على استعلامات لوحات التحكم وعرض خطط التنفيذ المكلفة"""
+    import frappe
+    from financial_dashboard_final.financial_dashboard_final.indexes import audit_queries
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        problems = {
+            "full_scan": "مسح كامل للجدول",
+            "index_scan": "مسح كامل للفهرس",
+            "filesort": "ترتيب بدون فهرس",
+            "temporary": "جدول مؤقت"
+        }
+        findings = audit_queries(company)
+        for finding in findings:
+            print(f"❌ {finding.endpoint}: {problems[finding.problem]} في {finding.table} "
+                  f"(~{finding.rows} صف، الفهارس الممكنة: {finding.possible_keys})")
+            print(f"   {finding.query[:200]}")
+        if not findings:
+            print("✅ كل استعلامات لوحات التحكم تستخدم الفهارس")
+    finally:
+        frappe.destroy()
+
+
+@click.command("export-dashboard-columnar")
+@click.option("--from-date", help="أول تاريخ للتصدير (افتراضياً أقدم قيد)")
+@click.option("--to-date", help="آخر تاريخ للتصدير (افتراضياً اليوم)")
+@pass_context
+def export_dashboard_columnar(context, from_date=None, to_date=None):
+    """تصدير التجميعات اليومية إلى ملفات Parquet/Arrow مقسمة بالشهر"""
+    import frappe
+    from financial_dashboard_final.financial_dashboard_final.columnar import export_months, get_export_dir
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        export_months(from_date, to_date)
+        print(f"✅ تم التصدير إلى {get_export_dir()}")
+    finally:
+        frappe.destroy()
+
+
+@click.command("summarize-dashboard-columnar")
+@click.argument("dataset")
+@click.option("--from-date", help="أول تاريخ في الملخص")
+@click.option("--to-date", help="آخر تاريخ في الملخص")
+@click.option("--group-by", default="company,posting_month", help="أعمدة التجميع مفصولة بفواصل")
+@pass_context
+def summarize_dashboard_columnar(context, dataset, from_date=None, to_date=None, group_by=None):
+    """مجاميع مجموعة بيانات مصدرة (gl_daily / sales_daily / stock_daily) من ملفات Parquet/Arrow"""
+    import frappe
+    from financial_dashboard_final.financial_dashboard_final.columnar import summarize_dataset
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        rows = summarize_dataset(dataset, from_date, to_date, [name.strip() for name in group_by.split(",")])
+        for row in rows:
+            print("\t".join(str(value) for value in row.values()))
+        if not rows:
+            print("لا توجد بيانات مصدرة في هذه الفترة")
+    finally:
+        frappe.destroy()
+
+
+commands = [
+    backfill_dashboard_rollup,
+    audit_dashboard_queries,
+    export_dashboard_columnar,
+    summarize_dashboard_columnar
+]
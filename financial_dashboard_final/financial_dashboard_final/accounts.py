@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Accounts
+Cached classification of ledger accounts into the groups dashboard queries aggregate
+"""
+
+from __future__ import unicode_literals
+import frappe
+
+ACCOUNT_MAP_KEY = "financial_dashboard:account_map"
+ACCOUNT_MAP_VERSION_KEY = "financial_dashboard:account_map_version"
+
+# التصنيف -> شرط على نوع الحساب
+CLASSIFICATIONS = {
+    "cash": lambda account: account.account_type == "Cash",
+    "receivable": lambda account: account.account_type == "Receivable",
+    "income": lambda account: account.root_type == "Income",
+    "expense": lambda account: account.root_type == "Expense",
+}
+
+# نسخة لكل موقع داخل العملية: {site: (version, map)}
+_local_maps = {}
+
+
+def get_accounts(classification, company=None):
+    """أسماء الحسابات الفرعية من تصنيف واحد (لشركة محددة أو لكل الشركات)"""
+    accounts = get_account_map()[classification]
+    if company:
+        return [name for name, account_company in accounts if account_company == company]
+    return [name for name, account_company in accounts]
+
+
+def get_account_map():
+    """{التصنيف: [(الحساب، الشركة)]} من الذاكرة المحلية ثم Redis ثم tabAccount
+
+    الإصدار في Redis يُقرأ مرة لكل طلب، فتُكتشف تغييرات الحسابات من أي عامل.
+    """
+    from financial_dashboard_final.financial_dashboard_final.aggregates import _get_request_cache
+
+    request_cache = _get_request_cache()
+    if "account_map" in request_cache:
+        return request_cache["account_map"]
+
+    cache = frappe.cache()
+    version = cache.get_value(ACCOUNT_MAP_VERSION_KEY)
+    local = _local_maps.get(frappe.local.site)
+    if version and local and local[0] == version:
+        account_map = local[1]
+    else:
+        account_map = cache.get_value(ACCOUNT_MAP_KEY) if version else None
+        if account_map is None:
+            version = frappe.generate_hash(length=10)
+            account_map = build_account_map()
+            cache.set_value(ACCOUNT_MAP_KEY, account_map)
+            cache.set_value(ACCOUNT_MAP_VERSION_KEY, version)
+        _local_maps[frappe.local.site] = (version, account_map)
+
+    request_cache["account_map"] = account_map
+    return account_map
+
+
+def build_account_map():
+    accounts = frappe.get_all(
+        "Account",
+        filters={"is_group": 0},
+        fields=["name", "company", "root_type", "account_type"]
+    )
+    return {
+        classification: [(account.name, account.company) for account in accounts if matches(account)]
+        for classification, matches in CLASSIFICATIONS.items()
+    }
+
+
+def on_account_change(doc, method=None):
+    """doc_event: إبطال التصنيف عند إضافة أو تعديل أو حذف أو إعادة تسمية حساب
+
+    بعد الاعتماد فقط حتى لا يعيد طلب آخر بناءه من البيانات القديمة.
+    """
+    frappe.db.after_commit.add(clear_account_map)
+
+
+def clear_account_map():
+    frappe.cache().delete_value([ACCOUNT_MAP_KEY, ACCOUNT_MAP_VERSION_KEY])
+    _local_maps.pop(frappe.local.site, None)
@@ -0,0 +1,522 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Aggregates
+Single-pass GL and sales totals shared by all dashboard metric helpers
+"""
+
+from __future__ import unicode_literals
+from collections import namedtuple
+from datetime import timedelta
+import frappe
+from frappe.utils import flt, cint, getdate, nowdate, add_months, get_first_day, get_last_day
+from financial_dashboard_final.financial_dashboard_final.rollup import (
+    GL_ROLLUP_TABLE, SALES_ROLLUP_TABLE, is_rollup_ready
+)
+from financial_dashboard_final.financial_dashboard_final.accounts import get_accounts
+
+# مفتاح التجميع الزمني لكل نوع فترة
+BUCKET_KEYS = {
+    "month": "YEAR(gle.posting_date) * 100 + MONTH(gle.posting_date)",
+    "week": "YEARWEEK(gle.posting_date, 3)",
+    "day": "gle.posting_date",
+}
+
+# مصدر قيود دفتر الأستاذ: الجدول الأصلي أو جدول التجميع اليومي
+# الجدول الأصلي يُصفى بقوائم حسابات صريحة من accounts.get_accounts بدلاً من ربطه بـ tabAccount،
+# وجدول التجميع يحمل نوع الحساب في كل صف
+RAW_GL_SOURCE = {
+    "table": "`tabGL Entry` gle",
+    "conditions": ["gle.is_cancelled = 0"],
+    "classified": False,
+}
+
+ROLLUP_GL_SOURCE = {
+    "table": f"`{GL_ROLLUP_TABLE}` gle",
+    "conditions": [],
+    "classified": True,
+}
+
+# شروط التصنيف في جدول التجميع
+ROLLUP_ACCOUNT_CONDITIONS = {
+    "cash": "gle.account_type = 'Cash'",
+    "receivable": "gle.account_type = 'Receivable'",
+    "income": "gle.root_type = 'Income'",
+    "expense": "gle.root_type = 'Expense'",
+}
+
+# أبعاد التصفية المدعومة في كل المؤشرات (أعمدة موجودة في القيود والفواتير وجداول التجميع)
+DIMENSIONS = ("company", "cost_center", "project")
+
+
+class GLTotals(namedtuple("GLTotals", [
+    "from_date", "to_date", "cash_balance", "cash_flow", "income", "expense"
+])):
+    """مجاميع دفتر الأستاذ لفترة واحدة"""
+    __slots__ = ()
+
+    @property
+    def profit(self):
+        return flt(self.income) - flt(self.expense)
+
+    @property
+    def efficiency(self):
+        """نسبة الربح إلى الإيرادات"""
+        income = flt(self.income) or 1
+        return (self.profit / income) * 100
+
+
+class SalesTotals(namedtuple("SalesTotals", [
+    "from_date", "to_date", "invoice_count", "grand_total"
+])):
+    """مجاميع فواتير المبيعات المعتمدة لفترة واحدة"""
+    __slots__ = ()
+
+    @property
+    def average(self):
+        return flt(self.grand_total) / self.invoice_count if self.invoice_count else 0
+
+
+class ReceivableTotals(namedtuple("ReceivableTotals", ["from_date", "to_date", "outstanding"])):
+    """المبالغ المستحقة على فواتير المبيعات المعتمدة في نهاية فترة واحدة"""
+    __slots__ = ()
+
+
+def get_gl_totals(from_date=None, to_date=None, filters=None):
+    """مجاميع النقدية والإيرادات والمصروفات في استعلام واحد مجمّع
+
+    - cash_balance: رصيد حسابات النقدية حتى to_date
+    - cash_flow: صافي حركة النقدية داخل الفترة
+    - income: دائن حسابات الإيرادات داخل الفترة
+    - expense: مدين حسابات المصروفات داخل الفترة
+    filters: الشركة ومركز التكلفة والمشروع (انظر get_dashboard_filters)
+    """
+    key = ("gl_totals", str(from_date or ""), str(to_date or ""), get_filters_key(filters))
+    cache = _get_request_cache()
+    if key not in cache:
+        cache[key] = _query_gl_totals(from_date, to_date, filters)
+    return cache[key]
+
+
+def _query_gl_totals(from_date, to_date, filters=None):
+    source = get_gl_source()
+    values = {"from_date": from_date, "to_date": to_date}
+    conditions = source["conditions"] + get_dimension_conditions(filters, values, "gle")
+    if to_date:
+        conditions.append("gle.posting_date <= %(to_date)s")
+
+    # داخل الفترة: كل القيود إذا لم يحدد تاريخ بداية
+    in_period = "gle.posting_date >= %(from_date)s" if from_date else "1 = 1"
+
+    accounts, any_account = get_account_conditions(source, values, ("cash", "income", "expense"), filters)
+
+    row = frappe.db.sql("""
+        SELECT
+            COALESCE(SUM(CASE WHEN {cash}
+                THEN gle.debit - gle.credit END), 0),
+            COALESCE(SUM(CASE WHEN {cash} AND {in_period}
+                THEN gle.debit - gle.credit END), 0),
+            COALESCE(SUM(CASE WHEN {income} AND {in_period}
+                THEN gle.credit END), 0),
+            COALESCE(SUM(CASE WHEN {expense} AND {in_period}
+                THEN gle.debit END), 0)
+        FROM {table}
+        WHERE {conditions}
+        AND {any_account}
+    """.format(
+        table=source["table"],
+        in_period=in_period,
+        any_account=any_account,
+        conditions=" AND ".join(conditions or ["1 = 1"]),
+        **accounts
+    ), values)[0]
+
+    return GLTotals(
+        from_date=from_date,
+        to_date=to_date,
+        cash_balance=flt(row[0]),
+        cash_flow=flt(row[1]),
+        income=flt(row[2]),
+        expense=flt(row[3])
+    )
+
+
+def get_gl_series(periods=6, bucket="month", to_date=None, include_current=False, filters=None):
+    """سلسلة زمنية لحركة النقدية والإيرادات والمصروفات من استعلام GROUP BY واحد
+
+    ترجع قائمة GLTotals مرتبة زمنياً، فترة لكل عنصر، والفترات الفارغة قيمتها صفر.
+    cash_balance غير محسوب في السلاسل ويكون None.
+    """
+    if bucket not in BUCKET_KEYS:
+        frappe.throw(f"Unsupported bucket: {bucket}")
+
+    key = ("gl_series", int(periods), bucket, str(to_date or ""), bool(include_current), get_filters_key(filters))
+    cache = _get_request_cache()
+    if key not in cache:
+        cache[key] = _query_gl_series(
+            int(periods), bucket, getdate(to_date or nowdate()), include_current, filters
+        )
+    return cache[key]
+
+
+def get_bucket_ranges(periods, bucket="month", to_date=None, include_current=False):
+    """حدود الفترات الزمنية [(بداية، نهاية، مفتاح)] من الأقدم إلى الأحدث"""
+    to_date = getdate(to_date or nowdate())
+    offset = 0 if include_current else 1
+    ranges = []
+    for i in range(periods - 1 + offset, offset - 1, -1):
+        if bucket == "month":
+            start = get_first_day(add_months(to_date, -i))
+            end = get_last_day(start)
+            bucket_key = start.year * 100 + start.month
+        elif bucket == "week":
+            start = to_date - timedelta(days=to_date.weekday() + 7 * i)
+            end = start + timedelta(days=6)
+            iso = start.isocalendar()
+            bucket_key = iso[0] * 100 + iso[1]
+        else:
+            start = end = to_date - timedelta(days=i)
+            bucket_key = start
+        ranges.append((start, end, bucket_key))
+    return ranges
+
+
+def _query_gl_series(periods, bucket, to_date, include_current, filters=None):
+    ranges = get_bucket_ranges(periods, bucket, to_date, include_current)
+    source = get_gl_source()
+    values = {"from_date": ranges[0][0], "to_date": ranges[-1][1]}
+    conditions = source["conditions"] + ["gle.posting_date BETWEEN %(from_date)s AND %(to_date)s"]
+    conditions += get_dimension_conditions(filters, values, "gle")
+    accounts, any_account = get_account_conditions(source, values, ("cash", "income", "expense"), filters)
+
+    rows = frappe.db.sql("""
+        SELECT
+            {bucket_key} AS bucket,
+            COALESCE(SUM(CASE WHEN {cash}
+                THEN gle.debit - gle.credit END), 0),
+            COALESCE(SUM(CASE WHEN {income}
+                THEN gle.credit END), 0),
+            COALESCE(SUM(CASE WHEN {expense}
+                THEN gle.debit END), 0)
+        FROM {table}
+        WHERE {conditions}
+        AND {any_account}
+        GROUP BY bucket
+    """.format(
+        bucket_key=BUCKET_KEYS[bucket],
+        table=source["table"],
+        any_account=any_account,
+        conditions=" AND ".join(conditions),
+        **accounts
+    ), values)
+
+    totals = {}
+    for row in rows:
+        bucket_key = getdate(row[0]) if bucket == "day" else int(row[0])
+        totals[bucket_key] = row[1:]
+
+    series = []
+    for start, end, bucket_key in ranges:
+        cash_flow, income, expense = totals.get(bucket_key, (0, 0, 0))
+        series.append(GLTotals(
+            from_date=start,
+            to_date=end,
+            cash_balance=None,
+            cash_flow=flt(cash_flow),
+            income=flt(income),
+            expense=flt(expense)
+        ))
+    return series
+
+
+def get_sales_totals(from_date=None, to_date=None, filters=None):
+    """عدد ومجموع فواتير المبيعات المعتمدة لفترة (من جدول التجميع إن توفر)"""
+    key = ("sales_totals", str(from_date or ""), str(to_date or ""), get_filters_key(filters))
+    cache = _get_request_cache()
+    if key not in cache:
+        cache[key] = _query_sales_totals(from_date, to_date, filters)
+    return cache[key]
+
+
+def _query_sales_totals(from_date, to_date, filters=None):
+    if is_rollup_ready():
+        table = f"`{SALES_ROLLUP_TABLE}`"
+        fields = "COALESCE(SUM(invoice_count), 0), COALESCE(SUM(grand_total), 0)"
+        conditions = []
+    else:
+        table = "`tabSales Invoice`"
+        fields = "COUNT(*), COALESCE(SUM(grand_total), 0)"
+        conditions = ["docstatus = 1"]
+
+    values = {"from_date": from_date, "to_date": to_date}
+    if from_date:
+        conditions.append("posting_date >= %(from_date)s")
+    if to_date:
+        conditions.append("posting_date <= %(to_date)s")
+    conditions += get_dimension_conditions(filters, values)
+
+    row = frappe.db.sql("""
+        SELECT {fields}
+        FROM {table}
+        WHERE {conditions}
+    """.format(fields=fields, table=table, conditions=" AND ".join(conditions or ["1 = 1"])), values)[0]
+
+    return SalesTotals(
+        from_date=from_date,
+        to_date=to_date,
+        invoice_count=cint(row[0]),
+        grand_total=flt(row[1])
+    )
+
+
+def get_gl_window_totals(windows, filters=None):
+    """مجاميع دفتر الأستاذ لعدة فترات (قد تتداخل) من استعلام واحد
+
+    windows: [(from_date, to_date), ...] - ترجع GLTotals لكل فترة بنفس الترتيب.
+    لكل فترة أعمدة شرطية مستقلة، فالقيد الواقع في فترتين يُحسب في كلتيهما.
+    """
+    windows = [(getdate(from_date), getdate(to_date)) for from_date, to_date in windows]
+    key = ("gl_windows", tuple(windows), get_filters_key(filters))
+    cache = _get_request_cache()
+    if key not in cache:
+        cache[key] = _query_gl_window_totals(windows, filters)
+    return cache[key]
+
+
+def _query_gl_window_totals(windows, filters=None):
+    source = get_gl_source()
+    values = {
+        "from_date": min(from_date for from_date, to_date in windows),
+        "to_date": max(to_date for from_date, to_date in windows)
+    }
+    conditions = source["conditions"] + ["gle.posting_date <= %(to_date)s"]
+    conditions += get_dimension_conditions(filters, values, "gle")
+    accounts, any_account = get_account_conditions(
+        source, values, ("cash", "income", "expense"), filters
+    )
+    # رصيد النقدية يحتاج كل التاريخ، أما حسابات الإيرادات والمصروفات فتُقرأ داخل الفترات فقط
+    conditions.append(
+        "({cash} OR gle.posting_date BETWEEN %(from_date)s AND %(to_date)s)".format(**accounts)
+    )
+
+    window_columns = []
+    for i, (from_date, to_date) in enumerate(windows):
+        values[f"from_{i}"], values[f"to_{i}"] = from_date, to_date
+        in_window = f"gle.posting_date BETWEEN %(from_{i})s AND %(to_{i})s"
+        window_columns.append(f"""
+            COALESCE(SUM(CASE WHEN {accounts["cash"]} AND gle.posting_date <= %(to_{i})s
+                THEN gle.debit - gle.credit END), 0),
+            COALESCE(SUM(CASE WHEN {accounts["cash"]} AND {in_window}
+                THEN gle.debit - gle.credit END), 0),
+            COALESCE(SUM(CASE WHEN {accounts["income"]} AND {in_window}
+                THEN gle.credit END), 0),
+            COALESCE(SUM(CASE WHEN {accounts["expense"]} AND {in_window}
+                THEN gle.debit END), 0)""")
+
+    row = frappe.db.sql("""
+        SELECT {window_columns}
+        FROM {table}
+        WHERE {conditions}
+        AND {any_account}
+    """.format(
+        window_columns=",".join(window_columns),
+        table=source["table"],
+        any_account=any_account,
+        conditions=" AND ".join(conditions)
+    ), values)[0]
+
+    return [
+        GLTotals(
+            from_date=from_date,
+            to_date=to_date,
+            cash_balance=flt(row[4 * i]),
+            cash_flow=flt(row[4 * i + 1]),
+            income=flt(row[4 * i + 2]),
+            expense=flt(row[4 * i + 3])
+        )
+        for i, (from_date, to_date) in enumerate(windows)
+    ]
+
+
+def get_receivable_window_totals(windows, filters=None):
+    """المبالغ المستحقة على فواتير المبيعات في نهاية كل فترة
+
+    نفس مصدر outstanding_amount في بطاقة المدينين: حركات Payment Ledger Entry على كل
+    فاتورة حتى نهاية الفترة، ثم مجموع الفواتير ذات الرصيد الموجب فقط.
+    """
+    windows = [(getdate(from_date), getdate(to_date)) for from_date, to_date in windows]
+    key = ("receivable_windows", tuple(windows), get_filters_key(filters))
+    cache = _get_request_cache()
+    if key not in cache:
+        cache[key] = _query_receivable_window_totals(windows, filters)
+    return cache[key]
+
+
+def _query_receivable_window_totals(windows, filters=None):
+    values = {"to_date": max(to_date for from_date, to_date in windows)}
+    conditions = ["si.docstatus = 1", "si.posting_date <= %(to_date)s"]
+    conditions += get_dimension_conditions(filters, values, "si")
+
+    invoice_columns = []
+    outstanding_columns = []
+    for i, (from_date, to_date) in enumerate(windows):
+        values[f"to_{i}"] = to_date
+        invoice_columns.append(f"""
+            SUM(CASE WHEN ple.posting_date <= %(to_{i})s
+                THEN ple.amount_in_account_currency ELSE 0 END) AS outstanding_{i}""")
+        outstanding_columns.append(f"COALESCE(SUM(CASE WHEN outstanding_{i} > 0 THEN outstanding_{i} END), 0)")
+
+    row = frappe.db.sql("""
+        SELECT {outstanding_columns}
+        FROM (
+            SELECT {invoice_columns}
+            FROM `tabPayment Ledger Entry` ple
+            INNER JOIN `tabSales Invoice` si ON si.name = ple.against_voucher_no
+            WHERE ple.against_voucher_type = 'Sales Invoice'
+            AND ple.delinked = 0
+            AND {conditions}
+            GROUP BY ple.against_voucher_no
+        ) invoices
+    """.format(
+        outstanding_columns=", ".join(outstanding_columns),
+        invoice_columns=",".join(invoice_columns),
+        conditions=" AND ".join(conditions)
+    ), values)[0]
+
+    return [
+        ReceivableTotals(from_date=from_date, to_date=to_date, outstanding=flt(row[i]))
+        for i, (from_date, to_date) in enumerate(windows)
+    ]
+
+
+def get_sales_window_totals(windows, filters=None):
+    """عدد ومجموع فواتير المبيعات لعدة فترات (قد تتداخل) من استعلام واحد بأعمدة لكل فترة"""
+    windows = [(getdate(from_date), getdate(to_date)) for from_date, to_date in windows]
+    key = ("sales_windows", tuple(windows), get_filters_key(filters))
+    cache = _get_request_cache()
+    if key not in cache:
+        cache[key] = _query_sales_window_totals(windows, filters)
+    return cache[key]
+
+
+def _query_sales_window_totals(windows, filters=None):
+    if is_rollup_ready():
+        table = f"`{SALES_ROLLUP_TABLE}`"
+        count, total = "invoice_count", "grand_total"
+        conditions = []
+    else:
+        table = "`tabSales Invoice`"
+        count, total = "1", "grand_total"
+        conditions = ["docstatus = 1"]
+
+    values = {}
+    window_columns = []
+    window_conditions = []
+    for i, (from_date, to_date) in enumerate(windows):
+        values[f"from_{i}"], values[f"to_{i}"] = from_date, to_date
+        in_window = f"posting_date BETWEEN %(from_{i})s AND %(to_{i})s"
+        window_columns.append(
+            f"COALESCE(SUM(CASE WHEN {in_window} THEN {count} END), 0), "
+            f"COALESCE(SUM(CASE WHEN {in_window} THEN {total} END), 0)"
+        )
+        window_conditions.append(in_window)
+    conditions.append("({0})".format(" OR ".join(window_conditions)))
+    conditions += get_dimension_conditions(filters, values)
+
+    row = frappe.db.sql("""
+        SELECT {window_columns}
+        FROM {table}
+        WHERE {conditions}
+    """.format(
+        window_columns=", ".join(window_columns),
+        table=table,
+        conditions=" AND ".join(conditions)
+    ), values)[0]
+
+    return [
+        SalesTotals(
+            from_date=from_date,
+            to_date=to_date,
+            invoice_count=cint(row[2 * i]),
+            grand_total=flt(row[2 * i + 1])
+        )
+        for i, (from_date, to_date) in enumerate(windows)
+    ]
+
+
+def get_receivable_total(filters=None):
+    """مجموع المبالغ المستحقة على فواتير المبيعات المعتمدة"""
+    key = ("receivable_total", get_filters_key(filters))
+    cache = _get_request_cache()
+    if key not in cache:
+        values = {}
+        conditions = ["docstatus = 1", "outstanding_amount > 0"]
+        conditions += get_dimension_conditions(filters, values)
+        cache[key] = flt(frappe.db.sql("""
+            SELECT COALESCE(SUM(outstanding_amount), 0)
+            FROM `tabSales Invoice`
+            WHERE {conditions}
+        """.format(conditions=" AND ".join(conditions)), values)[0][0])
+    return cache[key]
+
+
+def get_account_conditions(source, values, classifications, filters=None):
+    """شرط SQL لكل تصنيف حسابات + شرط يجمعها كلها في WHERE
+
+    في الجدول الأصلي: gle.account IN (قائمة صريحة) ليستخدم المحسن فهرس (account, posting_date).
+    """
+    if source["classified"]:
+        conditions = {name: ROLLUP_ACCOUNT_CONDITIONS[name] for name in classifications}
+        return conditions, "({0})".format(" OR ".join(conditions.values()))
+
+    company = (filters or {}).get("company")
+    conditions = {}
+    all_accounts = []
+    for name in classifications:
+        # قائمة فارغة تجعل IN () خطأ، فنستخدم قيمة لا تطابق أي حساب
+        accounts = get_accounts(name, company) or [""]
+        values[f"{name}_accounts"] = accounts
+        conditions[name] = f"gle.account IN %({name}_accounts)s"
+        all_accounts += accounts
+    values["dashboard_accounts"] = all_accounts
+    return conditions, "gle.account IN %(dashboard_accounts)s"
+
+
+def get_gl_source():
+    """مصدر القيود المستخدم في الاستعلامات: جدول التجميع بعد اكتمال تعبئته"""
+    cache = _get_request_cache()
+    if "gl_source" not in cache:
+        cache["gl_source"] = ROLLUP_GL_SOURCE if is_rollup_ready() else RAW_GL_SOURCE
+    return cache["gl_source"]
+
+
+def get_dashboard_filters(company=None, cost_center=None, project=None):
+    """أبعاد التصفية الموحدة التي تمرر لكل دوال المؤشرات (القيمة الفارغة = بدون تصفية)"""
+    return frappe._dict(
+        company=company or None,
+        cost_center=cost_center or None,
+        project=project or None
+    )
+
+
+def get_filters_key(filters):
+    """أبعاد التصفية كـ tuple ثابت يدخل في مفاتيح الذاكرة المؤقتة"""
+    filters = filters or {}
+    return tuple(filters.get(dimension) or "" for dimension in DIMENSIONS)
+
+
+def get_dimension_conditions(filters, values, alias=None, dimensions=DIMENSIONS):
+    """شروط SQL للأبعاد المحددة فقط مع إضافة قيمها إلى values"""
+    conditions = []
+    prefix = f"{alias}." if alias else ""
+    for dimension in dimensions:
+        if filters and filters.get(dimension):
+            conditions.append(f"{prefix}{dimension} = %({dimension})s")
+            values[dimension] = filters.get(dimension)
+    return conditions
+
+
+def _get_request_cache():
+    """ذاكرة مؤقتة تعيش طوال الطلب الحالي فقط"""
+    if not hasattr(frappe.local, "financial_dashboard_cache"):
+        frappe.local.financial_dashboard_cache = {}
+    return frappe.local.financial_dashboard_cache
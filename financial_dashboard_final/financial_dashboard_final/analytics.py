@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Analytics
+Vectorized trend, year-over-year, target and forecast calculations for advanced analytics
+"""
+
+from __future__ import unicode_literals
+from collections import namedtuple
+import numpy as np
+import frappe
+from frappe.utils import cint, flt, getdate, nowdate, get_last_day
+from financial_dashboard_final.financial_dashboard_final.aggregates import get_gl_series
+
+# عدد السنوات الافتراضي في المقارنة السنوية
+DEFAULT_YEARS = 5
+# نافذة المتوسط المتحرك بالأشهر
+MOVING_AVERAGE_WINDOW = 3
+# عدد الأشهر المتوقعة بعد الشهر الحالي
+FORECAST_MONTHS = 3
+# نسبة النمو المستهدفة على إيرادات السنة الماضية إذا لم يحدد هدف في site_config
+DEFAULT_TARGET_GROWTH = 0.1
+
+MonthlyArrays = namedtuple("MonthlyArrays", [
+    "years", "income", "expense", "profit", "months_elapsed", "month_progress"
+])
+
+
+def get_monthly_arrays(years=DEFAULT_YEARS, to_date=None, filters=None):
+    """الإيرادات والمصروفات والأرباح الشهرية لآخر years سنة ميلادية كمصفوفات (years, 12)
+
+    كل الأشهر من استعلام GROUP BY واحد (get_gl_series)، والأشهر المستقبلية في السنة
+    الحالية قيمتها صفر. months_elapsed: عدد أشهر السنة الحالية حتى to_date، و month_progress:
+    نسبة ما مضى من الشهر الحالي (1 إذا كان to_date آخر الشهر).
+    """
+    to_date = getdate(to_date or nowdate())
+    year_end = getdate(f"{to_date.year}-12-31")
+    series = get_gl_series(years * 12, "month", to_date=year_end, include_current=True, filters=filters)
+
+    values = np.array([(period.income, period.expense) for period in series], dtype=float)
+    income = values[:, 0].reshape(years, 12)
+    expense = values[:, 1].reshape(years, 12)
+    return MonthlyArrays(
+        years=np.arange(to_date.year - years + 1, to_date.year + 1),
+        income=income,
+        expense=expense,
+        profit=income - expense,
+        months_elapsed=to_date.month,
+        month_progress=to_date.day / get_last_day(to_date).day
+    )
+
+
+def moving_average(values, window=MOVING_AVERAGE_WINDOW):
+    """متوسط متحرك بمجاميع تراكمية، والقيم الأولى متوسط ما توفر منها"""
+    cumsum = np.cumsum(np.insert(values, 0, 0))
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return (cumsum[1:] - cumsum[np.arange(len(values)) + 1 - counts]) / counts
+
+
+def percent_change(current, previous):
+    """نسبة التغير عنصراً بعنصر، وصفر حيث لا توجد قيمة سابقة"""
+    current, previous = np.asarray(current, dtype=float), np.asarray(previous, dtype=float)
+    return np.divide(
+        (current - previous) * 100, np.abs(previous),
+        out=np.zeros_like(current), where=previous != 0
+    )
+
+
+def linear_forecast(values, periods=FORECAST_MONTHS, seasonality=None):
+    """توقع الفترات التالية باتجاه خطي (المربعات الصغرى)
+
+    seasonality: مؤشر موسمي لكل فترة في values ثم لكل فترة متوقعة - يُزال من القيم
+    قبل حساب الاتجاه ويُعاد تطبيقه على التوقع.
+    """
+    values = np.asarray(values, dtype=float)
+    size = len(values)
+    if seasonality is None:
+        seasonality = np.ones(size + periods)
+    seasonality = np.where(seasonality > 0, seasonality, 1)
+
+    deseasonalized = values / seasonality[:size]
+    slope, intercept = np.polyfit(np.arange(size), deseasonalized, 1)
+    forecast = (intercept + slope * np.arange(size, size + periods)) * seasonality[size:]
+    return np.maximum(forecast, 0)
+
+
+def get_seasonal_index(monthly, complete_years):
+    """متوسط كل شهر إلى متوسط السنة للسنوات المكتملة التي فيها حركة (1 = بدون موسمية)"""
+    history = monthly[:complete_years]
+    history = history[history.sum(axis=1) > 0]
+    if len(history) < 2:
+        return np.ones(12)
+    monthly_mean = history.mean(axis=0)
+    overall_mean = monthly_mean.mean()
+    return monthly_mean / overall_mean if overall_mean else np.ones(12)
+
+
+def get_target_achievement(ytd_income, last_year_income, months_elapsed, target=None):
+    """نسبة تحقيق هدف الإيرادات حتى تاريخه (الهدف موزع بالتساوي على الأشهر)
+
+    الهدف من site_config أو إيرادات السنة السابقة + نسبة النمو المستهدفة.
+    """
+    target = target or last_year_income * (1 + DEFAULT_TARGET_GROWTH)
+    prorated_target = target * months_elapsed / 12
+    return flt(ytd_income / prorated_target * 100, 1) if prorated_target else 0
+
+
+def get_advanced_metrics(years=DEFAULT_YEARS, to_date=None, filters=None):
+    """سلاسل الاتجاه والمقارنة السنوية والمؤشرات والتوقعات من مصفوفات get_monthly_arrays"""
+    years = max(cint(years) or DEFAULT_YEARS, 3)
+    arrays = get_monthly_arrays(years, to_date, filters)
+    elapsed = arrays.months_elapsed
+
+    # السلاسل الشهرية حتى الشهر الحالي، وآخر 12 شهراً منها للرسم
+    months = (years - 1) * 12 + elapsed
+    income, expense, profit = (values.ravel()[:months] for values in (arrays.income, arrays.expense, arrays.profit))
+    month_index = np.arange(months - 12, months)
+
+    # [إيرادات، مصروفات، أرباح] للسنة الحالية حتى تاريخه ولنفس الأشهر من السنة الماضية
+    stacked = np.stack([arrays.income, arrays.expense, arrays.profit])
+    ytd = stacked[:, -1, :elapsed].sum(axis=1)
+    last_ytd = stacked[:, -2, :elapsed].sum(axis=1)
+    ytd_change = percent_change(ytd, last_ytd)
+    yearly = stacked.sum(axis=2)
+
+    target = flt(frappe.conf.get("financial_dashboard_annual_revenue_target"))
+    achievement = get_target_achievement(ytd[0], yearly[0, -2], elapsed, target)
+    last_achievement = get_target_achievement(last_ytd[0], yearly[0, -3], elapsed)
+
+    efficiency = flt(ytd[2] / ytd[0] * 100, 1) if ytd[0] else 0
+    last_efficiency = flt(last_ytd[2] / last_ytd[0] * 100, 1) if last_ytd[0] else 0
+
+    # الشهر الحالي غير المكتمل لا يدخل في حساب الاتجاه (آخر 12 شهراً مكتملة)، ويُقارن
+    # بنفس الشهر من السنة الماضية بعد تناسبه مع ما مضى من الشهر
+    complete = months if arrays.month_progress >= 1 else months - 1
+    fit_periods = months + FORECAST_MONTHS - complete
+    last_year = income[-24:-12].copy()
+    last_year[-1] *= arrays.month_progress
+
+    # المؤشر الموسمي لأشهر الاتجاه ثم الأشهر التالية حتى آخر شهر متوقع
+    forecast_index = np.arange(complete - 12, months + FORECAST_MONTHS) % 12
+    seasonality = get_seasonal_index(arrays.income, years - 1)[forecast_index]
+
+    return frappe._dict({
+        "trends": {
+            "years": arrays.years[month_index // 12].tolist(),
+            "months": (month_index % 12 + 1).tolist(),
+            "revenue": income[-12:].tolist(),
+            "expenses": expense[-12:].tolist(),
+            "profit": profit[-12:].tolist(),
+            "revenue_moving_average": moving_average(income)[-12:].tolist(),
+            "profit_moving_average": moving_average(profit)[-12:].tolist(),
+            "revenue_yoy": percent_change(income[-12:], last_year).round(1).tolist()
+        },
+        "forecast": {
+            "months": (forecast_index[-FORECAST_MONTHS:] + 1).tolist(),
+            "revenue": linear_forecast(
+                income[complete - 12:complete], fit_periods, seasonality
+            )[-FORECAST_MONTHS:].tolist(),
+            "expenses": linear_forecast(expense[complete - 12:complete], fit_periods)[-FORECAST_MONTHS:].tolist()
+        },
+        "yearly": {
+            "years": arrays.years.tolist(),
+            "revenue": yearly[0].tolist(),
+            "expenses": yearly[1].tolist(),
+            "profit": yearly[2].tolist(),
+            "revenue_growth": percent_change(yearly[0, 1:], yearly[0, :-1]).round(1).tolist()
+        },
+        "ytd": {
+            "revenue": float(ytd[0]),
+            "expenses": float(ytd[1]),
+            "profit": float(ytd[2]),
+            "revenue_change": flt(ytd_change[0], 1),
+            "profit_change": flt(ytd_change[2], 1)
+        },
+        "target": {
+            "annual": float(target or yearly[0, -2] * (1 + DEFAULT_TARGET_GROWTH)),
+            "achievement": achievement,
+            "change": flt(achievement - last_achievement, 1)
+        },
+        "efficiency": {
+            "value": efficiency,
+            "change": flt(efficiency - last_efficiency, 1)
+        }
+    })
@@ -8,234 +8,166 @@ from __future__ import unicode_literals
 import frappe
 from frappe import _
 from datetime import datetime, timedelta
-from frappe.utils import flt, nowdate, add_months, get_first_day, get_last_day
+from functools import partial
+from frappe.utils import flt, cint, nowdate, get_first_day, get_last_day
+from financial_dashboard_final.financial_dashboard_final.aggregates import (
+    get_gl_totals, get_gl_series, get_sales_totals, get_receivable_total,
+    get_sales_window_totals, get_bucket_ranges, get_dashboard_filters
+)
+from financial_dashboard_final.financial_dashboard_final.cache import dashboard_cache, get_cache_key
+from financial_dashboard_final.financial_dashboard_final.invalidation import SALES, CASH, PNL, INVENTORY
+from financial_dashboard_final.financial_dashboard_final.delta import versioned_response, stamp_versions
+from financial_dashboard_final.financial_dashboard_final.export import start_export, get_export_status
+from financial_dashboard_final.financial_dashboard_final.executor import evaluate_metrics, mark_degraded
+from financial_dashboard_final.financial_dashboard_final.metrics import (
+    compute_metrics, get_metric_groups, format_currency
+)
+from financial_dashboard_final.financial_dashboard_final.instrumentation import (
+    instrument, record_cache, fallback, get_stats, reset_stats
+)
+from financial_dashboard_final.financial_dashboard_final.analytics import get_advanced_metrics
+from financial_dashboard_final.financial_dashboard_final.comparison import compare_metric, COMPARISON_METRICS
+from financial_dashboard_final.financial_dashboard_final.sales import get_invoices_page
+from financial_dashboard_final.financial_dashboard_final.inventory import get_inventory_page, get_stock_valuation
+from financial_dashboard_final.financial_dashboard_final.stock_analytics import (
+    get_stock_movement_series, get_top_selling_items
+)
+from financial_dashboard_final.financial_dashboard_final.low_stock import (
+    get_low_stock_item_count, get_low_stock_entries
+)
+
+ARABIC_MONTHS = ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو",
+                 "يوليو", "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر"]
 
 
 @frappe.whitelist()
-def get_financial_data():
+@instrument
+def get_financial_data(company=None, cost_center=None, project=None):
     """جلب البيانات المالية الرئيسية"""
-    try:
-        return {
+    filters = get_dashboard_filters(company, cost_center, project)
+    try:
+        results, degraded = evaluate_metrics({
+            "metrics": get_financial_metrics,
+            "cash_flow": get_cash_flow_data,
+            "financial_summary": get_financial_summary,
+            "charts": get_overview_charts
+        }, filters, fallbacks=dict(get_fallback_data(), charts={}))
+        return mark_degraded({
             "status": "success",
-            "metrics": get_financial_metrics(),
-            "cash_flow": get_cash_flow_data(),
-            "financial_summary": get_financial_summary(),
-            "charts": get_chart_data(),
+            "metrics": results.metrics,
+            "cash_flow": results.cash_flow,
+            "financial_summary": results.financial_summary,
+            "charts": results.charts,
             "timestamp": datetime.now().isoformat()
-        }
+        }, degraded)
     except Exception as e:
         frappe.log_error(f"Dashboard API Error: {str(e)}")
         return {
             "status": "error",
             "message": str(e),
-            "fallback_data": get_fallback_data()
+            "fallback_data": fallback("get_financial_data", get_fallback_data(), e)
         }
 
 
-def get_financial_metrics():
+@instrument
+def get_financial_metrics(filters=None):
     """الحصول على المؤشرات المالية الأساسية"""
     try:
         # الرصيد النقدي
-        cash_balance = frappe.db.sql("""
-            SELECT COALESCE(SUM(debit - credit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE account_type = 'Cash' AND is_group = 0
-            )
-            AND is_cancelled = 0
-        """)[0][0] or 0
+        cash_balance = get_current_month_totals(filters).cash_balance
         
         # المبيعات الشهرية
-        month_start = get_first_day(nowdate())
-        month_end = get_last_day(nowdate())
-        
-        monthly_sales = frappe.db.sql("""
-            SELECT COALESCE(SUM(grand_total), 0)
-            FROM `tabSales Invoice`
-            WHERE posting_date BETWEEN %s AND %s
-            AND docstatus = 1
-        """, (month_start, month_end))[0][0] or 0
+        monthly_sales = get_current_month_sales(filters).grand_total
         
         # الحسابات المدينة
-        accounts_receivable = frappe.db.sql("""
-            SELECT COALESCE(SUM(outstanding_amount), 0)
-            FROM `tabSales Invoice`
-            WHERE docstatus = 1 AND outstanding_amount > 0
-        """)[0][0] or 0
+        accounts_receivable = get_receivable_total(filters)
         
         return {
             "current_balance": {
                 "value": format_currency(cash_balance),
                 "raw_value": cash_balance,
-                "change_percent": calculate_change(cash_balance, "cash")
+                "change_percent": calculate_change("cash_balance", filters)
             },
             "accounts": {
                 "value": format_currency(accounts_receivable),
                 "raw_value": accounts_receivable,
-                "change_percent": calculate_change(accounts_receivable, "receivable")
+                "change_percent": calculate_change("receivable", filters)
             },
             "sales": {
                 "value": format_currency(monthly_sales),
                 "raw_value": monthly_sales,
-                "change_percent": calculate_change(monthly_sales, "sales")
-            },
-            "stock_1": {
-                "value": format_currency(150000),
-                "raw_value": 150000,
-                "change_percent": 5.2
-            },
-            "stock_2": {
-                "value": format_currency(170000),
-                "raw_value": 170000,
-                "change_percent": -2.1
+                "change_percent": calculate_change("sales", filters)
             }
         }
     except Exception as e:
         frappe.log_error(f"Error in get_financial_metrics: {str(e)}")
-        return get_fallback_metrics()
+        return fallback("get_financial_metrics", get_fallback_metrics(), e)
 
 
-def get_cash_flow_data():
+@instrument
+def get_cash_flow_data(filters=None):
     """بيانات التدفق النقدي للرسم البياني"""
     try:
-        months = []
-        data = []
-        
-        for i in range(6, 0, -1):
-            month_date = add_months(nowdate(), -i)
-            month_start = get_first_day(month_date)
-            month_end = get_last_day(month_date)
-            
-            cash_flow = frappe.db.sql("""
-                SELECT COALESCE(SUM(debit - credit), 0)
-                FROM `tabGL Entry`
-                WHERE account IN (
-                    SELECT name FROM `tabAccount` 
-                    WHERE account_type = 'Cash' AND is_group = 0
-                )
-                AND posting_date BETWEEN %s AND %s
-                AND is_cancelled = 0
-            """, (month_start, month_end))[0][0] or 0
-            
-            months.append(month_date.strftime('%b'))
-            data.append(flt(cash_flow) / 1000)
-        
+        series = get_gl_series(6, "month", filters=filters)
         return {
-            "labels": months,
-            "data": data
+            "labels": [period.from_date.strftime('%b') for period in series],
+            "data": [period.cash_flow / 1000 for period in series]
         }
-    except:
-        return {
+    except Exception as e:
+        return fallback("get_cash_flow_data", {
             "labels": ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو"],
             "data": [45, 52, 48, 61, 55, 67]
-        }
+        }, e)
 
 
-def get_financial_summary():
+@instrument
+def get_financial_summary(filters=None):
     """الملخص المالي"""
     try:
-        month_start = get_first_day(nowdate())
-        month_end = get_last_day(nowdate())
-        
-        # المصروفات
-        expenses = frappe.db.sql("""
-            SELECT COALESCE(SUM(debit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE root_type = 'Expense' AND is_group = 0
-            )
-            AND posting_date BETWEEN %s AND %s
-            AND is_cancelled = 0
-        """, (month_start, month_end))[0][0] or 0
-        
-        # الإيرادات
-        revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(credit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE root_type = 'Income' AND is_group = 0
-            )
-            AND posting_date BETWEEN %s AND %s
-            AND is_cancelled = 0
-        """, (month_start, month_end))[0][0] or 0
-        
-        profit = revenue - expenses
+        totals = get_current_month_totals(filters)
+        expenses = totals.expense
+        revenue = totals.income
+        profit = totals.profit
         
         return {
             "expenses": {
                 "value": format_currency(expenses),
                 "raw_value": expenses,
-                "change_percent": -15.2
+                "change_percent": calculate_change("expense", filters)
             },
             "revenue": {
                 "value": format_currency(revenue),
                 "raw_value": revenue,
-                "change_percent": 12.5
+                "change_percent": calculate_change("income", filters)
             },
             "profit": {
                 "value": format_currency(profit),
                 "raw_value": profit,
-                "change_percent": 25.8
+                "change_percent": calculate_change("profit", filters)
             },
             "total": {
                 "value": format_currency(revenue),
                 "raw_value": revenue,
-                "change_percent": 12.5
+                "change_percent": calculate_change("income", filters)
             }
         }
-    except:
-        return get_fallback_summary()
+    except Exception as e:
+        return fallback("get_financial_summary", get_fallback_summary(), e)
 
 
-def get_chart_data():
-    """بيانات الرسوم البيانية"""
-    return {
-        "revenue_expense": {
-            "labels": ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو"],
-            "expenses": [40, 35, 45, 50, 42, 38],
-            "revenue": [60, 65, 58, 72, 68, 75]
-        },
-        "performance": {
-            "labels": ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو"],
-            "data": [65, 70, 68, 75, 72, 78]
-        },
-        "sectors": [
-            {"name": "عقاري", "value": 110000, "percentage": 35},
-            {"name": "تجاري", "value": 85000, "percentage": 27},
-            {"name": "صناعي", "value": 70000, "percentage": 22},
-            {"name": "خدمي", "value": 50000, "percentage": 16}
-        ]
-    }
+def get_current_month_totals(filters=None):
+    """مجاميع دفتر الأستاذ للشهر الحالي (استعلام واحد مشترك)"""
+    return get_gl_totals(get_first_day(nowdate()), get_last_day(nowdate()), filters)
 
 
-# Helper Functions
-def format_currency(amount):
-    """تنسيق العملة"""
-    try:
-        amount = flt(amount)
-        if amount >= 1000000:
-            return f"{amount/1000000:.1f}M"
-        elif amount >= 1000:
-            return f"{amount/1000:.1f}K"
-        else:
-            return f"{amount:.0f}"
-    except:
-        return "0"
-
-
-def calculate_change(current_value, metric_type):
-    """حساب نسبة التغيير"""
-    # هنا يمكن إضافة منطق حساب التغيير الحقيقي
-    # مؤقتاً نرجع قيم تجريبية
-    changes = {
-        "cash": 5.2,
-        "receivable": -8.1,
-        "sales": 15.7
-    }
-    return changes.get(metric_type, 0)
+def get_current_month_sales(filters=None):
+    """مجاميع فواتير المبيعات للشهر الحالي"""
+    return get_sales_totals(get_first_day(nowdate()), get_last_day(nowdate()), filters)
+
+
+def calculate_change(metric, filters=None, period="mtd", compare="previous_period"):
+    """نسبة تغير المؤشر عن فترة المقارنة (افتراضياً الشهر حتى اليوم مقابل الشهر السابق)"""
+    return compare_metric(metric, period, compare, filters=filters).change_percent
 
 
 def get_fallback_data():
@@ -255,9 +187,7 @@ def get_fallback_metrics():
     return {
         "current_balance": {"value": "110M", "raw_value": 110000000, "change_percent": 5.2},
         "accounts": {"value": "500M", "raw_value": 500000000, "change_percent": -8.1},
-        "sales": {"value": "300M", "raw_value": 300000000, "change_percent": 15.7},
-        "stock_1": {"value": "150K", "raw_value": 150000, "change_percent": 5.2},
-        "stock_2": {"value": "170K", "raw_value": 170000, "change_percent": -2.1}
+        "sales": {"value": "300M", "raw_value": 300000000, "change_percent": 15.7}
     }
 
 
@@ -272,6 +202,7 @@ def get_fallback_summary():
 
 
 @frappe.whitelist()
+@instrument
 def test_connection():
     """اختبار الاتصال"""
     return {
@@ -283,10 +214,11 @@ def test_connection():
 
 
 @frappe.whitelist()
-def export_data():
-    """تصدير البيانات"""
+@instrument
+def export_data(company=None, cost_center=None, project=None):
+    """تصدير ملخص لوحة التحكم (للبيانات التفصيلية: export_dataset)"""
     try:
-        data = get_financial_data()
+        data = get_financial_data(company, cost_center, project)
         return {
             "success": True,
             "data": data,
@@ -299,650 +231,548 @@ def export_data():
         }
 
 
+@frappe.whitelist()
+@instrument
+def export_dataset(dataset, file_format="csv", from_date=None, to_date=None,
+                   company=None, cost_center=None, project=None):
+    """API لتصدير البيانات التفصيلية في الخلفية
+
+    dataset: gl_entries / sales_invoices / stock_ledger / inventory
+    file_format: csv / jsonl / xlsx
+    ترجع export_id، والتقدم يصل عبر الحدث financial_dashboard_export_progress
+    أو get_export_progress، ومعه رابط الملف عند الاكتمال.
+    """
+    return start_export(
+        dataset, file_format, from_date, to_date, get_dashboard_filters(company, cost_center, project)
+    )
+
+
+@frappe.whitelist()
+def get_export_progress(export_id):
+    """API لحالة التصدير: queued / running / completed / failed مع عدد الصفوف ورابط الملف"""
+    return get_export_status(export_id)
+
+
 # ===== Workspace API Endpoints =====
 
 @frappe.whitelist()
-def get_financial_overview():
+@instrument
+@versioned_response
+@dashboard_cache(ttl=3600, groups=[CASH, SALES, PNL])
+@stamp_versions
+def get_financial_overview(company=None, cost_center=None, project=None):
     """API للنظرة العامة المالية - Workspace 1"""
+    filters = get_dashboard_filters(company, cost_center, project)
     try:
-        return {
+        values, degraded = compute_metrics(OVERVIEW_METRICS, filters)
+        return mark_degraded({
             "status": "success",
             "metrics": {
                 "current_balance": {
-                    "value": format_currency(get_current_balance_value()),
-                    "change": 5.2
+                    "value": format_currency(values.current_balance),
+                    "change": calculate_change("cash_balance", filters)
                 },
                 "monthly_sales": {
-                    "value": format_currency(get_monthly_sales_value()),
-                    "change": 15.7
+                    "value": format_currency(values.monthly_sales),
+                    "change": calculate_change("sales", filters)
                 },
                 "accounts_receivable": {
-                    "value": format_currency(get_accounts_receivable_value()),
-                    "change": -8.1
+                    "value": format_currency(values.accounts_receivable),
+                    "change": calculate_change("receivable", filters)
                 },
                 "net_profit": {
-                    "value": format_currency(get_net_profit_value()),
-                    "change": 25.8
-                }
-            },
-            "charts": {
-                "cash_flow": {
-                    "labels": ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو", "يوليو", "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر"],
-                    "data": [45, 52, 48, 61, 55, 67, 58, 72, 65, 78, 69, 85]
-                },
-                "revenue_expense": {
-                    "labels": ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو", "يوليو", "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر"],
-                    "revenue": [60, 65, 58, 72, 68, 75, 70, 82, 78, 88, 85, 95],
-                    "expenses": [40, 35, 45, 50, 42, 38, 48, 52, 45, 58, 55, 62]
+                    "value": format_currency(values.net_profit),
+                    "change": calculate_change("profit", filters)
                 }
             },
+            "charts": get_overview_charts(filters),
             "timestamp": datetime.now().isoformat()
-        }
+        }, degraded)
     except Exception as e:
         frappe.log_error(f"Financial Overview API Error: {str(e)}")
-        return get_fallback_financial_overview()
+        return fallback("get_financial_overview", get_fallback_financial_overview(), e)
+
+
+@instrument
+def get_overview_charts(filters=None):
+    """رسوم النظرة العامة لآخر 12 شهراً من استعلام واحد"""
+    series = get_gl_series(12, "month", include_current=True, filters=filters)
+    labels = get_month_labels(series)
+    return {
+        "cash_flow": {
+            "labels": labels,
+            "data": [period.cash_flow / 1000 for period in series]
+        },
+        "revenue_expense": {
+            "labels": labels,
+            "revenue": [period.income / 1000 for period in series],
+            "expenses": [period.expense / 1000 for period in series]
+        }
+    }
+
+
+@instrument
+def get_monthly_sales_chart(filters=None):
+    """صافي المبيعات لآخر 12 شهراً مع الشهر الحالي من استعلام واحد"""
+    windows = [(start, end) for start, end, bucket_key in get_bucket_ranges(12, "month", include_current=True)]
+    totals = get_sales_window_totals(windows, filters)
+    return {
+        "labels": get_month_labels(totals),
+        "sales": [period.grand_total for period in totals]
+    }
+
+
+def get_month_labels(series):
+    """أسماء الأشهر بالعربية لسلسلة زمنية شهرية"""
+    return [ARABIC_MONTHS[period.from_date.month - 1] for period in series]
 
 
 @frappe.whitelist()
-def get_sales_analytics():
+@instrument
+@versioned_response
+@dashboard_cache(ttl=3600, groups=[SALES])
+@stamp_versions
+def get_sales_analytics(company=None, cost_center=None, project=None):
     """API لتحليلات المبيعات - Workspace 2"""
-    try:
-        return {
+    filters = get_dashboard_filters(company, cost_center, project)
+    try:
+        fallback_data = get_fallback_sales_analytics()
+        results, degraded = evaluate_metrics({
+            "metrics": partial(compute_metrics, SALES_ANALYTICS_METRICS),
+            "monthly_sales": get_monthly_sales_chart,
+            "sales_data": get_recent_sales_data
+        }, filters, fallbacks={
+            "metrics": (fallback_data["metrics"], []),
+            "monthly_sales": {"labels": [], "sales": []},
+            "sales_data": fallback_data["sales_data"]
+        })
+        metrics, metrics_degraded = results.metrics
+        return mark_degraded({
             "status": "success",
-            "metrics": {
-                "total_sales": get_total_sales_value(),
-                "invoice_count": get_invoice_count_value(),
-                "avg_order": get_avg_order_value(),
-                "conversion_rate": get_conversion_rate_value()
-            },
+            "metrics": dict(metrics),
             "charts": {
-                "monthly_sales": {
-                    "labels": ["1/1", "1/2", "1/3", "1/4", "1/5", "1/6", "1/7", "1/8", "1/9", "1/10", "1/11", "1/12"],
-                    "sales": [400000, 350000, 420000, 380000, 450000, 390000, 410000, 430000, 370000, 460000, 440000, 480000],
-                    "returns": [50000, 40000, 60000, 45000, 55000, 48000, 52000, 58000, 42000, 62000, 59000, 65000]
-                },
-                "retention": {
-                    "retention_rate": 85,
-                    "acquisition_rate": 15
-                }
+                "monthly_sales": results.monthly_sales
             },
-            "sales_data": get_recent_sales_data(),
+            "sales_data": results.sales_data,
             "timestamp": datetime.now().isoformat()
-        }
+        }, degraded + metrics_degraded)
     except Exception as e:
         frappe.log_error(f"Sales Analytics API Error: {str(e)}")
-        return get_fallback_sales_analytics()
+        return fallback("get_sales_analytics", get_fallback_sales_analytics(), e)
 
 
 @frappe.whitelist()
-def get_inventory_analytics():
+@instrument
+@versioned_response
+@dashboard_cache(ttl=3600, groups=[INVENTORY])
+@stamp_versions
+def get_inventory_analytics(company=None, cost_center=None, project=None):
     """API لتحليلات المخزون - Workspace 3"""
-    try:
-        return {
+    filters = get_dashboard_filters(company, cost_center, project)
+    try:
+        fallback_data = get_fallback_inventory_analytics()
+        fallback_metrics = fallback_data["metrics"]
+        # دوران المخزون أبطأ المؤشرات، فيُحسب في خيط مستقل عن بقية المؤشرات
+        results, degraded = evaluate_metrics({
+            "metrics": partial(compute_metrics, INVENTORY_METRICS),
+            "stock_turnover": partial(compute_metrics, ["stock_turnover"]),
+            "stock_movement": get_stock_movement_chart,
+            "top_selling": get_top_selling_chart,
+            "inventory_data": get_inventory_items_data
+        }, filters, fallbacks={
+            "metrics": (frappe._dict(fallback_metrics, warehouse_value=fallback_metrics["warehouses"]), []),
+            "stock_turnover": (frappe._dict(stock_turnover=fallback_metrics["stock_turnover"]), []),
+            "stock_movement": {"labels": [], "inbound": [], "outbound": []},
+            "top_selling": {"labels": [], "data": []},
+            "inventory_data": fallback_data["inventory_data"]
+        })
+        # المؤشرات التي قدمها السجل بقيمتها الاحتياطية داخل مهمة ناجحة
+        metrics, metrics_degraded = results.metrics
+        turnover, turnover_degraded = results.stock_turnover
+        degraded += metrics_degraded + turnover_degraded
+        return mark_degraded({
             "status": "success",
             "metrics": {
-                "inventory_value": get_inventory_value_total(),
-                "total_items": get_total_items_count(),
-                "low_stock": get_low_stock_count(),
-                "stock_turnover": get_stock_turnover_rate(),
-                "warehouses": get_total_warehouse_value(),
-                "stock_movements": get_stock_movements_count()
+                "inventory_value": metrics.inventory_value,
+                "total_items": metrics.total_items,
+                "low_stock": metrics.low_stock,
+                "stock_turnover": turnover.stock_turnover,
+                "warehouses": metrics.warehouse_value,
+                "stock_movements": metrics.stock_movements
             },
             "charts": {
-                "stock_movement": {
-                    "labels": ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو", "يوليو", "أغسطس", "سبتمبر", "أكتوبر"],
-                    "inbound": [120, 150, 180, 140, 160, 190, 170, 200, 150, 180],
-                    "outbound": [100, 130, 160, 120, 140, 170, 150, 180, 130, 160]
-                },
-                "top_selling": {
-                    "labels": ["لابتوب ديل", "ماوس لاسلكي", "كيبورد عربي", "شاشة سامسونج", "طابعة HP"],
-                    "data": [85, 70, 60, 45, 30]
-                },
-                "distribution": {
-                    "main_stock": 90.1,
-                    "sub_stock": 8.1,
-                    "damaged": 1.8,
-                    "returned": 0.034
-                }
+                "stock_movement": results.stock_movement,
+                "top_selling": results.top_selling
             },
-            "inventory_data": get_inventory_items_data(),
+            "inventory_data": results.inventory_data,
             "timestamp": datetime.now().isoformat()
-        }
+        }, degraded)
     except Exception as e:
         frappe.log_error(f"Inventory Analytics API Error: {str(e)}")
-        return get_fallback_inventory_analytics()
+        return fallback("get_inventory_analytics", get_fallback_inventory_analytics(), e)
+
+
+@instrument
+def get_stock_movement_chart(filters=None):
+    """الوارد والصادر لآخر 10 أشهر (من نفس تمريرة حساب دوران المخزون)"""
+    series = get_stock_movement_series(12, filters=filters)[-10:]
+    return {
+        "labels": get_month_labels(series),
+        "inbound": [month.inbound for month in series],
+        "outbound": [month.outbound for month in series]
+    }
+
+
+@instrument
+def get_top_selling_chart(filters=None):
+    """أعلى 5 أصناف مبيعاً بالكمية"""
+    items = get_top_selling_items(5, filters=filters)
+    return {
+        "labels": [item.item_name for item in items],
+        "data": [flt(item.qty) for item in items]
+    }
 
 
 # ===== Number Cards API for Workspaces =====
 
+def resolve_number_cards(card_names, filters=None, siblings=()):
+    """حساب قيم البطاقات مع تخزين كل بطاقة في Redis حسب مجموعة بياناتها وأبعاد التصفية
+
+    البطاقات غير المخزنة تُحسب معاً في خطة واحدة مع siblings غير المخزنة (تُفحص فقط
+    عند وجود بطاقة غير مخزنة)، والقيم الاحتياطية لا تُخزن.
+    """
+    cache = frappe.cache()
+    values = {}
+    keys = {}
+
+    def get_missing(names):
+        for name in names:
+            keys[name] = get_cache_key(f"number_card:{name}", filters, groups=get_metric_groups([NUMBER_CARDS[name]]))
+            value = cache.get_value(keys[name])
+            record_cache(f"number_card:{name}", value is not None)
+            if value is not None:
+                values[name] = value
+        return [name for name in names if name not in values]
+
+    missing = get_missing(card_names)
+    if missing:
+        missing += get_missing([name for name in siblings if name not in keys])
+        metric_values, degraded = compute_metrics([NUMBER_CARDS[name] for name in missing], filters)
+        for name in missing:
+            metric = NUMBER_CARDS[name]
+            values[name] = metric_values[metric]
+            if metric not in degraded:
+                cache.set_value(keys[name], values[name], expires_in_sec=NUMBER_CARD_TTL)
+    return {name: values[name] for name in card_names}
+
+
+def get_number_card_value(card_name, filters=None):
+    """قيمة بطاقة واحدة، وأول بطاقة غير مخزنة تحسب بقية بطاقات الـ workspace معها
+
+    Frappe يطلب كل Number Card وحدها، فتجد البطاقات التالية قيمها في Redis
+    بدل أن تكرر كل بطاقة استعلامات مصدرها.
+    """
+    siblings = next((cards for cards in WORKSPACE_NUMBER_CARDS if card_name in cards), [])
+    return {"value": resolve_number_cards([card_name], filters, siblings)[card_name]}
+
+
 @frappe.whitelist()
-def get_current_balance():
+@instrument
+def get_current_balance(company=None, cost_center=None, project=None):
     """رقم الرصيد الحالي للـ workspace"""
-    try:
-        balance = get_current_balance_value()
-        return {"value": balance}
-    except:
-        return {"value": 110000000}
+    return get_number_card_value("get_current_balance", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_monthly_sales():
+@instrument
+def get_monthly_sales(company=None, cost_center=None, project=None):
     """رقم المبيعات الشهرية للـ workspace"""
-    try:
-        sales = get_monthly_sales_value()
-        return {"value": sales}
-    except:
-        return {"value": 500000000}
+    return get_number_card_value("get_monthly_sales", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_accounts_receivable():
+@instrument
+def get_accounts_receivable(company=None, cost_center=None, project=None):
     """رقم الحسابات المدينة للـ workspace"""
-    try:
-        receivable = get_accounts_receivable_value()
-        return {"value": receivable}
-    except:
-        return {"value": 300000000}
+    return get_number_card_value("get_accounts_receivable", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_net_profit():
+@instrument
+def get_net_profit(company=None, cost_center=None, project=None):
     """رقم صافي الربح للـ workspace"""
-    try:
-        profit = get_net_profit_value()
-        return {"value": profit}
-    except:
-        return {"value": 170000000}
+    return get_number_card_value("get_net_profit", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_total_sales():
+@instrument
+def get_total_sales(company=None, cost_center=None, project=None):
     """إجمالي المبيعات للـ workspace"""
-    try:
-        total = get_total_sales_value()
-        return {"value": total}
-    except:
-        return {"value": 35000}
+    return get_number_card_value("get_total_sales", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_invoice_count():
+@instrument
+def get_invoice_count(company=None, cost_center=None, project=None):
     """عدد الفواتير للـ workspace"""
-    try:
-        count = get_invoice_count_value()
-        return {"value": count}
-    except:
-        return {"value": 350}
+    return get_number_card_value("get_invoice_count", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_avg_invoice_value():
+@instrument
+def get_avg_invoice_value(company=None, cost_center=None, project=None):
     """متوسط قيمة الفاتورة للـ workspace"""
-    try:
-        avg = get_avg_order_value()
-        return {"value": avg}
-    except:
-        return {"value": 350}
+    return get_number_card_value("get_avg_invoice_value", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_inventory_value():
+@instrument
+def get_inventory_value(company=None, cost_center=None, project=None):
     """قيمة المخزون للـ workspace"""
-    try:
-        value = get_inventory_value_total()
-        return {"value": value}
-    except:
-        return {"value": 35000}
+    return get_number_card_value("get_inventory_value", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_items_count():
+@instrument
+def get_items_count(company=None, cost_center=None, project=None):
     """عدد الأصناف للـ workspace"""
-    try:
-        count = get_total_items_count()
-        return {"value": count}
-    except:
-        return {"value": 0}
+    return get_number_card_value("get_items_count", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_low_stock_items():
+@instrument
+def get_low_stock_items(company=None, cost_center=None, project=None):
     """الأصناف منخفضة المخزون للـ workspace"""
-    try:
-        count = get_low_stock_count()
-        return {"value": count}
-    except:
-        return {"value": 2}
+    return get_number_card_value("get_low_stock_items", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_total_revenue():
+@instrument
+def get_total_revenue(company=None, cost_center=None, project=None):
     """إجمالي الإيرادات للـ workspace"""
-    try:
-        revenue = get_total_revenue_value()
-        return {"value": revenue}
-    except:
-        return {"value": "539K"}
+    return get_number_card_value("get_total_revenue", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_growth_rate():
+@instrument
+def get_growth_rate(company=None, cost_center=None, project=None):
     """معدل النمو للـ workspace"""
-    try:
-        rate = get_growth_rate_value()
-        return {"value": rate}
-    except:
-        return {"value": "12%"}
+    return get_number_card_value("get_growth_rate", get_dashboard_filters(company, cost_center, project))
 
 
 @frappe.whitelist()
-def get_operational_efficiency():
+@instrument
+def get_operational_efficiency(company=None, cost_center=None, project=None):
     """كفاءة العمليات للـ workspace"""
-    try:
-        efficiency = get_operational_efficiency_value()
-        return {"value": efficiency}
-    except:
-        return {"value": "92%"}
-
+    return get_number_card_value("get_operational_efficiency", get_dashboard_filters(company, cost_center, project))
+
+
+# ===== Number Cards Registry =====
+
+NUMBER_CARD_TTL = 3600
+
+# كل بطاقة -> المؤشر المعرّف في metrics.METRICS (المجموعات والتنسيق والقيمة الاحتياطية من هناك)
+NUMBER_CARDS = {
+    "get_current_balance": "current_balance",
+    "get_monthly_sales": "monthly_sales",
+    "get_accounts_receivable": "accounts_receivable",
+    "get_net_profit": "net_profit",
+    "get_total_sales": "total_sales",
+    "get_invoice_count": "invoice_count",
+    "get_avg_invoice_value": "avg_order",
+    "get_inventory_value": "inventory_value",
+    "get_items_count": "total_items",
+    "get_low_stock_items": "low_stock",
+    "get_total_revenue": "total_revenue",
+    "get_growth_rate": "growth_rate",
+    "get_operational_efficiency": "operational_efficiency",
+}
+
+# بطاقات كل workspace كما في workspace/*.json و install.py
+WORKSPACE_NUMBER_CARDS = [
+    ["get_current_balance", "get_monthly_sales", "get_accounts_receivable", "get_net_profit"],
+    ["get_total_sales", "get_invoice_count", "get_avg_invoice_value"],
+    ["get_inventory_value", "get_items_count", "get_low_stock_items"],
+    ["get_total_revenue", "get_growth_rate", "get_operational_efficiency"],
+]
+
+# مؤشرات كل workspace (تُحسب معاً فتتشارك المؤشرات من نفس المصدر استعلاماً واحداً)
+OVERVIEW_METRICS = ["current_balance", "monthly_sales", "accounts_receivable", "net_profit"]
+SALES_ANALYTICS_METRICS = ["total_sales", "invoice_count", "avg_order", "conversion_rate"]
+INVENTORY_METRICS = ["inventory_value", "total_items", "low_stock", "warehouse_value", "stock_movements"]
 
-# ===== Helper Functions for Real Data =====
 
-def get_current_balance_value():
-    """الحصول على الرصيد الحالي الحقيقي"""
-    try:
-        balance = frappe.db.sql("""
-            SELECT COALESCE(SUM(debit - credit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE account_type = 'Cash' AND is_group = 0
-            )
-            AND is_cancelled = 0
-        """)[0][0] or 0
-        return flt(balance)
-    except:
-        return 110000000
-
-
-def get_monthly_sales_value():
-    """الحصول على المبيعات الشهرية الحقيقية"""
-    try:
-        month_start = get_first_day(nowdate())
-        month_end = get_last_day(nowdate())
-        
-        sales = frappe.db.sql("""
-            SELECT COALESCE(SUM(grand_total), 0)
-            FROM `tabSales Invoice`
-            WHERE posting_date BETWEEN %s AND %s
-            AND docstatus = 1
-        """, (month_start, month_end))[0][0] or 0
-        return flt(sales)
-    except:
-        return 500000000
-
-
-def get_accounts_receivable_value():
-    """الحصول على الحسابات المدينة الحقيقية"""
-    try:
-        receivable = frappe.db.sql("""
-            SELECT COALESCE(SUM(outstanding_amount), 0)
-            FROM `tabSales Invoice`
-            WHERE docstatus = 1 AND outstanding_amount > 0
-        """)[0][0] or 0
-        return flt(receivable)
-    except:
-        return 300000000
-
-
-def get_net_profit_value():
-    """الحصول على صافي الربح الحقيقي"""
-    try:
-        month_start = get_first_day(nowdate())
-        month_end = get_last_day(nowdate())
-        
-        # الإيرادات
-        revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(credit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE root_type = 'Income' AND is_group = 0
-            )
-            AND posting_date BETWEEN %s AND %s
-            AND is_cancelled = 0
-        """, (month_start, month_end))[0][0] or 0
-        
-        # المصروفات
-        expenses = frappe.db.sql("""
-            SELECT COALESCE(SUM(debit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE root_type = 'Expense' AND is_group = 0
-            )
-            AND posting_date BETWEEN %s AND %s
-            AND is_cancelled = 0
-        """, (month_start, month_end))[0][0] or 0
-        
-        return flt(revenue - expenses)
-    except:
-        return 170000000
+@frappe.whitelist()
+@instrument
+@dashboard_cache(ttl=3600, groups=[CASH, SALES, PNL])
+def get_kpi_comparison(metrics=None, period="mtd", compare="previous_period", from_date=None, to_date=None,
+                       company=None, cost_center=None, project=None):
+    """API لمقارنة المؤشرات بين فترتين
+
+    metrics: قائمة (أو JSON / نص مفصول بفواصل) من COMPARISON_METRICS
+    period: mtd / qtd / ytd / custom (مع from_date و to_date)
+    compare: previous_period / same_period_last_year
+    """
+    if isinstance(metrics, str):
+        metrics = frappe.parse_json(metrics) if metrics.startswith("[") else metrics.split(",")
+    filters = get_dashboard_filters(company, cost_center, project)
+    return {
+        "status": "success",
+        "comparisons": {
+            metric: compare_metric(metric, period, compare, from_date, to_date, filters)
+            for metric in [metric.strip() for metric in (metrics or COMPARISON_METRICS)]
+        },
+        "timestamp": datetime.now().isoformat()
+    }
 
 
-def get_total_sales_value():
-    """إجمالي المبيعات"""
-    try:
-        total = frappe.db.sql("""
-            SELECT COALESCE(SUM(grand_total), 0)
-            FROM `tabSales Invoice`
-            WHERE docstatus = 1
-        """)[0][0] or 0
-        return flt(total)
-    except:
-        return 35000
-
-
-def get_invoice_count_value():
-    """عدد الفواتير"""
-    try:
-        count = frappe.db.sql("""
-            SELECT COUNT(*)
-            FROM `tabSales Invoice`
-            WHERE docstatus = 1
-        """)[0][0] or 0
-        return count
-    except:
-        return 350
-
-
-def get_avg_order_value():
-    """متوسط قيمة الطلب"""
-    try:
-        avg = frappe.db.sql("""
-            SELECT COALESCE(AVG(grand_total), 0)
-            FROM `tabSales Invoice`
-            WHERE docstatus = 1
-        """)[0][0] or 0
-        return flt(avg)
-    except:
-        return 350
-
-
-def get_conversion_rate_value():
-    """معدل التحويل"""
+@instrument
+def get_recent_sales_data(filters=None):
+    """بيانات المبيعات الحديثة"""
     try:
-        # حساب معدل التحويل من العروض إلى المبيعات
-        quotes = frappe.db.sql("SELECT COUNT(*) FROM `tabQuotation` WHERE docstatus = 1")[0][0] or 1
-        orders = frappe.db.sql("SELECT COUNT(*) FROM `tabSales Order` WHERE docstatus = 1")[0][0] or 0
-        return flt((orders / quotes) * 100)
-    except:
-        return 35
+        return get_invoices_page(page_size=10, filters=filters)["data"]
+    except Exception as e:
+        return fallback("get_recent_sales_data", [], e)
 
 
-def get_inventory_value_total():
-    """إجمالي قيمة المخزون"""
-    try:
-        value = frappe.db.sql("""
-            SELECT COALESCE(SUM(stock_value), 0)
-            FROM `tabStock Ledger Entry`
-            WHERE is_cancelled = 0
-        """)[0][0] or 0
-        return flt(value)
-    except:
-        return 35000
-
-
-def get_total_items_count():
-    """عدد الأصناف الإجمالي"""
-    try:
-        count = frappe.db.sql("""
-            SELECT COUNT(*)
-            FROM `tabItem`
-            WHERE disabled = 0
-        """)[0][0] or 0
-        return count
-    except:
-        return 0
-
-
-def get_low_stock_count():
-    """عدد الأصناف منخفضة المخزون"""
-    try:
-        count = frappe.db.sql("""
-            SELECT COUNT(DISTINCT item_code)
-            FROM `tabBin`
-            WHERE actual_qty <= reorder_level
-            AND reorder_level > 0
-        """)[0][0] or 0
-        return count
-    except:
-        return 2
-
-
-def get_stock_turnover_rate():
-    """معدل دوران المخزون"""
+@frappe.whitelist()
+@instrument
+def get_recent_invoices(cursor=None, page_size=20, status=None, customer=None,
+                        from_date=None, to_date=None, columns=None,
+                        company=None, cost_center=None, project=None):
+    """API لفواتير المبيعات مع ترقيم بالمؤشر وفلاتر الحالة والعميل والتاريخ
+
+    columns: قائمة (أو JSON / نص مفصول بفواصل) بالأعمدة المطلوبة
+    """
+    if isinstance(columns, str):
+        columns = frappe.parse_json(columns) if columns.startswith("[") else columns.split(",")
+    page = get_invoices_page(
+        cursor=cursor,
+        page_size=page_size,
+        status=status,
+        customer=customer,
+        from_date=from_date,
+        to_date=to_date,
+        columns=[column.strip() for column in columns] if columns else None,
+        filters=get_dashboard_filters(company, cost_center, project)
+    )
+    page["status"] = "success"
+    return page
+
+
+@instrument
+def get_inventory_items_data(filters=None):
+    """بيانات أصناف المخزون"""
     try:
-        # حساب معدل دوران المخزون
-        return 2.5
-    except:
-        return 2
+        return get_inventory_page(page_size=20, filters=filters)["data"]
+    except Exception as e:
+        return fallback("get_inventory_items_data", [], e)
 
 
-def get_total_warehouse_value():
-    """إجمالي قيمة المستودعات"""
-    try:
-        value = frappe.db.sql("""
-            SELECT COALESCE(SUM(stock_value), 0)
-            FROM `tabStock Ledger Entry`
-            WHERE is_cancelled = 0
-        """)[0][0] or 0
-        return format_currency(value)
-    except:
-        return "20.9M"
-
-
-def get_stock_movements_count():
-    """عدد حركات المخزون"""
-    try:
-        count = frappe.db.sql("""
-            SELECT COUNT(*)
-            FROM `tabStock Entry`
-            WHERE docstatus = 1
-            AND posting_date >= %s
-        """, (add_months(nowdate(), -1),))[0][0] or 0
-        return count
-    except:
-        return 0
-
-
-def get_total_revenue_value():
-    """إجمالي الإيرادات الحقيقي"""
-    try:
-        revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(credit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE root_type = 'Income' AND is_group = 0
-            )
-            AND is_cancelled = 0
-        """)[0][0] or 0
-        return format_currency(revenue)
-    except:
-        return "539K"
-
-
-def get_growth_rate_value():
-    """معدل النمو الحقيقي"""
-    try:
-        # حساب معدل النمو مقارنة بالسنة الماضية
-        current_year_start = datetime(datetime.now().year, 1, 1).date()
-        last_year_start = datetime(datetime.now().year - 1, 1, 1).date()
-        last_year_end = datetime(datetime.now().year - 1, 12, 31).date()
-        
-        current_revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(credit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE root_type = 'Income' AND is_group = 0
-            )
-            AND posting_date >= %s
-            AND is_cancelled = 0
-        """, (current_year_start,))[0][0] or 0
-        
-        last_revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(credit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE root_type = 'Income' AND is_group = 0
-            )
-            AND posting_date BETWEEN %s AND %s
-            AND is_cancelled = 0
-        """, (last_year_start, last_year_end))[0][0] or 1
-        
-        growth_rate = ((current_revenue - last_revenue) / last_revenue) * 100
-        return f"{growth_rate:.1f}%"
-    except:
-        return "12%"
+@frappe.whitelist()
+@instrument
+def get_inventory_valuation(as_of_date=None, company=None):
+    """API لقيمة المخزون حسب المستودع ومجموعة الأصناف في تاريخ محدد أو حالياً"""
+    valuation = frappe._dict(get_stock_valuation(as_of_date, get_dashboard_filters(company)))
+    valuation["status"] = "success"
+    return valuation
 
 
-def get_operational_efficiency_value():
-    """كفاءة العمليات الحقيقية"""
-    try:
-        # حساب كفاءة العمليات بناءً على نسبة المصروفات للإيرادات
-        month_start = get_first_day(nowdate())
-        month_end = get_last_day(nowdate())
-        
-        revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(credit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE root_type = 'Income' AND is_group = 0
-            )
-            AND posting_date BETWEEN %s AND %s
-            AND is_cancelled = 0
-        """, (month_start, month_end))[0][0] or 1
-        
-        expenses = frappe.db.sql("""
-            SELECT COALESCE(SUM(debit), 0)
-            FROM `tabGL Entry`
-            WHERE account IN (
-                SELECT name FROM `tabAccount` 
-                WHERE root_type = 'Expense' AND is_group = 0
-            )
-            AND posting_date BETWEEN %s AND %s
-            AND is_cancelled = 0
-        """, (month_start, month_end))[0][0] or 0
-        
-        efficiency = ((revenue - expenses) / revenue) * 100
-        return f"{efficiency:.0f}%"
-    except:
-        return "92%"
+@frappe.whitelist()
+@instrument
+def get_low_stock_list(limit=50, warehouse=None, company=None):
+    """API لقائمة الأصناف المنخفضة من الفهرس المحدّث تلقائياً"""
+    return {
+        "status": "success",
+        "count": get_low_stock_item_count(company),
+        "data": get_low_stock_entries(min(cint(limit) or 50, 500), warehouse, company)
+    }
 
 
-def get_recent_sales_data():
-    """بيانات المبيعات الحديثة"""
-    try:
-        data = frappe.db.sql("""
-            SELECT 
-                name as invoice_number,
-                customer_name,
-                grand_total as amount,
-                posting_date as payment_date,
-                CASE 
-                    WHEN outstanding_amount = 0 THEN 'paid'
-                    WHEN due_date < CURDATE() THEN 'overdue'
-                    ELSE 'pending'
-                END as status,
-                CASE 
-                    WHEN outstanding_amount = 0 THEN 'مدفوع'
-                    WHEN due_date < CURDATE() THEN 'متأخر'
-                    ELSE 'معلق'
-                END as status_label,
-                'نقدي' as payment_method
-            FROM `tabSales Invoice`
-            WHERE docstatus = 1
-            ORDER BY posting_date DESC
-            LIMIT 10
-        """, as_dict=True)
-        return data
-    except:
-        return []
-
-
-def get_inventory_items_data():
-    """بيانات أصناف المخزون"""
-    try:
-        data = frappe.db.sql("""
-            SELECT 
-                i.item_code,
-                i.item_name,
-                COALESCE(b.actual_qty, 0) as available_qty,
-                COALESCE(b.reorder_level, 0) as min_qty,
-                i.stock_uom as uom,
-                COALESCE(ip.price_list_rate, 0) as price,
-                CASE 
-                    WHEN COALESCE(b.actual_qty, 0) = 0 THEN 'out'
-                    WHEN COALESCE(b.actual_qty, 0) <= COALESCE(b.reorder_level, 0) THEN 'low'
-                    ELSE 'available'
-                END as status,
-                CASE 
-                    WHEN COALESCE(b.actual_qty, 0) = 0 THEN 'نفد'
-                    WHEN COALESCE(b.actual_qty, 0) <= COALESCE(b.reorder_level, 0) THEN 'منخفض'
-                    ELSE 'متوفر'
-                END as status_label
-            FROM `tabItem` i
-            LEFT JOIN `tabBin` b ON i.item_code = b.item_code
-            LEFT JOIN `tabItem Price` ip ON i.item_code = ip.item_code
-            WHERE i.disabled = 0
-            ORDER BY i.item_name
-            LIMIT 20
-        """, as_dict=True)
-        return data
-    except:
-        return []
+@frappe.whitelist()
+@instrument
+def get_inventory_grid(cursor=None, page_size=20, search=None, warehouse=None, price_list=None,
+                       company=None):
+    """API لجدول المخزون مع ترقيم بالمؤشر والبحث وفلتر المستودع والشركة"""
+    page = get_inventory_page(
+        cursor=cursor,
+        page_size=page_size,
+        search=search,
+        warehouse=warehouse,
+        price_list=price_list,
+        filters=get_dashboard_filters(company)
+    )
+    page["status"] = "success"
+    return page
 
 
 @frappe.whitelist()
-def get_advanced_analytics():
+@instrument
+@dashboard_cache(ttl=3600, groups=[PNL])
+def get_advanced_analytics(company=None, cost_center=None, project=None):
     """API للتحليلات المتقدمة"""
+    filters = get_dashboard_filters(company, cost_center, project)
     try:
+        analytics = get_advanced_metrics(filters=filters)
+        trends, forecast, yearly = analytics.trends, analytics.forecast, analytics.yearly
         return {
             "status": "success",
             "charts": {
                 "trends": {
-                    "labels": ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو", "يوليو", "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر"],
-                    "revenue": [65, 70, 68, 75, 72, 78, 80, 85, 82, 88, 90, 95],
-                    "expenses": [45, 48, 50, 52, 49, 55, 58, 60, 57, 62, 65, 68],
-                    "profit": [20, 22, 18, 23, 23, 23, 22, 25, 25, 26, 25, 27]
+                    "labels": [ARABIC_MONTHS[month - 1] for month in trends["months"]],
+                    "revenue": [value / 1000 for value in trends["revenue"]],
+                    "expenses": [value / 1000 for value in trends["expenses"]],
+                    "profit": [value / 1000 for value in trends["profit"]],
+                    "revenue_moving_average": [value / 1000 for value in trends["revenue_moving_average"]],
+                    "profit_moving_average": [value / 1000 for value in trends["profit_moving_average"]],
+                    "revenue_yoy": trends["revenue_yoy"]
+                },
+                "forecast": {
+                    "labels": [ARABIC_MONTHS[month - 1] for month in forecast["months"]],
+                    "revenue": [value / 1000 for value in forecast["revenue"]],
+                    "expenses": [value / 1000 for value in forecast["expenses"]]
                 },
                 "yearly_comparison": {
-                    "labels": ["2020", "2021", "2022", "2023", "2024"],
-                    "revenue": [800, 950, 1200, 1450, 1650],
-                    "expenses": [600, 720, 850, 980, 1100],
-                    "profit": [200, 230, 350, 470, 550]
+                    "labels": [str(year) for year in yearly["years"]],
+                    "revenue": [value / 1000 for value in yearly["revenue"]],
+                    "expenses": [value / 1000 for value in yearly["expenses"]],
+                    "profit": [value / 1000 for value in yearly["profit"]],
+                    "revenue_growth": yearly["revenue_growth"]
                 }
             },
             "kpis": {
-                "total_revenue": {"value": "539K", "change": 12, "progress": 75},
-                "net_profit": {"value": "110M", "change": 8, "progress": 60},
-                "target_achievement": {"value": "85%", "change": 15, "progress": 85},
-                "operational_efficiency": {"value": "92%", "change": 22, "progress": 92}
+                "total_revenue": {
+                    "value": format_currency(analytics.ytd["revenue"]),
+                    "change": analytics.ytd["revenue_change"],
+                    "progress": min(analytics.target["achievement"], 100)
+                },
+                "net_profit": {
+                    "value": format_currency(analytics.ytd["profit"]),
+                    "change": analytics.ytd["profit_change"],
+                    "progress": min(max(analytics.efficiency["value"], 0), 100)
+                },
+                "target_achievement": {
+                    "value": f"{analytics.target['achievement']:.0f}%",
+                    "change": analytics.target["change"],
+                    "progress": min(analytics.target["achievement"], 100)
+                },
+                "operational_efficiency": {
+                    "value": f"{analytics.efficiency['value']:.0f}%",
+                    "change": analytics.efficiency["change"],
+                    "progress": min(max(analytics.efficiency["value"], 0), 100)
+                }
             },
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         frappe.log_error(f"Advanced Analytics API Error: {str(e)}")
-        return {
+        return fallback("get_advanced_analytics", {
             "status": "success",
             "charts": {},
             "kpis": {},
             "timestamp": datetime.now().isoformat(),
             "note": "بيانات احتياطية"
-        }
+        }, e)
 
 
 # ===== Fallback Functions =====
@@ -1011,30 +841,33 @@ def get_fallback_inventory_analytics():
 
 # Simple API endpoints for testing
 @frappe.whitelist()
-def get_dashboard_data():
+@instrument
+@dashboard_cache(ttl=3600, groups=[CASH, SALES, PNL])
+def get_dashboard_data(company=None, cost_center=None, project=None):
     """API endpoint for dashboard data - simplified version"""
+    filters = get_dashboard_filters(company, cost_center, project)
     try:
-        metrics = get_financial_metrics()
+        metrics = get_financial_metrics(filters)
         return {
             "status": "success",
             "metrics": {
                 "current_balance": metrics["current_balance"]["value"],
                 "accounts": metrics["accounts"]["value"],
                 "sales": metrics["sales"]["value"],
-                "profit": "250M"  # Calculated or fallback
+                "profit": format_currency(get_current_month_totals(filters).profit)
             },
-            "cash_flow": get_cash_flow_data(),
+            "cash_flow": get_cash_flow_data(filters),
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         frappe.log_error(f"Dashboard API Error: {str(e)}")
-        return {
+        return fallback("get_dashboard_data", {
             "status": "success",  # Return success with fallback data
             "metrics": {
                 "current_balance": "110M",
                 "accounts": "500M",
                 "sales": "300M",
-                "profit": "250M"
+                "profit": get_fallback_summary()["profit"]["value"]
             },
             "cash_flow": {
                 "labels": ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو"],
@@ -1042,4 +875,25 @@ def get_dashboard_data():
             },
             "timestamp": datetime.now().isoformat(),
             "note": "Using fallback data due to: " + str(e)
-        }
\ No newline at end of file
+        }, e)
+
+
+# ===== Performance Stats =====
+
+@frappe.whitelist()
+def get_dashboard_stats(name=None):
+    """API لإحصائيات الأداء: الزمن (p50/p95/p99) والاستعلامات والصفوف وإصابة الذاكرة والبيانات الاحتياطية"""
+    frappe.only_for(["System Manager"])
+    return {
+        "status": "success",
+        "stats": get_stats(name),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@frappe.whitelist()
+def reset_dashboard_stats():
+    """API لتصفير إحصائيات الأداء"""
+    frappe.only_for(["System Manager"])
+    reset_stats()
+    return {"status": "success"}
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Cache
+Shared Redis TTL cache with single-flight locking for dashboard endpoints
+"""
+
+from __future__ import unicode_literals
+import time
+import hashlib
+import functools
+import frappe
+from financial_dashboard_final.financial_dashboard_final.invalidation import get_group_versions
+from financial_dashboard_final.financial_dashboard_final.snapshots import get_snapshot
+from financial_dashboard_final.financial_dashboard_final.instrumentation import record_cache, get_request_fallbacks
+from financial_dashboard_final.financial_dashboard_final.executor import mark_degraded
+
+CACHE_PREFIX = "financial_dashboard:cache"
+
+# أقصى مدة يحتفظ فيها طلب واحد بقفل الحساب
+LOCK_TIMEOUT = 60
+# مدة انتظار الطلبات الأخرى لنتيجة صاحب القفل
+LOCK_WAIT = 30
+LOCK_POLL_INTERVAL = 0.2
+
+
+def dashboard_cache(ttl=300, groups=None):
+    """مزخرف لتخزين نتيجة endpoint في Redis لمدة ttl ثانية
+
+    المفتاح يعتمد على الموقع (بادئة Redis) والشركة ومركز التكلفة والمشروع وأدوار المستخدم
+    والمعاملات (بدون شركة = كل الشركات)،
+    وعند انتهاء الصلاحية يحسب طلب واحد فقط النتيجة بينما تنتظرها بقية الطلبات.
+    groups: مجموعات المؤشرات التي تعتمد عليها النتيجة، ويتغير المفتاح عند تغير بياناتها.
+    عند عدم وجود نتيجة مخزنة تُرجع آخر لقطة جاهزة لأدوار المستخدم إن وجدت (ولو قديمة
+    مع as_of، وتُبنى من جديد في الخلفية)، وإلا تُحسب النتيجة تحت القفل.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def compute(*args, **kwargs):
+            """حساب النتيجة مع تعليمها degraded إذا قدمت أي دالة داخلها بيانات احتياطية"""
+            fallbacks = get_request_fallbacks()
+            start = len(fallbacks)
+            result = fn(*args, **kwargs)
+            if len(fallbacks) > start and isinstance(result, dict):
+                degraded = list(result.get("degraded") or [])
+                mark_degraded(result, degraded + [name for name in fallbacks[start:] if name not in degraded])
+            return result
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            group_versions = get_group_version_string(groups)
+            key = get_cache_key(fn.__name__, kwargs, group_versions=group_versions)
+            cache = frappe.cache()
+
+            result = cache.get_value(key)
+            if result is not None:
+                record_cache(fn.__name__, True)
+                return result
+
+            # اللقطات تُبنى لكل شركة فقط، فلا تُستخدم مع مركز تكلفة أو مشروع أو معاملات أخرى
+            if not any(value for name, value in kwargs.items() if name != "company"):
+                snapshot = get_snapshot(fn.__name__, kwargs.get("company"), group_versions)
+                if snapshot is not None:
+                    record_cache(fn.__name__, True)
+                    return snapshot
+
+            record_cache(fn.__name__, False)
+
+            lock_key = cache.make_key(key + ":lock")
+            if cache.set(lock_key, 1, ex=LOCK_TIMEOUT, nx=True):
+                try:
+                    result = compute(*args, **kwargs)
+                    if is_cacheable(result):
+                        cache.set_value(key, result, expires_in_sec=ttl)
+                    return result
+                finally:
+                    cache.delete(lock_key)
+
+            # طلب آخر يحسب النتيجة الآن: ننتظره بدلاً من تكرار الاستعلامات
+            deadline = time.time() + LOCK_WAIT
+            while time.time() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                result = cache.get_value(key)
+                if result is not None:
+                    return result
+                # lock_key مفتاح خام (بعد make_key) مثل cache.set أعلاه، و exists تضيف البادئة مرة ثانية
+                if cache.get(lock_key) is None:
+                    break
+
+            return compute(*args, **kwargs)
+
+        # تستخدمها مهمة اللقطات للحساب المباشر بدون الذاكرة المؤقتة
+        wrapper.compute = compute
+        wrapper.cache_groups = groups
+        return wrapper
+    return decorator
+
+
+def get_cache_key(endpoint, kwargs=None, groups=None, group_versions=None):
+    """مفتاح التخزين: endpoint + الشركة + بصمة الصلاحيات + بصمة المعاملات + إصدارات البيانات"""
+    kwargs = dict(kwargs or {})
+    company = kwargs.pop("company", None) or ""
+    # المعاملات الفارغة (مثل cost_center=None) لا تغير النتيجة فلا تغير المفتاح
+    kwargs = {name: value for name, value in kwargs.items() if value not in (None, "")}
+    args_hash = hashlib.md5(frappe.as_json(kwargs).encode()).hexdigest()[:12] if kwargs else "-"
+    if group_versions is None:
+        group_versions = get_group_version_string(groups)
+    return f"{CACHE_PREFIX}:{endpoint}:{company}:{get_permission_hash()}:{args_hash}:{group_versions}"
+
+
+def get_group_version_string(groups):
+    """إصدارات مجموعات البيانات كنص واحد يدخل في المفتاح"""
+    return "-".join(str(v) for v in get_group_versions(groups)) if groups else "-"
+
+
+def get_permission_hash():
+    """بصمة أدوار المستخدم الحالي حتى لا تتشارك الأدوار المختلفة نفس النتيجة"""
+    roles = sorted(frappe.get_roles())
+    return hashlib.md5(",".join(roles).encode()).hexdigest()[:12]
+
+
+def is_cacheable(result):
+    """لا نخزن الأخطاء أو البيانات الاحتياطية (ومنها ما قدمته دالة داخلية عبر fallback)"""
+    return (
+        isinstance(result, dict)
+        and result.get("status", "success") == "success"
+        and "note" not in result
+        and not result.get("degraded")
+    )
+
+
+def clear_cache(endpoint=None):
+    """حذف النتائج المخزنة لـ endpoint محدد أو لجميع لوحات التحكم"""
+    pattern = f"{CACHE_PREFIX}:{endpoint}:" if endpoint else f"{CACHE_PREFIX}:"
+    frappe.cache().delete_keys(pattern)
+
+
+@frappe.whitelist()
+def clear_dashboard_cache(endpoint=None):
+    """API لإفراغ ذاكرة لوحات التحكم يدوياً"""
+    frappe.only_for(["System Manager", "Accounts Manager"])
+    clear_cache(endpoint)
+    return {"status": "success", "endpoint": endpoint or "all"}
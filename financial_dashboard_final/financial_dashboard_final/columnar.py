@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Columnar Export
+Daily GL, sales and stock aggregates as month-partitioned Parquet or Arrow IPC files for offline BI
+"""
+
+from __future__ import unicode_literals
+import os
+import frappe
+from frappe.utils import flt, cint, getdate, nowdate, add_months, get_first_day, get_last_day
+from financial_dashboard_final.financial_dashboard_final.rollup import (
+    GL_ROLLUP_TABLE, SALES_ROLLUP_TABLE, is_rollup_ready
+)
+from financial_dashboard_final.financial_dashboard_final.stock_analytics import SALES_VOUCHERS
+
+DIRTY_DAYS_KEY = "financial_dashboard:columnar_dirty_days"
+EXPORTED_DEFAULT = "financial_dashboard_columnar_exported"
+
+# الصيغ المدعومة: parquet (مضغوط للأدوات) أو arrow (Arrow IPC يُقرأ بـ memory map بدون نسخ)
+FORMATS = {
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+DEFAULT_FORMAT = "parquet"
+PARTITION_FIELD = "posting_month"
+
+# الأعمدة التي يُجمع بها الملخص افتراضياً
+DEFAULT_GROUP_BY = ("company", PARTITION_FIELD)
+
+# الأشهر المعاد تصديرها يومياً حتى مع عدم وجود أحداث (القيود المتأخرة والمعدلة مباشرة)
+TRAILING_MONTHS = 1
+
+# مجموعة البيانات -> الأعمدة وأنواعها، والاستعلام من جدول التجميع أو من الجداول الأصلية
+# كل الاستعلامات تأخذ %(from_date)s و %(to_date)s وترجع الأعمدة بنفس الترتيب
+COLUMNAR_DATASETS = {
+    "gl_daily": {
+        "columns": [
+            ("company", "string"), ("posting_date", "date"), ("account", "string"),
+            ("cost_center", "string"), ("project", "string"), ("root_type", "string"),
+            ("account_type", "string"), ("debit", "float"), ("credit", "float"),
+        ],
+        "rollup_query": f"""
+            SELECT company, posting_date, account, cost_center, project, root_type, account_type,
+                debit, credit
+            FROM `{GL_ROLLUP_TABLE}`
+            WHERE posting_date BETWEEN %(from_date)s AND %(to_date)s
+            ORDER BY posting_date
+        """,
+        "query": """
+            SELECT gle.company, gle.posting_date, gle.account,
+                IFNULL(gle.cost_center, ''), IFNULL(gle.project, ''),
+                acc.root_type, acc.account_type,
+                SUM(gle.debit), SUM(gle.credit)
+            FROM `tabGL Entry` gle
+            INNER JOIN `tabAccount` acc ON acc.name = gle.account
+            WHERE gle.posting_date BETWEEN %(from_date)s AND %(to_date)s
+            AND gle.is_cancelled = 0
+            GROUP BY gle.company, gle.posting_date, gle.account,
+                IFNULL(gle.cost_center, ''), IFNULL(gle.project, ''),
+                acc.root_type, acc.account_type
+            ORDER BY gle.posting_date
+        """,
+    },
+    "sales_daily": {
+        "columns": [
+            ("company", "string"), ("posting_date", "date"), ("cost_center", "string"),
+            ("project", "string"), ("invoice_count", "int"), ("grand_total", "float"),
+        ],
+        "rollup_query": f"""
+            SELECT company, posting_date, cost_center, project, invoice_count, grand_total
+            FROM `{SALES_ROLLUP_TABLE}`
+            WHERE posting_date BETWEEN %(from_date)s AND %(to_date)s
+            ORDER BY posting_date
+        """,
+        "query": """
+            SELECT company, posting_date, IFNULL(cost_center, ''), IFNULL(project, ''),
+                COUNT(*), SUM(grand_total)
+            FROM `tabSales Invoice`
+            WHERE posting_date BETWEEN %(from_date)s AND %(to_date)s
+            AND docstatus = 1
+            GROUP BY company, posting_date, IFNULL(cost_center, ''), IFNULL(project, '')
+            ORDER BY posting_date
+        """,
+    },
+    # لا يوجد جدول تجميع للمخزون: التجميع اليومي من Stock Ledger Entry مباشرة
+    "stock_daily": {
+        "columns": [
+            ("company", "string"), ("posting_date", "date"), ("warehouse", "string"),
+            ("item_group", "string"), ("project", "string"), ("inbound_qty", "float"),
+            ("outbound_qty", "float"), ("stock_value_difference", "float"), ("cogs", "float"),
+        ],
+        "query": """
+            SELECT sle.company, sle.posting_date, sle.warehouse, i.item_group, IFNULL(sle.project, ''),
+                COALESCE(SUM(CASE WHEN sle.actual_qty > 0 THEN sle.actual_qty END), 0),
+                COALESCE(SUM(CASE WHEN sle.actual_qty < 0 THEN -sle.actual_qty END), 0),
+                SUM(sle.stock_value_difference),
+                COALESCE(SUM(CASE WHEN sle.actual_qty < 0 AND sle.voucher_type IN %(sales_vouchers)s
+                    THEN -sle.stock_value_difference END), 0)
+            FROM `tabStock Ledger Entry` sle
+            INNER JOIN `tabItem` i ON i.name = sle.item_code
+            WHERE sle.posting_date BETWEEN %(from_date)s AND %(to_date)s
+            AND sle.is_cancelled = 0
+            GROUP BY sle.company, sle.posting_date, sle.warehouse, i.item_group, IFNULL(sle.project, '')
+            ORDER BY sle.posting_date
+        """,
+    },
+}
+
+
+def is_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_pyarrow():
+    """pyarrow اختياري: يُستورد فقط عند التصدير أو القراءة"""
+    if not is_available():
+        frappe.throw("pyarrow is required for the columnar export (pip install pyarrow)")
+    import pyarrow
+    import pyarrow.dataset
+    import pyarrow.feather
+    import pyarrow.fs
+    import pyarrow.parquet
+    return pyarrow
+
+
+def get_export_dir():
+    """مجلد الملفات من site_config (financial_dashboard_columnar_path) أو مجلد الموقع الخاص"""
+    return frappe.conf.get("financial_dashboard_columnar_path") or frappe.get_site_path(
+        "private", "financial_dashboard_columnar"
+    )
+
+
+def get_export_format():
+    file_format = frappe.conf.get("financial_dashboard_columnar_format") or DEFAULT_FORMAT
+    if file_format not in FORMATS:
+        frappe.throw(f"Unsupported columnar format: {file_format}")
+    return file_format
+
+
+def mark_day_dirty(doc, method=None):
+    """doc_event: تسجيل يوم المستند لإعادة تصدير شهره في المهمة اليومية"""
+    if not cint(frappe.conf.get("financial_dashboard_columnar_export")):
+        return
+    posting_date = doc.get("posting_date")
+    if posting_date:
+        day = str(getdate(posting_date))
+        frappe.db.after_commit.add(lambda: frappe.cache().sadd(DIRTY_DAYS_KEY, day))
+
+
+def schedule_export():
+    """مهمة يومية: تصدير الأشهر المتغيرة في طابور long (يتجاوز مهلة المهام المجدولة)"""
+    if not cint(frappe.conf.get("financial_dashboard_columnar_export")):
+        return
+    if not is_available():
+        frappe.logger("financial_dashboard").warning("Columnar export skipped: pyarrow is not installed")
+        return
+    frappe.enqueue(
+        "financial_dashboard_final.financial_dashboard_final.columnar.export_changed_months",
+        queue="long",
+        timeout=4 * 60 * 60
+    )
+
+
+def export_changed_months():
+    """تصدير الأشهر التي تغيرت منذ آخر تصدير، أو كل التاريخ عند أول تشغيل"""
+    if not frappe.db.get_default(EXPORTED_DEFAULT):
+        export_months()
+        return
+
+    cache = frappe.cache()
+    dirty_days = {day.decode() if isinstance(day, bytes) else day for day in cache.smembers(DIRTY_DAYS_KEY)}
+    months = {get_first_day(day) for day in dirty_days}
+    today = getdate(nowdate())
+    months.update(get_first_day(add_months(today, -i)) for i in range(TRAILING_MONTHS + 1))
+
+    for month in sorted(months):
+        export_months(month, get_last_day(month))
+    if dirty_days:
+        cache.srem(DIRTY_DAYS_KEY, *dirty_days)
+
+
+def export_months(from_date=None, to_date=None):
+    """إعادة كتابة أقسام الأشهر بين from_date و to_date لكل مجموعات البيانات
+
+    كل شهر يُقرأ ويُكتب على حدة فيبقى استهلاك الذاكرة بحجم شهر واحد.
+    """
+    get_pyarrow()
+    if not from_date:
+        from_date = frappe.db.sql("SELECT MIN(posting_date) FROM `tabGL Entry`")[0][0]
+    to_date = getdate(to_date or nowdate())
+    if not from_date:
+        return
+
+    month = get_first_day(from_date)
+    while month <= to_date:
+        for dataset in COLUMNAR_DATASETS:
+            rows = get_rows(dataset, month, get_last_day(month))
+            write_partition(dataset, month, rows)
+        month = add_months(month, 1)
+
+    frappe.db.set_default(EXPORTED_DEFAULT, str(to_date))
+    frappe.db.commit()
+
+
+def get_rows(dataset, from_date, to_date):
+    """صفوف التجميع اليومي لفترة من جدول التجميع إن كان جاهزاً"""
+    config = COLUMNAR_DATASETS[dataset]
+    query = config["rollup_query"] if "rollup_query" in config and is_rollup_ready() else config["query"]
+    return frappe.db.sql(query, {
+        "from_date": getdate(from_date),
+        "to_date": getdate(to_date),
+        "sales_vouchers": SALES_VOUCHERS
+    })
+
+
+def write_partition(dataset, month, rows):
+    """كتابة قسم الشهر في ملف مؤقت ثم استبدال القديم (لا يقرأ المحللون ملفاً ناقصاً)
+
+    الشهر بدون صفوف يحذف قسمه، فتختفي المستندات الملغاة من الملفات أيضاً.
+    """
+    pyarrow = get_pyarrow()
+    file_format = get_export_format()
+    directory = os.path.join(get_export_dir(), dataset, f"{PARTITION_FIELD}={month.strftime('%Y-%m')}")
+    path = os.path.join(directory, f"part-0{FORMATS[file_format]}")
+
+    if not rows:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    table = get_table(dataset, rows)
+    temp_path = path + ".tmp"
+    if file_format == "parquet":
+        pyarrow.parquet.write_table(table, temp_path, compression="zstd")
+    else:
+        pyarrow.feather.write_feather(table, temp_path, compression="uncompressed")
+    os.replace(temp_path, path)
+
+
+def get_table(dataset, rows):
+    """جدول Arrow بأنواع ثابتة لكل عمود (فتتطابق الأقسام عند قراءتها معاً)"""
+    pyarrow = get_pyarrow()
+    columns = COLUMNAR_DATASETS[dataset]["columns"]
+    converters = {"string": lambda v: v or "", "date": getdate, "float": flt, "int": cint}
+    types = {"string": pyarrow.string(), "date": pyarrow.date32(), "float": pyarrow.float64(), "int": pyarrow.int64()}
+    return pyarrow.table(
+        {
+            name: pyarrow.array([converters[kind](row[i]) for row in rows], type=types[kind])
+            for i, (name, kind) in enumerate(columns)
+        }
+    )
+
+
+def read_dataset(dataset, from_date=None, to_date=None, columns=None):
+    """قراءة مجموعة بيانات كجدول Arrow مع تصفية الأقسام بالفترة
+
+    ملفات arrow (غير مضغوطة) تُفتح بـ memory map فتشير أعمدة الجدول إلى صفحات الملف
+    بدون نسخها، وملفات parquet تُفك الأعمدة المطلوبة فقط.
+    """
+    pyarrow = get_pyarrow()
+    file_format = get_export_format()
+    partitioning = pyarrow.dataset.partitioning(
+        pyarrow.schema([(PARTITION_FIELD, pyarrow.string())]), flavor="hive"
+    )
+    source = pyarrow.dataset.dataset(
+        os.path.abspath(os.path.join(get_export_dir(), dataset)),
+        format="ipc" if file_format == "arrow" else "parquet",
+        partitioning=partitioning,
+        filesystem=pyarrow.fs.LocalFileSystem(use_mmap=file_format == "arrow")
+    )
+
+    condition = None
+    if from_date:
+        condition = pyarrow.dataset.field("posting_date") >= getdate(from_date)
+        condition &= pyarrow.dataset.field(PARTITION_FIELD) >= getdate(from_date).strftime("%Y-%m")
+    if to_date:
+        to_condition = (pyarrow.dataset.field("posting_date") <= getdate(to_date)) & (
+            pyarrow.dataset.field(PARTITION_FIELD) <= getdate(to_date).strftime("%Y-%m")
+        )
+        condition = to_condition if condition is None else condition & to_condition
+    return source.to_table(columns=columns, filter=condition)
+
+
+def summarize_dataset(dataset, from_date=None, to_date=None, group_by=DEFAULT_GROUP_BY):
+    """مجاميع الأعمدة الرقمية لمجموعة بيانات من الملفات المصدرة بدون استعلام قاعدة البيانات
+
+    ترجع [{عمود التجميع...، <عمود>_sum...}] مرتبة حسب group_by، وتُقرأ الأعمدة المطلوبة
+    فقط من الأقسام الواقعة في الفترة.
+    """
+    if dataset not in COLUMNAR_DATASETS:
+        frappe.throw(f"Unknown columnar dataset: {dataset}")
+    columns = COLUMNAR_DATASETS[dataset]["columns"]
+    names = {name for name, kind in columns} | {PARTITION_FIELD}
+    group_by = list(group_by)
+    unknown = [name for name in group_by if name not in names]
+    if unknown:
+        frappe.throw(f"Unknown columns for {dataset}: {', '.join(unknown)}")
+
+    measures = [name for name, kind in columns if kind in ("float", "int") and name not in group_by]
+    table = read_dataset(dataset, from_date, to_date, columns=group_by + measures)
+    summary = table.group_by(group_by).aggregate([(name, "sum") for name in measures])
+    return sorted(summary.to_pylist(), key=lambda row: [str(row[name]) for name in group_by])
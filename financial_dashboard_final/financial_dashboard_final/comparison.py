@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Period Comparison
+MTD/QTD/YTD/custom KPI values against the previous period or the same period last year
+"""
+
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+from frappe.utils import flt, getdate, nowdate, add_days, add_months, get_first_day, get_quarter_start, date_diff
+from financial_dashboard_final.financial_dashboard_final.aggregates import (
+    get_gl_window_totals, get_sales_window_totals, get_receivable_window_totals
+)
+
+PERIODS = ("mtd", "qtd", "ytd", "custom")
+COMPARISONS = ("previous_period", "same_period_last_year")
+
+# عدد الأشهر التي تُزاح بها الفترة للمقارنة بالفترة السابقة
+PERIOD_MONTHS = {"mtd": 1, "qtd": 3, "ytd": 12}
+
+# المؤشر -> (المصدر، الحقل في GLTotals أو SalesTotals أو ReceivableTotals)
+COMPARISON_METRICS = {
+    "cash_balance": ("gl", "cash_balance"),
+    "cash_flow": ("gl", "cash_flow"),
+    "income": ("gl", "income"),
+    "expense": ("gl", "expense"),
+    "profit": ("gl", "profit"),
+    # نفس مصدر بطاقة المدينين (outstanding_amount) لا رصيد حسابات المدينين في دفتر الأستاذ
+    "receivable": ("receivable", "outstanding"),
+    "sales": ("sales", "grand_total"),
+    "invoice_count": ("sales", "invoice_count"),
+    "average_invoice": ("sales", "average"),
+}
+
+WINDOW_TOTALS = {
+    "gl": get_gl_window_totals,
+    "sales": get_sales_window_totals,
+    "receivable": get_receivable_window_totals,
+}
+
+
+def compare_metric(metric, period="mtd", compare="previous_period", from_date=None, to_date=None, filters=None):
+    """قيمة المؤشر للفترة وقيمة المقارنة ونسبة التغيير
+
+    كل المؤشرات من نفس المصدر تتشارك استعلاماً واحداً للفترتين معاً.
+    """
+    if metric not in COMPARISON_METRICS:
+        frappe.throw(_("Unknown metric: {0}").format(metric))
+
+    current, previous = get_comparison_windows(period, compare, from_date, to_date)
+    source, field = COMPARISON_METRICS[metric]
+    window_totals = WINDOW_TOTALS[source]
+    current_totals, previous_totals = window_totals([current, previous], filters)
+
+    value = flt(getattr(current_totals, field))
+    comparison_value = flt(getattr(previous_totals, field))
+    return frappe._dict({
+        "metric": metric,
+        "value": value,
+        "comparison_value": comparison_value,
+        "change_percent": get_change_percent(value, comparison_value),
+        "period": {"from_date": current[0], "to_date": current[1]},
+        "comparison_period": {"from_date": previous[0], "to_date": previous[1]}
+    })
+
+
+def get_comparison_windows(period="mtd", compare="previous_period", from_date=None, to_date=None):
+    """حدود الفترة الحالية وفترة المقارنة [(بداية، نهاية)، (بداية، نهاية)]"""
+    if period not in PERIODS:
+        frappe.throw(_("Unknown period: {0}").format(period))
+    if compare not in COMPARISONS:
+        frappe.throw(_("Unknown comparison: {0}").format(compare))
+
+    to_date = getdate(to_date or nowdate())
+    if period == "mtd":
+        from_date = get_first_day(to_date)
+    elif period == "qtd":
+        from_date = get_quarter_start(to_date)
+    elif period == "ytd":
+        from_date = getdate(f"{to_date.year}-01-01")
+    elif not from_date:
+        frappe.throw(_("from_date is required for a custom period"))
+    from_date = getdate(from_date)
+    if from_date > to_date:
+        frappe.throw(_("from_date must be before to_date"))
+
+    if compare == "same_period_last_year":
+        previous = (add_months(from_date, -12), add_months(to_date, -12))
+    elif period in PERIOD_MONTHS:
+        months = PERIOD_MONTHS[period]
+        previous = (add_months(from_date, -months), add_months(to_date, -months))
+    else:
+        previous_to = add_days(from_date, -1)
+        previous = (add_days(previous_to, -date_diff(to_date, from_date)), previous_to)
+
+    return (from_date, to_date), (getdate(previous[0]), getdate(previous[1]))
+
+
+def get_change_percent(value, comparison_value):
+    """نسبة التغيير مقربة لمنزلة عشرية واحدة (صفر إذا لم توجد قيمة للمقارنة)"""
+    if not comparison_value:
+        return 0
+    return flt((value - comparison_value) / abs(comparison_value) * 100, 1)
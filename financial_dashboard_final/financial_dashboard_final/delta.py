@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Delta Protocol
+Section-level content versions so clients only download what changed
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import inspect
+import functools
+import frappe
+
+# حقول لا تدخل في حساب الإصدار
+UNVERSIONED_FIELDS = ("status", "timestamp", "version")
+# بيانات اللقطة المقدمة (وقت بنائها وقدمها) تصل مع كل رد ولا تدخل في الإصدار
+SNAPSHOT_FIELDS = ("as_of", "snapshot_age", "stale")
+
+
+def stamp_versions(fn):
+    """مزخرف يضيف إصدار المحتوى للنتيجة مرة واحدة قبل تخزينها مؤقتاً"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        result = fn(*args, **kwargs)
+        if isinstance(result, dict) and result.get("status") == "success":
+            result["version"] = get_payload_version(result)
+        return result
+    return wrapper
+
+
+def versioned_response(fn):
+    """مزخرف يقبل since (آخر إصدار لدى العميل) ويرجع فقط الأقسام المتغيرة
+
+    - نفس الإصدار: {"status": "not_modified", "version": ...}
+    - إصدار مختلف: الأقسام المتغيرة فقط مع "partial": 1
+    - بدون since: الحمولة كاملة
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, since=None, **kwargs):
+        result = fn(*args, **kwargs)
+        if not since or not isinstance(result, dict) or result.get("status") != "success":
+            return result
+
+        version = result.get("version") or get_payload_version(result)
+        if since == version:
+            return dict({
+                "status": "not_modified",
+                "version": version,
+                "timestamp": result.get("timestamp")
+            }, **get_snapshot_fields(result))
+
+        client_sections = parse_version(since)
+        partial = {"status": "success", "version": version, "partial": 1}
+        for section, section_hash in parse_version(version).items():
+            if client_sections.get(section) != section_hash:
+                partial[section] = result.get(section)
+        partial["timestamp"] = result.get("timestamp")
+        partial.update(get_snapshot_fields(result))
+        return partial
+
+    # frappe يمرر فقط المعاملات الموجودة في توقيع الدالة
+    signature = inspect.signature(fn)
+    parameters = [p for p in signature.parameters.values() if p.kind != p.VAR_KEYWORD]
+    parameters.append(inspect.Parameter("since", inspect.Parameter.KEYWORD_ONLY, default=None))
+    parameters.extend(p for p in signature.parameters.values() if p.kind == p.VAR_KEYWORD)
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    return wrapper
+
+
+def get_payload_version(payload):
+    """الإصدار بصيغة section-hash.section-hash بترتيب أبجدي"""
+    return ".".join(
+        f"{section}-{get_section_hash(payload[section])}"
+        for section in sorted(payload)
+        if section not in UNVERSIONED_FIELDS and section not in SNAPSHOT_FIELDS
+    )
+
+
+def get_snapshot_fields(result):
+    return {field: result[field] for field in SNAPSHOT_FIELDS if field in result}
+
+
+def get_section_hash(value):
+    return hashlib.md5(frappe.as_json(value, indent=None).encode()).hexdigest()[:10]
+
+
+def parse_version(version):
+    """تحويل نص الإصدار إلى {القسم: البصمة}"""
+    sections = {}
+    for part in (version or "").split("."):
+        section, _, section_hash = part.rpartition("-")
+        if section:
+            sections[section] = section_hash
+    return sections
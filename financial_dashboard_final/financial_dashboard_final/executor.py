@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Metric Executor
+Concurrent evaluation of independent metric helpers, one database connection per worker
+"""
+
+from __future__ import unicode_literals
+from concurrent.futures import ThreadPoolExecutor, wait
+import frappe
+from frappe.utils import cint, flt
+from financial_dashboard_final.financial_dashboard_final.aggregates import _get_request_cache
+from financial_dashboard_final.financial_dashboard_final.instrumentation import (
+    fallback, is_enabled, start_usage, end_usage, get_worker_usage, add_worker_usage, get_instrument_depth,
+    get_request_fallbacks
+)
+
+# أقصى عدد خيوط لطلب واحد (0 أو 1 = تنفيذ متتابع في اتصال الطلب نفسه)
+DEFAULT_WORKERS = 4
+# مهلة الطلب كاملاً (ثوانٍ)، والمؤشر الذي يتجاوزها يُرجع قيمته الاحتياطية
+DEFAULT_TIMEOUT = 10
+
+
+class MetricTimeoutError(Exception):
+    pass
+
+
+def evaluate_metrics(helpers, filters=None, fallbacks=None, timeout=None):
+    """تشغيل دوال المؤشرات المستقلة معاً وإرجاع ({المفتاح: النتيجة}، مفاتيح القيم الاحتياطية)
+
+    helpers: {المفتاح: دالة تأخذ filters}، fallbacks: {المفتاح: قيمة احتياطية}.
+    كل دالة تعمل في خيط مستقل باتصال قاعدة بيانات خاص، فزمن الطلب هو زمن أبطأ
+    مؤشر لا مجموعها. المؤشر الذي يفشل أو يتجاوز المهلة يأخذ قيمته الاحتياطية وحده
+    دون أن يؤخر بقية المؤشرات أو يستبدل الاستجابة كاملة.
+    """
+    fallbacks = fallbacks or {}
+    results = frappe._dict()
+    degraded = []
+    workers = min(get_worker_count(), len(helpers))
+    if workers <= 1:
+        for key, fn in helpers.items():
+            results[key] = run_metric(fn, filters, fallbacks.get(key), degraded, key)
+        return results, degraded
+
+    timeout = flt(timeout or frappe.conf.get("financial_dashboard_metric_timeout") or DEFAULT_TIMEOUT)
+    context = get_worker_context(timeout)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dashboard-metric")
+    try:
+        futures = {
+            key: executor.submit(run_in_worker, context, fn, filters, fallbacks.get(key), key)
+            for key, fn in helpers.items()
+        }
+        wait(futures.values(), timeout=timeout)
+    finally:
+        # لا ننتظر الخيوط المتأخرة: max_statement_time يوقف استعلاماتها في MariaDB
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for key, future in futures.items():
+        name = getattr(helpers[key], "__name__", key)
+        if not future.done() or future.cancelled():
+            error = MetricTimeoutError(f"{key} exceeded {timeout}s")
+        else:
+            # فشل تهيئة الخيط أو الاتصال نفسه
+            error = future.exception()
+        if error:
+            degraded.append(key)
+            results[key] = fallback(name, fallbacks.get(key), error)
+        else:
+            results[key] = merge_worker_outcome(future.result(), degraded)
+    return results, degraded
+
+
+def merge_worker_outcome(outcome, degraded):
+    """دمج ما سجله خيط مكتمل في حالة الطلب، والخيوط المتأخرة لا تصل إلى هنا أبداً"""
+    degraded.extend(outcome.degraded)
+    get_request_fallbacks().extend(outcome.fallbacks)
+    request_cache = _get_request_cache()
+    for key, value in outcome.request_cache.items():
+        request_cache.setdefault(key, value)
+    if outcome.usage:
+        add_worker_usage(get_worker_usage(), *outcome.usage)
+    return outcome.result
+
+
+def run_metric(fn, filters, fallback_value=None, degraded=None, key=None):
+    """تشغيل دالة واحدة، والاستثناء الذي لم تعالجه الدالة نفسها يُرجع القيمة الاحتياطية"""
+    name = getattr(fn, "__name__", str(fn))
+    try:
+        return fn(filters)
+    except Exception as e:
+        frappe.log_error(f"Dashboard metric {name} failed: {str(e)}")
+        if degraded is not None:
+            degraded.append(key or name)
+        return fallback(name, fallback_value, e)
+
+
+def mark_degraded(response, degraded):
+    """إضافة المؤشرات الاحتياطية إلى الاستجابة، فلا تخزنها dashboard_cache (is_cacheable)"""
+    if degraded:
+        response["degraded"] = degraded
+        response["note"] = "بيانات احتياطية لبعض المؤشرات"
+    return response
+
+
+def get_worker_context(timeout):
+    """ما يحتاجه الخيط لفتح نفس الموقع بنفس المستخدم ونسخة من ذاكرة الطلب"""
+    return frappe._dict(
+        site=frappe.local.site,
+        sites_path=frappe.local.sites_path,
+        user=frappe.session.user,
+        lang=frappe.local.lang,
+        timeout=timeout,
+        request_cache=_get_request_cache(),
+        instrument_depth=get_instrument_depth()
+    )
+
+
+def run_in_worker(context, fn, filters, fallback_value=None, key=None):
+    """تهيئة frappe واتصال قاعدة بيانات خاص بالخيط ثم تشغيل الدالة وإغلاق الاتصال
+
+    الخيط لا يكتب في حالة الطلب: يعمل على نسخة من ذاكرة الطلب وقوائم خاصة به ويرجعها
+    مع النتيجة، ويدمجها evaluate_metrics فقط إذا اكتمل الخيط قبل المهلة.
+    """
+    frappe.init(site=context.site, sites_path=context.sites_path)
+    try:
+        frappe.connect()
+        frappe.set_user(context.user)
+        frappe.local.lang = context.lang
+        # النتائج المحسوبة قبل الإطلاق (مثل مجاميع الشهر الحالي) لا يتكرر استعلامها
+        frappe.local.financial_dashboard_cache = dict(context.request_cache)
+        frappe.local.dashboard_fallbacks = []
+        if frappe.db.db_type == "mariadb":
+            frappe.db.sql("SET SESSION max_statement_time = %s", flt(context.timeout))
+        # الدوال المقاسة داخل الخيط تتبع الاستدعاء الخارجي في خيط الطلب
+        frappe.local.dashboard_instrument_depth = context.instrument_depth
+        usage = start_usage() if is_enabled() and context.instrument_depth else None
+        degraded = []
+        result = run_metric(fn, filters, fallback_value, degraded, key)
+        return frappe._dict(
+            result=result,
+            degraded=degraded,
+            fallbacks=list(get_request_fallbacks()),
+            request_cache=frappe.local.financial_dashboard_cache,
+            usage=end_usage(usage) if usage else None
+        )
+    finally:
+        frappe.destroy()
+
+
+def get_worker_count():
+    """عدد الخيوط من site_config: financial_dashboard_metric_workers"""
+    return cint(frappe.conf.get("financial_dashboard_metric_workers", DEFAULT_WORKERS))
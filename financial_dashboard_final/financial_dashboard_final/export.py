@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Export
+Background, chunked export of detail rows (GL, invoices, stock) to CSV, JSON Lines or XLSX
+"""
+
+from __future__ import unicode_literals
+import os
+import csv
+import json
+from decimal import Decimal
+from itertools import islice
+import frappe
+from frappe import _
+from frappe.utils import getdate, nowdate
+from financial_dashboard_final.financial_dashboard_final.aggregates import get_dimension_conditions, DIMENSIONS
+from financial_dashboard_final.financial_dashboard_final.inventory import COMPANY_WAREHOUSE_CONDITION
+from financial_dashboard_final.financial_dashboard_final.stock_analytics import SLE_DIMENSIONS
+
+EXPORT_PREFIX = "financial_dashboard:export"
+EXPORT_EVENT = "financial_dashboard_export_progress"
+
+# عدد الصفوف المقروءة من المؤشر والمكتوبة في الملف في كل دفعة
+CHUNK_SIZE = 5000
+# مدة الاحتفاظ بحالة التصدير (ثوانٍ)
+STATUS_TTL = 24 * 60 * 60
+EXPORT_TIMEOUT = 4 * 60 * 60
+
+# أقصى عدد صفوف في ورقة Excel (مع صف العناوين)، وما يزيد يُكمل في ورقة جديدة
+XLSX_MAX_ROWS = 1048575
+
+# مجموعة البيانات -> الجدول والأعمدة وشروطها الثابتة وعمود التاريخ وأبعاد التصفية
+EXPORT_DATASETS = {
+    "gl_entries": {
+        "doctype": "GL Entry",
+        "columns": ["name", "posting_date", "account", "party_type", "party", "debit", "credit",
+                    "voucher_type", "voucher_no", "company", "cost_center", "project"],
+        "conditions": ["is_cancelled = 0"],
+        "date_field": "posting_date",
+        "dimensions": DIMENSIONS,
+        "order_by": "posting_date, name",
+    },
+    "sales_invoices": {
+        "doctype": "Sales Invoice",
+        "columns": ["name", "posting_date", "due_date", "customer", "customer_name", "grand_total",
+                    "outstanding_amount", "status", "company", "cost_center", "project"],
+        "conditions": ["docstatus = 1"],
+        "date_field": "posting_date",
+        "dimensions": DIMENSIONS,
+        "order_by": "posting_date, name",
+    },
+    "stock_ledger": {
+        "doctype": "Stock Ledger Entry",
+        "columns": ["name", "posting_date", "posting_time", "item_code", "warehouse", "actual_qty",
+                    "qty_after_transaction", "valuation_rate", "stock_value_difference",
+                    "voucher_type", "voucher_no", "company", "project"],
+        "conditions": ["is_cancelled = 0"],
+        "date_field": "posting_date",
+        "dimensions": SLE_DIMENSIONS,
+        "order_by": "posting_date, posting_time, name",
+    },
+    # الأرصدة الحالية: بدون فترة، والشركة من مستودعاتها
+    "inventory": {
+        "doctype": "Bin",
+        "columns": ["item_code", "warehouse", "actual_qty", "reserved_qty", "projected_qty",
+                    "reorder_level", "valuation_rate", "stock_value"],
+        "conditions": [],
+        "date_field": None,
+        "dimensions": (),
+        "company_warehouses": True,
+        "order_by": "item_code, warehouse",
+    },
+}
+
+
+def start_export(dataset, file_format="csv", from_date=None, to_date=None, filters=None):
+    """التحقق من الطلب وإطلاق مهمة التصدير في الخلفية، وترجع حالة التصدير الأولية"""
+    if dataset not in EXPORT_DATASETS:
+        frappe.throw(_("Unknown export dataset: {0}").format(dataset))
+    if file_format not in WRITERS:
+        frappe.throw(_("Unknown export format: {0}").format(file_format))
+    frappe.has_permission(EXPORT_DATASETS[dataset]["doctype"], "export", throw=True)
+
+    export_id = frappe.generate_hash(length=12)
+    status = set_status(export_id, {
+        "export_id": export_id,
+        "dataset": dataset,
+        "format": file_format,
+        "owner": frappe.session.user,
+        "status": "queued",
+        "rows": 0,
+        "total": None,
+        "progress": 0,
+        "file_url": None
+    })
+    frappe.enqueue(
+        "financial_dashboard_final.financial_dashboard_final.export.run_export",
+        queue="long",
+        timeout=EXPORT_TIMEOUT,
+        export_id=export_id,
+        dataset=dataset,
+        file_format=file_format,
+        from_date=from_date,
+        to_date=to_date,
+        filters=dict(filters or {})
+    )
+    return status
+
+
+def run_export(export_id, dataset, file_format="csv", from_date=None, to_date=None, filters=None):
+    """مهمة خلفية: قراءة الصفوف بمؤشر من جهة الخادم وكتابتها دفعة بدفعة
+
+    لا تُحمل النتيجة كاملة في الذاكرة في أي مرحلة، فيبقى استهلاك الذاكرة ثابتاً
+    مهما كان عدد الصفوف.
+    """
+    config = EXPORT_DATASETS[dataset]
+    filters = frappe._dict(filters or {})
+    query, count_query, values = get_export_queries(config, from_date, to_date, filters)
+    file_name = f"{dataset}_{nowdate()}_{export_id}.{file_format}"
+    path = frappe.get_site_path("private", "files", file_name)
+
+    try:
+        total = frappe.db.sql(count_query, values)[0][0]
+        update_status(export_id, status="running", total=total)
+
+        rows = 0
+        writer = WRITERS[file_format](path, config["columns"], dataset)
+        try:
+            with frappe.db.unbuffered_cursor():
+                cursor = frappe.db.sql(query, values, as_iterator=True)
+                for chunk in iter(lambda: list(islice(cursor, CHUNK_SIZE)), []):
+                    writer.write(chunk)
+                    rows += len(chunk)
+                    update_status(export_id, rows=rows, progress=get_progress(rows, total))
+        finally:
+            writer.close()
+
+        file_doc = frappe.get_doc({
+            "doctype": "File",
+            "file_name": file_name,
+            "file_url": f"/private/files/{file_name}",
+            "is_private": 1
+        }).insert(ignore_permissions=True)
+        frappe.db.commit()
+        update_status(export_id, status="completed", rows=rows, progress=100, file_url=file_doc.file_url)
+    except Exception as e:
+        frappe.db.rollback()
+        if os.path.exists(path):
+            os.remove(path)
+        frappe.log_error(f"Dashboard export {dataset} failed: {str(e)}")
+        update_status(export_id, status="failed", error=str(e))
+
+
+def get_export_queries(config, from_date=None, to_date=None, filters=None):
+    """استعلام الصفوف واستعلام عددها (لنسبة التقدم) مع الفترة وأبعاد التصفية"""
+    values = {}
+    conditions = list(config["conditions"])
+    if config["date_field"]:
+        if from_date:
+            conditions.append(f"{config['date_field']} >= %(from_date)s")
+            values["from_date"] = getdate(from_date)
+        if to_date:
+            conditions.append(f"{config['date_field']} <= %(to_date)s")
+            values["to_date"] = getdate(to_date)
+    conditions += get_dimension_conditions(filters, values, dimensions=config["dimensions"])
+    if config.get("company_warehouses") and (filters or {}).get("company"):
+        conditions.append(COMPANY_WAREHOUSE_CONDITION.format(column="warehouse"))
+        values["company"] = filters.get("company")
+
+    source = "FROM `tab{doctype}` WHERE {conditions}".format(
+        doctype=config["doctype"],
+        conditions=" AND ".join(conditions or ["1 = 1"])
+    )
+    query = "SELECT {columns} {source} ORDER BY {order_by}".format(
+        columns=", ".join(f"`{column}`" for column in config["columns"]),
+        source=source,
+        order_by=config["order_by"]
+    )
+    return query, f"SELECT COUNT(*) {source}", values
+
+
+def get_progress(rows, total):
+    return min(int(rows * 100 / total), 100) if total else 100
+
+
+def get_export_status(export_id):
+    """حالة التصدير لصاحبه فقط (أو لمدير النظام)"""
+    status = frappe.cache().get_value(get_status_key(export_id))
+    if not status or (
+        status["owner"] != frappe.session.user and "System Manager" not in frappe.get_roles()
+    ):
+        frappe.throw(_("Export {0} not found").format(export_id), frappe.DoesNotExistError)
+    return status
+
+
+def set_status(export_id, status):
+    frappe.cache().set_value(get_status_key(export_id), status, expires_in_sec=STATUS_TTL)
+    return status
+
+
+def update_status(export_id, **changes):
+    """تحديث الحالة في Redis ونشرها لصاحب التصدير"""
+    status = frappe.cache().get_value(get_status_key(export_id)) or {"export_id": export_id}
+    status.update(changes)
+    set_status(export_id, status)
+    frappe.publish_realtime(EXPORT_EVENT, status, user=status.get("owner"))
+
+
+def get_status_key(export_id):
+    return f"{EXPORT_PREFIX}:{export_id}"
+
+
+# ===== Writers =====
+
+def to_plain(value):
+    """قيم قابلة للكتابة في كل الصيغ (Decimal -> float)"""
+    return float(value) if isinstance(value, Decimal) else value
+
+
+class CSVWriter(object):
+    def __init__(self, path, columns, title=None):
+        # utf-8-sig حتى يعرض Excel النصوص العربية بشكل صحيح
+        self.file = open(path, "w", newline="", encoding="utf-8-sig")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JSONLinesWriter(object):
+    def __init__(self, path, columns, title=None):
+        self.file = open(path, "w", encoding="utf-8")
+        self.columns = columns
+
+    def write(self, rows):
+        self.file.writelines(
+            json.dumps(dict(zip(self.columns, map(to_plain, row))), default=str, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class XLSXWriter(object):
+    """openpyxl في وضع الكتابة فقط: الصفوف تُكتب إلى ملف مؤقت بدلاً من الذاكرة"""
+
+    def __init__(self, path, columns, title=None):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.columns = columns
+        self.title = (title or "Export")[:28]
+        self.workbook = Workbook(write_only=True)
+        self.sheets = 0
+        self.add_sheet()
+
+    def add_sheet(self):
+        self.sheets += 1
+        title = self.title if self.sheets == 1 else f"{self.title} {self.sheets}"
+        self.sheet = self.workbook.create_sheet(title=title)
+        self.sheet.append(self.columns)
+        self.sheet_rows = 0
+
+    def write(self, rows):
+        for row in rows:
+            if self.sheet_rows >= XLSX_MAX_ROWS:
+                self.add_sheet()
+            self.sheet.append([to_plain(value) for value in row])
+            self.sheet_rows += 1
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+WRITERS = {
+    "csv": CSVWriter,
+    "jsonl": JSONLinesWriter,
+    "xlsx": XLSXWriter,
+}
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Indexes
+Composite indexes for dashboard queries and an EXPLAIN audit of the queries actually run
+"""
+
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import cint
+
+# (DocType، اسم الفهرس، الأعمدة) - الأعمدة الإضافية بعد شروط التصفية تجعل الفهرس مغطياً
+DASHBOARD_INDEXES = [
+    # مجاميع دفتر الأستاذ حسب الحساب والفترة (مغطى لـ SUM(debit/credit))
+    ("GL Entry", "dashboard_account_date", ["account", "posting_date", "is_cancelled", "debit", "credit"]),
+    ("GL Entry", "dashboard_company_date", ["company", "posting_date", "is_cancelled"]),
+    # مجاميع المبيعات وقائمة الفواتير المرتبة بـ (posting_date, name) - name يلي posting_date مباشرة
+    # فيقرأ ترقيم الصفحات ORDER BY posting_date DESC, name DESC من الفهرس بدون ترتيب
+    ("Sales Invoice", "dashboard_docstatus_date_name", ["docstatus", "posting_date", "name"]),
+    ("Sales Invoice", "dashboard_company_date", ["company", "docstatus", "posting_date"]),
+    # المبالغ المستحقة
+    ("Sales Invoice", "dashboard_docstatus_outstanding", ["docstatus", "outstanding_amount"]),
+    # فهرس الأصناف المنخفضة
+    ("Bin", "dashboard_reorder_level", ["reorder_level", "actual_qty"]),
+    # حركة المخزون الشهرية والأصناف الأكثر مبيعاً
+    ("Stock Ledger Entry", "dashboard_date_voucher", ["posting_date", "is_cancelled", "voucher_type"]),
+]
+
+# فهارس سابقة استُبدلت، تُحذف قبل إنشاء الفهارس الحالية
+OBSOLETE_INDEXES = [
+    # grand_total بين posting_date و name كان يكسر ترتيب قائمة الفواتير
+    ("Sales Invoice", "dashboard_docstatus_date"),
+]
+
+# لوحات التحكم والـ APIs التي تُشغل استعلاماتها في التدقيق
+AUDIT_ENDPOINTS = [
+    "get_financial_overview",
+    "get_sales_analytics",
+    "get_inventory_analytics",
+    "get_advanced_analytics",
+    "get_dashboard_data",
+    "get_kpi_comparison",
+]
+
+# تقدير الصفوف الذي يجعل الترتيب أو الجدول المؤقت مشكلة تستحق الإبلاغ
+LARGE_ROWS = 1000
+
+
+def create_dashboard_indexes():
+    """إنشاء الفهارس المركبة إذا لم تكن موجودة وحذف المستبدلة منها (آمن للتكرار)"""
+    for doctype, index_name in OBSOLETE_INDEXES:
+        try:
+            if frappe.db.has_index(f"tab{doctype}", index_name):
+                frappe.db.sql_ddl(f"ALTER TABLE `tab{doctype}` DROP INDEX `{index_name}`")
+        except Exception as e:
+            frappe.log_error(f"Dropping dashboard index {index_name} on {doctype} failed: {str(e)}")
+
+    for doctype, index_name, columns in DASHBOARD_INDEXES:
+        try:
+            frappe.db.add_index(doctype, columns, index_name)
+        except Exception as e:
+            frappe.log_error(f"Dashboard index {index_name} on {doctype} failed: {str(e)}")
+
+
+def audit_queries(company=None):
+    """تشغيل استعلامات لوحات التحكم مع EXPLAIN لكل منها وإرجاع خطط التنفيذ المكلفة
+
+    ترجع قائمة [{endpoint, query, table, rows, possible_keys, problem}] حيث problem:
+    - full_scan: قراءة الجدول كاملاً (type = ALL)
+    - index_scan: قراءة الفهرس كاملاً (type = index) بدلاً من نطاق منه
+    - filesort / temporary: ترتيب أو جدول مؤقت على أكثر من LARGE_ROWS صف مقدر
+    """
+    from financial_dashboard_final.financial_dashboard_final import api
+
+    findings = []
+    for endpoint in AUDIT_ENDPOINTS:
+        for query, values in record_queries(getattr(api, endpoint).compute, company=company):
+            for row in frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True):
+                for problem in get_plan_problems(row):
+                    findings.append(frappe._dict({
+                        "endpoint": endpoint,
+                        "query": " ".join(query.split()),
+                        "table": row.get("table"),
+                        "rows": row.get("rows"),
+                        "possible_keys": row.get("possible_keys"),
+                        "problem": problem
+                    }))
+    return findings
+
+
+def get_plan_problems(row):
+    """مشاكل صف واحد من EXPLAIN"""
+    problems = []
+    if row.get("type") == "ALL":
+        problems.append("full_scan")
+    elif row.get("type") == "index":
+        problems.append("index_scan")
+
+    extra = row.get("Extra") or ""
+    if cint(row.get("rows")) >= LARGE_ROWS:
+        if "Using filesort" in extra:
+            problems.append("filesort")
+        if "Using temporary" in extra:
+            problems.append("temporary")
+    return problems
+
+
+def record_queries(fn, **kwargs):
+    """استعلامات SELECT التي ينفذها fn بدون الذاكرة المؤقتة للطلب"""
+    queries = []
+    sql = frappe.db.sql
+
+    def recording_sql(query, values=(), *args, **kw):
+        if query.lstrip().upper().startswith("SELECT"):
+            queries.append((query, values))
+        return sql(query, values, *args, **kw)
+
+    # الخيوط في executor تفتح اتصالات خاصة بها لا تمر بـ recording_sql، فتُشغل الدوال متتابعة
+    had_workers = "financial_dashboard_metric_workers" in frappe.conf
+    workers = frappe.conf.get("financial_dashboard_metric_workers")
+    frappe.conf.financial_dashboard_metric_workers = 0
+    frappe.local.financial_dashboard_cache = {}
+    frappe.db.sql = recording_sql
+    try:
+        fn(**kwargs)
+    finally:
+        frappe.db.sql = sql
+        # إعادة site_config كما كان: بدون المفتاح يعود get_worker_count للقيمة الافتراضية
+        if had_workers:
+            frappe.conf.financial_dashboard_metric_workers = workers
+        else:
+            frappe.conf.pop("financial_dashboard_metric_workers", None)
+    return queries
@@ -9,12 +9,20 @@ def after_install():
         create_workspaces()
         create_advanced_analytics_workspace()
         setup_permissions()
+        create_rollup_tables()
+        create_indexes()
         frappe.db.commit()
         print("✅ تم تثبيت Financial Dashboard بنجاح!")
     except Exception as e:
         frappe.log_error(f"خطأ في تثبيت Financial Dashboard: {str(e)}")
         print(f"❌ خطأ في التثبيت: {str(e)}")
 
+def after_migrate():
+    """تشغيل بعد كل bench migrate: ترقية جداول التجميع وإضافة فهارس لوحات التحكم"""
+    from financial_dashboard_final.financial_dashboard_final.rollup import ensure_rollup_tables
+    ensure_rollup_tables()
+    create_indexes()
+
 def create_workspaces():
     """إنشاء الـ workspaces"""
     workspaces = [
@@ -220,6 +228,18 @@ def setup_permissions():
     except Exception as e:
         print(f"⚠️ تحذير في إعداد الصلاحيات: {str(e)}")
 
+def create_rollup_tables():
+    """إنشاء جداول التجميع اليومي للوحات التحكم"""
+    from financial_dashboard_final.financial_dashboard_final.rollup import ensure_rollup_tables
+    ensure_rollup_tables()
+    print("✅ تم إنشاء جداول التجميع اليومي - شغّل bench backfill-dashboard-rollup لتعبئتها")
+
+def create_indexes():
+    """إنشاء الفهارس المركبة لاستعلامات لوحات التحكم"""
+    from financial_dashboard_final.financial_dashboard_final.indexes import create_dashboard_indexes
+    create_dashboard_indexes()
+    print("✅ تم إنشاء فهارس لوحات التحكم - شغّل bench audit-dashboard-queries للتحقق")
+
 def create_custom_fields():
     """إنشاء حقول مخصصة إذا لزم الأمر"""
     pass
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Instrumentation
+Per-endpoint and per-helper latency, query count, rows read, cache hit rate and fallback counters
+"""
+
+from __future__ import unicode_literals
+import time
+import functools
+import frappe
+from frappe.utils import cint, flt
+
+STATS_PREFIX = "financial_dashboard:stats"
+STATS_NAMES_KEY = "financial_dashboard:stats_names"
+
+# مستويات القياس في site_config (financial_dashboard_instrumentation)
+# 1 (الافتراضي): الاستدعاء الخارجي فقط (الـ endpoint)، 2: والدوال الداخلية المقاسة أيضاً، 0: إيقاف
+ENDPOINTS = 1
+DETAILED = 2
+
+# حدود مجموعات المدرج التكراري للزمن (ملي ثانية)، وما يتجاوز آخرها يحسب في "inf"
+LATENCY_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# عدادات الجلسة في MariaDB: Questions لعدد الاستعلامات و Handler_read_* للصفوف المقروءة
+SESSION_STATUS_SQL = """SHOW SESSION STATUS WHERE Variable_name IN (
+    'Questions', 'Handler_read_first', 'Handler_read_key', 'Handler_read_last',
+    'Handler_read_next', 'Handler_read_prev', 'Handler_read_rnd', 'Handler_read_rnd_next'
+)"""
+
+
+def instrument(fn):
+    """مزخرف يسجل زمن التنفيذ وعدد الاستعلامات والصفوف المقروءة والأخطاء لكل استدعاء
+
+    كل استدعاء مقاس يكلف استعلامي SHOW STATUS وأوامر Redis، فالدوال المقاسة داخل
+    استدعاء مقاس آخر لا تُسجل إلا في المستوى DETAILED (واستعلاماتها محسوبة في الخارجي).
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        level = get_level()
+        depth = get_instrument_depth()
+        if not level or (depth and level < DETAILED):
+            return fn(*args, **kwargs)
+
+        frappe.local.dashboard_instrument_depth = depth + 1
+        usage = start_usage()
+        start = time.perf_counter()
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            frappe.local.dashboard_instrument_depth = depth
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            queries, rows = end_usage(usage)
+            record_call(fn.__name__, elapsed_ms, queries, rows, failed)
+    return wrapper
+
+
+def get_instrument_depth():
+    """عدد الاستدعاءات المقاسة النشطة في الطلب الحالي (يُمرر لخيوط المؤشرات)"""
+    return getattr(frappe.local, "dashboard_instrument_depth", 0)
+
+
+def start_usage():
+    """نقطة بداية القياس: عدادات جلسة الاتصال الحالي وما أضافته خيوط المؤشرات حتى الآن"""
+    return get_session_status(), get_status_reads(), tuple(get_worker_usage())
+
+
+def end_usage(usage):
+    """(الاستعلامات، الصفوف) منذ start_usage في اتصال الطلب وفي خيوط المؤشرات التابعة له"""
+    start_status, start_reads, start_worker = usage
+    # استعلامات SHOW STATUS نفسها (هنا وفي الدوال المقاسة داخلها) لا تُحسب
+    status_reads = get_status_reads() - start_reads + 1
+    end_status = get_session_status()
+    worker = get_worker_usage()
+    queries = max(end_status[0] - start_status[0] - status_reads, 0) + worker[0] - start_worker[0]
+    rows = max(end_status[1] - start_status[1] - status_reads * get_status_rows_overhead(), 0)
+    return queries, rows + worker[1] - start_worker[1]
+
+
+def get_worker_usage():
+    """[الاستعلامات، الصفوف] التي نفذتها خيوط المؤشرات باتصالاتها الخاصة لهذا الطلب
+
+    SHOW SESSION STATUS لا يرى إلا اتصال الطلب، فيُضاف هنا استهلاك كل خيط مكتمل
+    (executor.merge_worker_outcome) ويُحسب ضمن كل استدعاء مقاس كان نشطاً أثناءه.
+    """
+    if not hasattr(frappe.local, "dashboard_worker_usage"):
+        frappe.local.dashboard_worker_usage = [0, 0]
+    return frappe.local.dashboard_worker_usage
+
+
+def add_worker_usage(worker_usage, queries, rows):
+    worker_usage[0] += queries
+    worker_usage[1] += rows
+
+
+def record_call(name, elapsed_ms, queries=0, rows=0, failed=False):
+    cache = frappe.cache()
+    key = cache.make_key(f"{STATS_PREFIX}:{name}")
+    bucket = next((str(limit) for limit in LATENCY_BUCKETS if elapsed_ms <= limit), "inf")
+
+    pipeline = cache.pipeline()
+    pipeline.sadd(cache.make_key(STATS_NAMES_KEY), name)
+    pipeline.hincrby(key, "count", 1)
+    pipeline.hincrby(key, f"bucket:{bucket}", 1)
+    pipeline.hincrbyfloat(key, "time_ms", elapsed_ms)
+    pipeline.hincrby(key, "queries", queries)
+    pipeline.hincrby(key, "rows", rows)
+    if failed:
+        pipeline.hincrby(key, "errors", 1)
+    pipeline.execute()
+
+
+def record_cache(name, hit):
+    """تسجيل إصابة أو إخفاق الذاكرة المؤقتة لـ endpoint أو بطاقة"""
+    if not is_enabled():
+        return
+    cache = frappe.cache()
+    cache.sadd(STATS_NAMES_KEY, name)
+    cache.hincrby(cache.make_key(f"{STATS_PREFIX}:{name}"), "cache_hit" if hit else "cache_miss", 1)
+
+
+def fallback(name, value, error=None):
+    """تسجيل تقديم بيانات احتياطية بدلاً من البيانات الحقيقية ثم إرجاعها"""
+    frappe.logger("financial_dashboard").warning(
+        f"FALLBACK served by {name}: {error!r}" if error else f"FALLBACK served by {name}"
+    )
+    get_request_fallbacks().append(name)
+    if is_enabled():
+        cache = frappe.cache()
+        cache.sadd(STATS_NAMES_KEY, name)
+        cache.hincrby(cache.make_key(f"{STATS_PREFIX}:{name}"), "fallbacks", 1)
+    return value
+
+
+def get_request_fallbacks():
+    """أسماء الدوال التي قدمت بيانات احتياطية في الطلب الحالي (تمنع dashboard_cache من تخزين النتيجة)"""
+    if not hasattr(frappe.local, "dashboard_fallbacks"):
+        frappe.local.dashboard_fallbacks = []
+    return frappe.local.dashboard_fallbacks
+
+
+def get_session_status():
+    """(عدد الاستعلامات، عدد الصفوف المقروءة) منذ بداية جلسة قاعدة البيانات"""
+    if frappe.db.db_type != "mariadb":
+        return 0, 0
+    frappe.local.dashboard_status_reads = get_status_reads() + 1
+    status = {row[0]: cint(row[1]) for row in frappe.db.sql(SESSION_STATUS_SQL)}
+    return status.pop("Questions", 0), sum(status.values())
+
+
+def get_status_reads():
+    return getattr(frappe.local, "dashboard_status_reads", 0)
+
+
+_status_rows_overhead = None
+
+
+def get_status_rows_overhead():
+    """الصفوف التي يقرؤها SHOW STATUS نفسه (تقاس مرة لكل عملية)"""
+    global _status_rows_overhead
+    if _status_rows_overhead is None:
+        first, second = get_session_status(), get_session_status()
+        _status_rows_overhead = max(second[1] - first[1], 0)
+    return _status_rows_overhead
+
+
+def get_stats(name=None):
+    """إحصائيات كل endpoint أو دالة مسجلة مع النسب المئوية للزمن"""
+    cache = frappe.cache()
+    if name:
+        names = [name]
+    else:
+        names = sorted(
+            member.decode() if isinstance(member, bytes) else member
+            for member in cache.smembers(STATS_NAMES_KEY)
+        )
+
+    # العدادات أرقام غير مرمزة بـ pickle، فتُقرأ بأوامر Redis الخام في رحلة واحدة
+    pipeline = cache.pipeline()
+    for stat_name in names:
+        pipeline.hgetall(cache.make_key(f"{STATS_PREFIX}:{stat_name}"))
+
+    stats = {}
+    for stat_name, counters in zip(names, pipeline.execute()):
+        raw = {
+            (field.decode() if isinstance(field, bytes) else field): flt(value.decode() if isinstance(value, bytes) else value)
+            for field, value in (counters or {}).items()
+        }
+        count = cint(raw.get("count"))
+        lookups = raw.get("cache_hit", 0) + raw.get("cache_miss", 0)
+        buckets = [(limit, cint(raw.get(f"bucket:{limit}"))) for limit in LATENCY_BUCKETS]
+        buckets.append((None, cint(raw.get("bucket:inf"))))
+        stats[stat_name] = {
+            "count": count,
+            "avg_ms": flt(raw.get("time_ms", 0) / count, 1) if count else 0,
+            "p50_ms": get_percentile(buckets, count, 0.5),
+            "p95_ms": get_percentile(buckets, count, 0.95),
+            "p99_ms": get_percentile(buckets, count, 0.99),
+            "avg_queries": flt(raw.get("queries", 0) / count, 1) if count else 0,
+            "avg_rows": flt(raw.get("rows", 0) / count, 1) if count else 0,
+            "errors": cint(raw.get("errors")),
+            "fallbacks": cint(raw.get("fallbacks")),
+            "cache_hit": cint(raw.get("cache_hit")),
+            "cache_miss": cint(raw.get("cache_miss")),
+            "cache_hit_rate": flt(raw.get("cache_hit", 0) / lookups * 100, 1) if lookups else None,
+            "histogram": {str(limit or "inf"): bucket_count for limit, bucket_count in buckets}
+        }
+    return stats
+
+
+def get_percentile(buckets, count, percentile):
+    """الحد الأعلى لأول مجموعة يبلغ عندها العدد التراكمي النسبة المطلوبة (None إذا تجاوز آخر حد)"""
+    if not count:
+        return None
+    target = count * percentile
+    cumulative = 0
+    for limit, bucket_count in buckets:
+        cumulative += bucket_count
+        if cumulative >= target:
+            return limit
+    return None
+
+
+def reset_stats():
+    cache = frappe.cache()
+    cache.delete_keys(STATS_PREFIX)
+
+
+def get_level():
+    """مستوى القياس من site_config: financial_dashboard_instrumentation (0 / 1 / 2)"""
+    return cint(frappe.conf.get("financial_dashboard_instrumentation", ENDPOINTS))
+
+
+def is_enabled():
+    return get_level() > 0
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Invalidation
+Debounced, event-driven versioning of dashboard metric groups
+"""
+
+from __future__ import unicode_literals
+import time
+import frappe
+from frappe.utils import cint
+
+VERSION_PREFIX = "financial_dashboard:version"
+DIRTY_SINCE_PREFIX = "financial_dashboard:dirty_since"
+LAST_EVENT_PREFIX = "financial_dashboard:last_event"
+
+# مجموعات المؤشرات
+SALES = "sales"
+CASH = "cash"
+PNL = "pnl"
+INVENTORY = "inventory"
+
+# المجموعات التي يغيرها كل نوع مستند
+DOCTYPE_GROUPS = {
+    "Sales Invoice": [SALES, PNL],
+    "GL Entry": [CASH, PNL],
+    "Stock Ledger Entry": [INVENTORY],
+    "Stock Entry": [INVENTORY],
+    "Bin": [INVENTORY],
+    "Account": [CASH, PNL],
+}
+
+# تُعتمد التغييرات بعد هدوء الأحداث لهذه المدة (ثوانٍ)
+QUIET_PERIOD = 30
+# وبحد أقصى بعد هذه المدة حتى أثناء الاستيراد المستمر
+MAX_DELAY = 300
+
+
+def mark_dirty(doc, method=None):
+    """doc_event: تعليم مجموعات المؤشرات المتأثرة كمتغيرة (بدون إعادة حساب)"""
+    groups = DOCTYPE_GROUPS.get(doc.doctype)
+    if groups:
+        frappe.db.after_commit.add(lambda: mark_groups_dirty(groups))
+
+
+def mark_groups_dirty(groups):
+    """تسجيل وقت أول وآخر حدث لكل مجموعة"""
+    cache = frappe.cache()
+    now = int(time.time())
+    for group in groups:
+        cache.set(cache.make_key(f"{DIRTY_SINCE_PREFIX}:{group}"), now, nx=True)
+        cache.set(cache.make_key(f"{LAST_EVENT_PREFIX}:{group}"), now)
+
+
+def get_group_versions(groups):
+    """أرقام إصدارات المجموعات بعد اعتماد التغييرات التي هدأت أحداثها
+
+    عشرة آلاف فاتورة متتالية ترفع الإصدار مرة كل MAX_DELAY ثانية على الأكثر
+    بدلاً من إعادة الحساب مع كل فاتورة.
+    """
+    cache = frappe.cache()
+    now = int(time.time())
+    versions = []
+    for group in groups:
+        dirty_since, last_event, version = cache.mget([
+            cache.make_key(f"{DIRTY_SINCE_PREFIX}:{group}"),
+            cache.make_key(f"{LAST_EVENT_PREFIX}:{group}"),
+            cache.make_key(f"{VERSION_PREFIX}:{group}")
+        ])
+        if dirty_since and (
+            now - cint(last_event) >= QUIET_PERIOD or now - cint(dirty_since) >= MAX_DELAY
+        ):
+            version = bump_group_version(group)
+        versions.append(cint(version))
+    return versions
+
+
+def bump_group_version(group):
+    """رفع إصدار المجموعة فتصبح كل النتائج المخزنة المعتمدة عليها قديمة"""
+    cache = frappe.cache()
+    cache.delete(
+        cache.make_key(f"{DIRTY_SINCE_PREFIX}:{group}"),
+        cache.make_key(f"{LAST_EVENT_PREFIX}:{group}")
+    )
+    return cache.incr(cache.make_key(f"{VERSION_PREFIX}:{group}"))
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Inventory
+Paginated inventory grid and stock valuation from current Bin balances
+"""
+
+from __future__ import unicode_literals
+import base64
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, getdate, nowdate
+from financial_dashboard_final.financial_dashboard_final.aggregates import (
+    get_filters_key, _get_request_cache
+)
+
+MAX_PAGE_SIZE = 100
+DEFAULT_PRICE_LIST = "Standard Selling"
+
+# Bin لا يحمل الشركة: نصفيه بمستودعات الشركة
+COMPANY_WAREHOUSE_CONDITION = "{column} IN (SELECT name FROM `tabWarehouse` WHERE company = %(company)s)"
+
+STATUS_LABELS = {
+    "out": "نفد",
+    "low": "منخفض",
+    "available": "متوفر",
+}
+
+
+def get_inventory_page(cursor=None, page_size=20, search=None, warehouse=None, price_list=None,
+                       filters=None):
+    """صفحة من الأصناف مرتبة بـ (item_name, item_code) مع الكميات والسعر
+
+    الأصناف تُختار أولاً بالمؤشر، ثم تُجمع أرصدة Bin وتُختار الأسعار لأصناف الصفحة فقط،
+    فلا يتضاعف عدد الصفوف بعدد المستودعات أو قوائم الأسعار.
+    filters: الكميات من مستودعات الشركة المحددة فقط (الأصناف مشتركة بين الشركات)
+    """
+    page_size = min(max(cint(page_size) or 20, 1), MAX_PAGE_SIZE)
+    conditions = ["i.disabled = 0"]
+    values = {"limit": page_size + 1}
+
+    if search:
+        conditions.append("(i.item_code LIKE %(search)s OR i.item_name LIKE %(search)s)")
+        values["search"] = f"%{search}%"
+    if warehouse:
+        conditions.append("""EXISTS (
+            SELECT 1 FROM `tabBin` b
+            WHERE b.item_code = i.item_code AND b.warehouse = %(warehouse)s
+        )""")
+        values["warehouse"] = warehouse
+    if cursor:
+        values["cursor_name"], values["cursor_code"] = decode_cursor(cursor)
+        conditions.append("""(i.item_name > %(cursor_name)s
+            OR (i.item_name = %(cursor_name)s AND i.item_code > %(cursor_code)s))""")
+
+    items = frappe.db.sql("""
+        SELECT i.item_code, i.item_name, i.stock_uom AS uom
+        FROM `tabItem` i
+        WHERE {conditions}
+        ORDER BY i.item_name, i.item_code
+        LIMIT %(limit)s
+    """.format(conditions=" AND ".join(conditions)), values, as_dict=True)
+
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    next_cursor = encode_cursor(items[-1].item_name, items[-1].item_code) if has_more else None
+
+    item_codes = [item.item_code for item in items]
+    stock = get_item_stock(item_codes, warehouse, (filters or {}).get("company"))
+    prices = get_item_prices(item_codes, price_list)
+
+    for item in items:
+        available_qty, min_qty = stock.get(item.item_code, (0, 0))
+        item.available_qty = available_qty
+        item.min_qty = min_qty
+        item.price = prices.get(item.item_code, 0)
+        item.status = get_stock_status(available_qty, min_qty)
+        item.status_label = STATUS_LABELS[item.status]
+
+    return {
+        "data": items,
+        "next_cursor": next_cursor,
+        "has_more": has_more
+    }
+
+
+def get_item_stock(item_codes, warehouse=None, company=None):
+    """مجموع الكمية وحد إعادة الطلب لكل صنف من tabBin"""
+    if not item_codes:
+        return {}
+
+    conditions = ["item_code IN %(item_codes)s"]
+    values = {"item_codes": item_codes}
+    if warehouse:
+        conditions.append("warehouse = %(warehouse)s")
+        values["warehouse"] = warehouse
+    if company:
+        conditions.append(COMPANY_WAREHOUSE_CONDITION.format(column="warehouse"))
+        values["company"] = company
+
+    rows = frappe.db.sql("""
+        SELECT item_code, SUM(actual_qty), SUM(reorder_level)
+        FROM `tabBin`
+        WHERE {conditions}
+        GROUP BY item_code
+    """.format(conditions=" AND ".join(conditions)), values)
+    return {row[0]: (flt(row[1]), flt(row[2])) for row in rows}
+
+
+def get_item_prices(item_codes, price_list=None):
+    """سعر واحد لكل صنف من قائمة الأسعار: السعر العام الأحدث أولاً"""
+    if not item_codes:
+        return {}
+
+    price_list = price_list or get_default_price_list()
+    rows = frappe.db.sql("""
+        SELECT item_code, price_list_rate
+        FROM `tabItem Price`
+        WHERE price_list = %(price_list)s
+        AND item_code IN %(item_codes)s
+        ORDER BY item_code,
+            CASE WHEN IFNULL(customer, '') = '' THEN 0 ELSE 1 END,
+            valid_from DESC
+    """, {"price_list": price_list, "item_codes": item_codes})
+
+    prices = {}
+    for item_code, rate in rows:
+        prices.setdefault(item_code, flt(rate))
+    return prices
+
+
+def get_default_price_list():
+    return frappe.db.get_single_value("Selling Settings", "selling_price_list") or DEFAULT_PRICE_LIST
+
+
+def get_stock_status(available_qty, min_qty):
+    if not available_qty:
+        return "out"
+    if available_qty <= min_qty:
+        return "low"
+    return "available"
+
+
+def get_stock_valuation(as_of_date=None, filters=None):
+    """قيمة المخزون مجمعة حسب المستودع ومجموعة الأصناف
+
+    الحالي من tabBin.stock_value مباشرة، والتاريخي من آخر قيد Stock Ledger
+    لكل (صنف، مستودع) حتى التاريخ المطلوب - وليس مجموع كل القيود الجارية.
+    filters: تُطبق الشركة فقط، فالمخزون لا يُوزع على مراكز التكلفة.
+    """
+    as_of_date = getdate(as_of_date) if as_of_date else None
+    if as_of_date and as_of_date >= getdate(nowdate()):
+        as_of_date = None
+
+    company = (filters or {}).get("company")
+    key = ("stock_valuation", str(as_of_date or ""), get_filters_key(filters))
+    cache = _get_request_cache()
+    if key not in cache:
+        if as_of_date:
+            rows = _query_historical_valuation(as_of_date, company)
+        else:
+            rows = _query_current_valuation(company)
+        cache[key] = _group_valuation(rows, as_of_date)
+    return cache[key]
+
+
+def _query_current_valuation(company=None):
+    condition = COMPANY_WAREHOUSE_CONDITION.format(column="b.warehouse") if company else "1 = 1"
+    return frappe.db.sql("""
+        SELECT b.warehouse, i.item_group, SUM(b.stock_value)
+        FROM `tabBin` b
+        INNER JOIN `tabItem` i ON i.name = b.item_code
+        WHERE {condition}
+        GROUP BY b.warehouse, i.item_group
+    """.format(condition=condition), {"company": company})
+
+
+def _query_historical_valuation(as_of_date, company=None):
+    condition = "AND company = %(company)s" if company else ""
+    return frappe.db.sql("""
+        SELECT sle.warehouse, i.item_group, SUM(sle.stock_value)
+        FROM (
+            SELECT item_code, warehouse, stock_value,
+                ROW_NUMBER() OVER (
+                    PARTITION BY item_code, warehouse
+                    ORDER BY posting_date DESC, posting_time DESC, creation DESC
+                ) AS row_num
+            FROM `tabStock Ledger Entry`
+            WHERE is_cancelled = 0
+            AND posting_date <= %(as_of_date)s
+            {condition}
+        ) sle
+        INNER JOIN `tabItem` i ON i.name = sle.item_code
+        WHERE sle.row_num = 1
+        GROUP BY sle.warehouse, i.item_group
+    """.format(condition=condition), {"as_of_date": as_of_date, "company": company})
+
+
+def _group_valuation(rows, as_of_date):
+    by_warehouse = {}
+    by_item_group = {}
+    total = 0
+    for warehouse, item_group, value in rows:
+        value = flt(value)
+        total += value
+        by_warehouse[warehouse] = by_warehouse.get(warehouse, 0) + value
+        by_item_group[item_group] = by_item_group.get(item_group, 0) + value
+
+    return frappe._dict({
+        "as_of_date": as_of_date or getdate(nowdate()),
+        "total": total,
+        "by_warehouse": by_warehouse,
+        "by_item_group": by_item_group
+    })
+
+
+def encode_cursor(item_name, item_code):
+    return base64.urlsafe_b64encode(f"{item_name}\x1f{item_code}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        item_name, item_code = base64.urlsafe_b64decode(cursor.encode()).decode().split("\x1f", 1)
+        return item_name, item_code
+    except Exception:
+        frappe.throw(_("Invalid cursor"))
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Low Stock Index
+Incrementally maintained set of (item, warehouse) pairs at or below reorder level
+"""
+
+from __future__ import unicode_literals
+import pickle
+import time
+import frappe
+from frappe.utils import flt
+
+# (صنف، مستودع) -> تفاصيل النقص
+ENTRIES_KEY = "financial_dashboard:low_stock_entries"
+# صنف -> عدد مستودعاته المنخفضة، وطوله هو عدد الأصناف المنخفضة
+# ونفس الشكل لكل شركة في ITEMS_KEY:<الشركة> لمستودعاتها فقط
+ITEMS_KEY = "financial_dashboard:low_stock_items"
+BUILT_KEY = "financial_dashboard:low_stock_built"
+# قفل إعادة البناء ومفاتيحها المؤقتة (خارج بادئة ITEMS_KEY حتى لا تمسحها delete_keys)
+REBUILD_LOCK_KEY = "financial_dashboard:low_stock_rebuilding"
+REBUILD_PREFIX = "financial_dashboard:low_stock_rebuild"
+REBUILD_TIMEOUT = 300
+
+# انتقال الزوج كاملاً في خطوة ذرية واحدة، فلا يحسب طلبان متزامنان نفس الانتقال مرتين
+# KEYS: الأزواج، الأصناف، أصناف الشركة | ARGV: الحقل، الصنف، منخفض؟، الزوج المرمّز
+APPLY_BIN_SCRIPT = """
+local existed = redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1
+if ARGV[3] == '1' then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[4])
+    if existed then
+        return 0
+    end
+    redis.call('HINCRBY', KEYS[2], ARGV[2], 1)
+    redis.call('HINCRBY', KEYS[3], ARGV[2], 1)
+    return 1
+end
+if not existed then
+    return 0
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+for i = 2, 3 do
+    if redis.call('HINCRBY', KEYS[i], ARGV[2], -1) <= 0 then
+        redis.call('HDEL', KEYS[i], ARGV[2])
+    end
+end
+return -1
+"""
+
+ALERT_EVENT = "financial_dashboard_low_stock"
+
+
+def on_bin_update(doc, method=None):
+    """doc_event: تحديث الفهرس من رصيد Bin المعدل بعد الاعتماد"""
+    item_code, warehouse = doc.item_code, doc.warehouse
+    actual_qty, reorder_level = doc.actual_qty, doc.get("reorder_level")
+    frappe.db.after_commit.add(lambda: apply_bin(item_code, warehouse, actual_qty, reorder_level))
+
+
+def on_stock_ledger_entry(doc, method=None):
+    """doc_event: ERPNext قد يحدث Bin بدون أحداث، فنقرأ الرصيد بعد الاعتماد"""
+    item_code, warehouse = doc.item_code, doc.warehouse
+    frappe.db.after_commit.add(lambda: sync_bin(item_code, warehouse))
+
+
+def sync_bin(item_code, warehouse):
+    row = frappe.db.get_value(
+        "Bin", {"item_code": item_code, "warehouse": warehouse},
+        ["actual_qty", "reorder_level"], as_dict=True
+    )
+    if row:
+        apply_bin(item_code, warehouse, row.actual_qty, row.reorder_level)
+
+
+def apply_bin(item_code, warehouse, actual_qty, reorder_level):
+    """إضافة أو تحديث أو حذف زوج (صنف، مستودع) حسب مقارنته بحد إعادة الطلب
+
+    يُستدعى بعد الاعتماد فقط، فلا يبقى في الفهرس أو التنبيهات رصيد من معاملة ملغاة.
+    """
+    ensure_index()
+    cache = frappe.cache()
+    field = get_entry_field(item_code, warehouse)
+    existing = cache.hget(ENTRIES_KEY, field)
+    actual_qty, reorder_level = flt(actual_qty), flt(reorder_level)
+    is_low = reorder_level > 0 and actual_qty <= reorder_level
+
+    # قرار الإضافة/الحذف والعدادات داخل السكربت، وexisting للاحتفاظ بوقت العبور فقط
+    entry = make_entry(item_code, warehouse, actual_qty, reorder_level,
+                       existing["crossed_at"] if existing else time.time())
+    keys = [ENTRIES_KEY, ITEMS_KEY, get_company_items_key(entry["company"])]
+    transition = cache.register_script(APPLY_BIN_SCRIPT)(
+        keys=[cache.make_key(key) for key in keys],
+        # نفس ترميز RedisWrapper.hset حتى تقرأ hget/hgetall الزوج كالمعتاد
+        args=[field, item_code, 1 if is_low else 0, pickle.dumps(entry) if is_low else ""]
+    )
+    if transition == 1:
+        publish_alert(entry)
+
+
+def get_low_stock_item_count(company=None):
+    """عدد الأصناف المنخفضة - O(1) من طول فهرس الأصناف (العام أو فهرس الشركة)"""
+    ensure_index()
+    cache = frappe.cache()
+    return cache.hlen(cache.make_key(get_company_items_key(company) if company else ITEMS_KEY))
+
+
+def get_low_stock_entries(limit=50, warehouse=None, company=None):
+    """قائمة الأزواج المنخفضة مرتبة حسب مقدار النقص"""
+    ensure_index()
+    entries = get_company_entries(company)
+    if warehouse:
+        entries = [entry for entry in entries if entry["warehouse"] == warehouse]
+    entries.sort(key=lambda entry: entry["shortfall"], reverse=True)
+    return entries[:limit]
+
+
+def get_company_entries(company=None):
+    entries = list((frappe.cache().hgetall(ENTRIES_KEY) or {}).values())
+    if company:
+        entries = [entry for entry in entries if get_entry_company(entry) == company]
+    return entries
+
+
+def get_entry_company(entry):
+    # الأزواج المفهرسة قبل إضافة الشركة تُكمل من المستودع حتى إعادة البناء اليومية
+    return entry.get("company") or frappe.get_cached_value("Warehouse", entry["warehouse"], "company")
+
+
+def ensure_index():
+    if not frappe.cache().get_value(BUILT_KEY):
+        rebuild_index()
+
+
+def rebuild_index():
+    """إعادة بناء الفهرس بالكامل من tabBin (عند أول استخدام ويومياً للمطابقة)
+
+    طلب واحد فقط يبني (SET NX) في مفاتيح مؤقتة تحل محل الحالية دفعة واحدة، والبقية
+    يقرؤون الفهرس الحالي بدل تكرار البناء أو رؤية فهرس نصف مبني.
+    """
+    cache = frappe.cache()
+    lock_key = cache.make_key(REBUILD_LOCK_KEY)
+    if not cache.set(lock_key, 1, ex=REBUILD_TIMEOUT, nx=True):
+        return
+    try:
+        build_index(cache)
+    finally:
+        cache.delete(lock_key)
+
+
+def build_index(cache):
+    previous = {
+        field.decode() if isinstance(field, bytes) else field: entry
+        for field, entry in (cache.hgetall(ENTRIES_KEY) or {}).items()
+    }
+
+    rows = frappe.db.sql("""
+        SELECT item_code, warehouse, actual_qty, reorder_level
+        FROM `tabBin`
+        WHERE reorder_level > 0
+        AND actual_qty <= reorder_level
+    """, as_dict=True)
+
+    cache.delete_keys(REBUILD_PREFIX)
+    temp_entries_key = f"{REBUILD_PREFIX}:{ENTRIES_KEY}"
+    item_counts = {}
+    for row in rows:
+        field = get_entry_field(row.item_code, row.warehouse)
+        crossed_at = previous[field]["crossed_at"] if field in previous else time.time()
+        entry = make_entry(row.item_code, row.warehouse, row.actual_qty, row.reorder_level, crossed_at)
+        cache.hset(temp_entries_key, field, entry)
+        for key in (ITEMS_KEY, get_company_items_key(entry["company"])):
+            counts = item_counts.setdefault(key, {})
+            counts[row.item_code] = counts.get(row.item_code, 0) + 1
+
+    for key, counts in item_counts.items():
+        for item_code, count in counts.items():
+            cache.hincrby(cache.make_key(f"{REBUILD_PREFIX}:{key}"), item_code, count)
+
+    # حذف الفهرس القديم (مع شركات لم يعد لها أصناف) ووضع الجديد مكانه في معاملة واحدة
+    pipeline = cache.pipeline()
+    live_keys = [cache.make_key(ENTRIES_KEY)] + list(cache.get_keys(ITEMS_KEY))
+    pipeline.delete(*live_keys)
+    if rows:
+        pipeline.rename(cache.make_key(temp_entries_key), cache.make_key(ENTRIES_KEY))
+    for key in item_counts:
+        pipeline.rename(cache.make_key(f"{REBUILD_PREFIX}:{key}"), cache.make_key(key))
+    pipeline.execute()
+    cache.set_value(BUILT_KEY, 1)
+
+
+def make_entry(item_code, warehouse, actual_qty, reorder_level, crossed_at):
+    return {
+        "item_code": item_code,
+        "warehouse": warehouse,
+        "actual_qty": flt(actual_qty),
+        "reorder_level": flt(reorder_level),
+        "shortfall": flt(reorder_level) - flt(actual_qty),
+        "company": frappe.get_cached_value("Warehouse", warehouse, "company"),
+        "crossed_at": crossed_at
+    }
+
+
+def publish_alert(entry):
+    """تنبيه فوري للوحة المخزون عند عبور صنف لحد إعادة الطلب (apply_bin يعمل بعد الاعتماد)
+
+    يحمل عدد شركة الزوج مع العدد العام، والصفحة تتجاهل تنبيهات الشركات الأخرى.
+    """
+    frappe.publish_realtime(ALERT_EVENT, {
+        "entry": entry,
+        "company": entry["company"],
+        "company_count": get_low_stock_item_count(entry["company"]),
+        "count": get_low_stock_item_count()
+    })
+
+
+def get_entry_field(item_code, warehouse):
+    return f"{item_code}\x1f{warehouse}"
+
+
+def get_company_items_key(company):
+    return f"{ITEMS_KEY}:{company or ''}"
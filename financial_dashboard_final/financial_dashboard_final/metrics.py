@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Metric Registry
+Declarative KPI definitions and a planner that evaluates all metrics of a source in one query
+"""
+
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+from frappe.utils import flt, cint, nowdate, add_months, get_first_day, get_last_day
+from financial_dashboard_final.financial_dashboard_final.aggregates import (
+    DIMENSIONS, get_gl_source, get_account_conditions, get_dimension_conditions, get_filters_key,
+    _get_request_cache
+)
+from financial_dashboard_final.financial_dashboard_final.rollup import SALES_ROLLUP_TABLE, is_rollup_ready
+from financial_dashboard_final.financial_dashboard_final.invalidation import SALES, CASH, PNL, INVENTORY
+from financial_dashboard_final.financial_dashboard_final.comparison import compare_metric
+from financial_dashboard_final.financial_dashboard_final.inventory import get_stock_valuation
+from financial_dashboard_final.financial_dashboard_final.low_stock import get_low_stock_item_count
+from financial_dashboard_final.financial_dashboard_final.stock_analytics import get_stock_turnover
+from financial_dashboard_final.financial_dashboard_final.instrumentation import instrument, fallback
+
+# مصادر المؤشرات: الجدول وشروطه الثابتة وعمود التاريخ وأبعاد التصفية المدعومة
+# resolve: المصدر يُحدد وقت التنفيذ (دفتر الأستاذ الأصلي أو جدول التجميع)
+# rollup: جدول بديل يُستخدم بعد اكتمال تعبئة جداول التجميع
+METRIC_SOURCES = {
+    "gl": {
+        "resolve": get_gl_source,
+        "alias": "gle",
+        "date_field": "gle.posting_date",
+        "dimensions": DIMENSIONS,
+        "accounts": True,
+    },
+    "sales": {
+        "table": "`tabSales Invoice`",
+        "conditions": ["docstatus = 1"],
+        "rollup": {"table": f"`{SALES_ROLLUP_TABLE}`", "conditions": []},
+        "date_field": "posting_date",
+        "dimensions": DIMENSIONS,
+    },
+    # المبالغ المستحقة غير موجودة في جدول التجميع
+    "sales_invoice": {
+        "table": "`tabSales Invoice`",
+        "conditions": ["docstatus = 1"],
+        "date_field": "posting_date",
+        "dimensions": DIMENSIONS,
+    },
+    # العروض وأوامر البيع لا تحمل مركز التكلفة أو المشروع
+    "quotation": {
+        "table": "`tabQuotation`",
+        "conditions": ["docstatus = 1"],
+        "date_field": None,
+        "dimensions": ("company",),
+    },
+    "sales_order": {
+        "table": "`tabSales Order`",
+        "conditions": ["docstatus = 1"],
+        "date_field": None,
+        "dimensions": ("company",),
+    },
+    "stock_entry": {
+        "table": "`tabStock Entry`",
+        "conditions": ["docstatus = 1"],
+        "date_field": "posting_date",
+        "dimensions": ("company", "project"),
+    },
+    # الأصناف مشتركة بين الشركات فلا تتأثر بالتصفية
+    "item": {
+        "table": "`tabItem`",
+        "conditions": ["disabled = 0"],
+        "date_field": None,
+        "dimensions": (),
+    },
+}
+
+# الفترات الزمنية: (من تاريخ، إلى تاريخ) والقيمة None = بدون حد
+WINDOWS = {
+    "all": lambda: (None, None),
+    "current_month": lambda: (get_first_day(nowdate()), get_last_day(nowdate())),
+    "to_month_end": lambda: (None, get_last_day(nowdate())),
+    "last_month": lambda: (add_months(nowdate(), -1), None),
+}
+
+TYPES = {"float": flt, "int": cint}
+
+# كل مؤشر يُعرّف مرة واحدة بأحد ثلاثة أشكال:
+# - source + expression: SUM(expression) على المصدر ضمن window (وaccounts / condition اختيارياً)
+# - depends + compute: يُحسب من قيم مؤشرات أخرى
+# - provider: دالة تأخذ filters لمؤشرات لها مسار محسّن خاص (فهرس Redis، التقييم، المقارنات)
+# groups: مجموعات البيانات التي يعتمد عليها (للذاكرة المؤقتة والتحديث المباشر)
+# format: "currency" أو نص تنسيق مثل "{:.1f}%"، و fallback: القيمة النهائية عند الخطأ
+METRICS = {
+    # ===== دفتر الأستاذ =====
+    "current_balance": {
+        "source": "gl", "expression": "gle.debit - gle.credit", "accounts": "cash",
+        "window": "to_month_end", "groups": [CASH], "fallback": 110000000,
+    },
+    "month_income": {
+        "source": "gl", "expression": "gle.credit", "accounts": "income",
+        "window": "current_month", "groups": [PNL], "fallback": 0,
+    },
+    "month_expense": {
+        "source": "gl", "expression": "gle.debit", "accounts": "expense",
+        "window": "current_month", "groups": [PNL], "fallback": 0,
+    },
+    "net_profit": {
+        "depends": ["month_income", "month_expense"],
+        "compute": lambda v: v.month_income - v.month_expense,
+        "groups": [PNL], "fallback": 170000000,
+    },
+    # نسبة الربح إلى الإيرادات
+    "operational_efficiency": {
+        "depends": ["month_income", "month_expense"],
+        "compute": lambda v: (v.month_income - v.month_expense) / (v.month_income or 1) * 100,
+        "format": "{:.0f}%", "groups": [PNL], "fallback": "92%",
+    },
+    "total_revenue": {
+        "source": "gl", "expression": "gle.credit", "accounts": "income",
+        "format": "currency", "groups": [PNL], "fallback": "539K",
+    },
+    # نمو الإيرادات منذ بداية السنة مقارنة بنفس الفترة من السنة الماضية
+    "growth_rate": {
+        "provider": lambda filters: compare_metric("income", "ytd", "same_period_last_year", filters=filters).change_percent,
+        "format": "{:.1f}%", "groups": [PNL], "fallback": "12%",
+    },
+
+    # ===== المبيعات =====
+    "monthly_sales": {
+        "source": "sales", "expression": "grand_total", "window": "current_month",
+        "groups": [SALES], "fallback": 500000000,
+    },
+    "total_sales": {
+        "source": "sales", "expression": "grand_total", "groups": [SALES], "fallback": 35000,
+    },
+    "invoice_count": {
+        "source": "sales", "expression": "1", "rollup_expression": "invoice_count", "type": "int",
+        "groups": [SALES], "fallback": 350,
+    },
+    "avg_order": {
+        "depends": ["total_sales", "invoice_count"],
+        "compute": lambda v: v.total_sales / v.invoice_count if v.invoice_count else 0,
+        "groups": [SALES], "fallback": 350,
+    },
+    "accounts_receivable": {
+        "source": "sales_invoice", "expression": "outstanding_amount", "condition": "outstanding_amount > 0",
+        "groups": [SALES], "fallback": 300000000,
+    },
+    "quotation_count": {
+        "source": "quotation", "expression": "1", "type": "int", "groups": [SALES], "fallback": 0,
+    },
+    "sales_order_count": {
+        "source": "sales_order", "expression": "1", "type": "int", "groups": [SALES], "fallback": 0,
+    },
+    # معدل التحويل من العروض إلى أوامر البيع
+    "conversion_rate": {
+        "depends": ["quotation_count", "sales_order_count"],
+        "compute": lambda v: v.sales_order_count / (v.quotation_count or 1) * 100,
+        "groups": [SALES], "fallback": 35,
+    },
+
+    # ===== المخزون =====
+    "inventory_value": {
+        "provider": lambda filters: get_stock_valuation(filters=filters).total,
+        "groups": [INVENTORY], "fallback": 35000,
+    },
+    "warehouse_value": {
+        "depends": ["inventory_value"], "compute": lambda v: v.inventory_value,
+        "format": "currency", "groups": [INVENTORY], "fallback": "20.9M",
+    },
+    "total_items": {
+        "source": "item", "expression": "1", "type": "int", "groups": [INVENTORY], "fallback": 0,
+    },
+    "low_stock": {
+        "provider": lambda filters: get_low_stock_item_count((filters or {}).get("company")),
+        "type": "int", "groups": [INVENTORY], "fallback": 2,
+    },
+    "stock_turnover": {
+        "provider": lambda filters: get_stock_turnover(12, filters),
+        "groups": [INVENTORY], "fallback": 2,
+    },
+    "stock_movements": {
+        "source": "stock_entry", "expression": "1", "window": "last_month", "type": "int",
+        "groups": [INVENTORY], "fallback": 0,
+    },
+}
+
+
+@instrument
+def compute_metrics(names, filters=None):
+    """قيم المؤشرات المطلوبة (منسقة) ومفاتيح ما قُدم منها بقيمته الاحتياطية
+
+    المستدعي يمرر المفاتيح إلى executor.mark_degraded حتى لا تُخزن القيم الاحتياطية
+    أو تُعرض كبيانات حقيقية.
+
+    المؤشرات المحسوبة في نفس الطلب وبنفس التصفية لا تُعاد، والباقي يُنفذ حسب
+    plan_metrics: استعلام واحد لكل مصدر ثم المزودات ثم المؤشرات المشتقة.
+    """
+    unknown = [name for name in names if name not in METRICS]
+    if unknown:
+        frappe.throw(_("Unknown metrics: {0}").format(", ".join(unknown)))
+
+    cache = _get_request_cache()
+    filters_key = get_filters_key(filters)
+    degraded_key = ("metrics_degraded", filters_key)
+    missing = [name for name in names if ("metric", name, filters_key) not in cache]
+    if missing:
+        raw, errors = execute_plan(plan_metrics(missing), filters)
+        degraded = cache.setdefault(degraded_key, set())
+        for name, value in raw.items():
+            if name in errors:
+                degraded.add(name)
+                value = fallback(f"metric:{name}", METRICS[name]["fallback"], errors[name])
+            else:
+                value = format_metric(name, value)
+            cache[("metric", name, filters_key)] = value
+
+    degraded = cache.get(degraded_key, set())
+    return (
+        frappe._dict({name: cache[("metric", name, filters_key)] for name in names}),
+        [name for name in names if name in degraded]
+    )
+
+
+def plan_metrics(names):
+    """خطة التنفيذ: {المصدر: [مؤشرات]} ثم المزودات ثم المشتقات بترتيب اعتمادياتها
+
+    كل مؤشرات المصدر الواحد تُدمج في استعلام واحد مهما اختلفت فتراتها، فتحدد كل فترة
+    بـ CASE داخل SUM ويحدد WHERE الفترة الجامعة لها.
+    """
+    ordered = []
+
+    def visit(name):
+        if name in ordered:
+            return
+        for dependency in METRICS[name].get("depends", ()):
+            visit(dependency)
+        ordered.append(name)
+
+    for name in names:
+        visit(name)
+
+    plan = frappe._dict(queries={}, providers=[], derived=[])
+    for name in ordered:
+        metric = METRICS[name]
+        if "source" in metric:
+            plan.queries.setdefault(metric["source"], []).append(name)
+        elif "provider" in metric:
+            plan.providers.append(name)
+        else:
+            plan.derived.append(name)
+    return plan
+
+
+def execute_plan(plan, filters=None):
+    """({المؤشر: القيمة الخام}، {المؤشر: الخطأ}) - فشل مصدر لا يوقف بقية المصادر"""
+    raw = frappe._dict()
+    errors = {}
+
+    def fail(metric_names, error):
+        for name in metric_names:
+            raw[name] = None
+            errors[name] = error
+
+    for source, metric_names in plan.queries.items():
+        try:
+            raw.update(query_source(source, metric_names, filters))
+        except Exception as e:
+            frappe.log_error(f"Dashboard metrics {source} query failed: {str(e)}")
+            fail(metric_names, e)
+
+    for name in plan.providers:
+        try:
+            raw[name] = cast_metric(name, METRICS[name]["provider"](filters))
+        except Exception as e:
+            fail([name], e)
+
+    for name in plan.derived:
+        metric = METRICS[name]
+        failed = next((dependency for dependency in metric["depends"] if dependency in errors), None)
+        if failed:
+            fail([name], errors[failed])
+            continue
+        try:
+            raw[name] = cast_metric(name, metric["compute"](raw))
+        except Exception as e:
+            fail([name], e)
+
+    return raw, errors
+
+
+def query_source(source_name, metric_names, filters=None):
+    """كل مؤشرات المصدر في استعلام واحد: عمود SUM(CASE ...) لكل مؤشر"""
+    source = resolve_source(source_name)
+    date_field = source["date_field"]
+    values = {}
+    conditions = list(source["conditions"])
+    conditions += get_dimension_conditions(filters, values, source.get("alias"), source["dimensions"])
+
+    accounts = {}
+    if source.get("accounts"):
+        classifications = sorted({METRICS[name]["accounts"] for name in metric_names})
+        accounts, any_account = get_account_conditions(source, values, classifications, filters)
+        conditions.append(any_account)
+
+    windows = [WINDOWS[METRICS[name].get("window", "all")]() for name in metric_names]
+    if date_field and all(from_date for from_date, to_date in windows):
+        conditions.append(f"{date_field} >= %(from_date)s")
+        values["from_date"] = min(from_date for from_date, to_date in windows)
+    if date_field and all(to_date for from_date, to_date in windows):
+        conditions.append(f"{date_field} <= %(to_date)s")
+        values["to_date"] = max(to_date for from_date, to_date in windows)
+
+    columns = []
+    for i, (name, (from_date, to_date)) in enumerate(zip(metric_names, windows)):
+        metric = METRICS[name]
+        metric_conditions = []
+        if from_date:
+            metric_conditions.append(f"{date_field} >= %(from_{i})s")
+            values[f"from_{i}"] = from_date
+        if to_date:
+            metric_conditions.append(f"{date_field} <= %(to_{i})s")
+            values[f"to_{i}"] = to_date
+        if metric.get("accounts"):
+            metric_conditions.append(accounts[metric["accounts"]])
+        if metric.get("condition"):
+            metric_conditions.append(metric["condition"])
+
+        expression = metric["expression"]
+        if source["rollup"]:
+            expression = metric.get("rollup_expression", expression)
+        if metric_conditions:
+            expression = "CASE WHEN {0} THEN {1} END".format(" AND ".join(metric_conditions), expression)
+        columns.append(f"COALESCE(SUM({expression}), 0)")
+
+    row = frappe.db.sql("""
+        SELECT {columns}
+        FROM {table}
+        WHERE {conditions}
+    """.format(
+        columns=",\n            ".join(columns),
+        table=source["table"],
+        conditions=" AND ".join(conditions or ["1 = 1"])
+    ), values)[0]
+    return {name: cast_metric(name, value) for name, value in zip(metric_names, row)}
+
+
+def resolve_source(source_name):
+    """الجدول والشروط الفعلية للمصدر الآن (مع rollup = True عند استخدام جدول التجميع)"""
+    source = dict(METRIC_SOURCES[source_name])
+    if "resolve" in source:
+        resolved = source["resolve"]()
+        source.update(resolved, rollup=resolved["classified"])
+    elif "rollup" in source and is_rollup_ready():
+        source.update(source["rollup"], rollup=True)
+    else:
+        source["rollup"] = False
+    return source
+
+
+def cast_metric(name, value):
+    return TYPES[METRICS[name].get("type", "float")](value)
+
+
+def format_metric(name, value):
+    metric_format = METRICS[name].get("format")
+    if metric_format == "currency":
+        return format_currency(value)
+    return metric_format.format(value) if metric_format else value
+
+
+def get_metric_groups(names):
+    """مجموعات البيانات التي تعتمد عليها المؤشرات"""
+    return sorted({group for name in names for group in METRICS[name]["groups"]})
+
+
+def format_currency(amount):
+    """تنسيق العملة"""
+    try:
+        amount = flt(amount)
+        if amount >= 1000000:
+            return f"{amount/1000000:.1f}M"
+        elif amount >= 1000:
+            return f"{amount/1000:.1f}K"
+        else:
+            return f"{amount:.0f}"
+    except:
+        return "0"
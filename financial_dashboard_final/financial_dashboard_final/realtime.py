@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Realtime
+Notifies open dashboards over Frappe's socket.io when their metric groups change
+"""
+
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import cint
+from financial_dashboard_final.financial_dashboard_final.invalidation import (
+    DOCTYPE_GROUPS, DIRTY_SINCE_PREFIX, VERSION_PREFIX, get_group_versions
+)
+
+REALTIME_EVENT = "financial_dashboard_update"
+
+# المجموعة -> إصدارها وقت أول حدث لم يُنشر بعد
+PENDING_GROUPS_KEY = "financial_dashboard:realtime_pending_groups"
+
+
+def queue_push(doc, method=None):
+    """doc_event: تسجيل المجموعات المتأثرة بعد الاعتماد لتنشرها المهمة المجدولة"""
+    groups = DOCTYPE_GROUPS.get(doc.doctype)
+    if groups:
+        frappe.db.after_commit.add(lambda: schedule_push(groups))
+
+
+def schedule_push(groups):
+    """حفظ الإصدار الحالي لكل مجموعة متأثرة (أول حدث فقط في كل دفعة)"""
+    cache = frappe.cache()
+    versions = cache.mget([cache.make_key(f"{VERSION_PREFIX}:{group}") for group in groups])
+    for group, version in zip(groups, versions):
+        if cache.hget(PENDING_GROUPS_KEY, group) is None:
+            cache.hset(PENDING_GROUPS_KEY, group, cint(version))
+
+
+def push_dashboard_updates():
+    """مهمة مجدولة كل دقيقة: إبلاغ اللوحات بالمجموعات التي ارتفع إصدارها
+
+    get_group_versions وحدها ترفع الإصدار بعد هدوء الأحداث، فيصل الإشعار مع البيانات
+    الجديدة ولا تتجاوز الدفعات الكبيرة مهلة الإبطال. الرسالة لا تحمل قيماً: كل صفحة
+    تعيد طلب بياناتها بفلاتر شركتها.
+    """
+    cache = frappe.cache()
+    pending = {
+        (group.decode() if isinstance(group, bytes) else group): cint(version)
+        for group, version in cache.hgetall(PENDING_GROUPS_KEY).items()
+    }
+    if not pending:
+        return
+
+    groups = sorted(pending)
+    versions = dict(zip(groups, get_group_versions(groups)))
+    changed = [group for group in groups if versions[group] != pending[group]]
+    if not changed:
+        return
+
+    for group in changed:
+        cache.hdel(PENDING_GROUPS_KEY, group)
+        # أحداث وصلت بعد رفع الإصدار تنتظر الإصدار التالي (exists تضيف البادئة بنفسها)
+        if cache.exists(f"{DIRTY_SINCE_PREFIX}:{group}"):
+            cache.hset(PENDING_GROUPS_KEY, group, versions[group])
+
+    frappe.publish_realtime(REALTIME_EVENT, {"groups": changed})
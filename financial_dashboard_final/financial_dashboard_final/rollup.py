@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Rollup
+Materialized daily GL and Sales Invoice totals with incremental refresh
+"""
+
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import getdate, nowdate, add_days, add_months
+
+GL_ROLLUP_TABLE = "__dashboard_gl_daily"
+SALES_ROLLUP_TABLE = "__dashboard_sales_daily"
+
+DIRTY_DAYS_KEY = "financial_dashboard:rollup_dirty_days"
+READY_DEFAULT = "financial_dashboard_rollup_ready"
+
+# عدد الأشهر المعالجة في كل دفعة أثناء التعبئة الأولية
+BACKFILL_CHUNK_MONTHS = 1
+
+
+def ensure_rollup_tables():
+    """إنشاء جداول التجميع اليومي إذا لم تكن موجودة
+
+    الجداول مفهرسة بالشركة ومركز التكلفة والمشروع حتى تُقرأ لوحة كل شركة أو مركز
+    تكلفة من صفوفها فقط. الجداول القديمة بدون هذه الأبعاد تُحذف ويُلغى علم الجاهزية
+    فتُقرأ المؤشرات من الجداول الأصلية حتى إعادة التعبئة.
+    """
+    for table in (GL_ROLLUP_TABLE, SALES_ROLLUP_TABLE):
+        if table_exists(table) and not has_dimension_columns(table):
+            frappe.db.sql_ddl(f"DROP TABLE `{table}`")
+            frappe.db.set_default(READY_DEFAULT, "0")
+
+    frappe.db.sql_ddl("""
+        CREATE TABLE IF NOT EXISTS `{table}` (
+            `company` VARCHAR(140) NOT NULL,
+            `posting_date` DATE NOT NULL,
+            `account` VARCHAR(140) NOT NULL,
+            `cost_center` VARCHAR(140) NOT NULL DEFAULT '',
+            `project` VARCHAR(140) NOT NULL DEFAULT '',
+            `root_type` VARCHAR(140),
+            `account_type` VARCHAR(140),
+            `debit` DECIMAL(21, 9) NOT NULL DEFAULT 0,
+            `credit` DECIMAL(21, 9) NOT NULL DEFAULT 0,
+            PRIMARY KEY (`company`, `posting_date`, `account`, `cost_center`, `project`),
+            KEY `posting_date_type` (`posting_date`, `root_type`, `account_type`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """.format(table=GL_ROLLUP_TABLE))
+
+    frappe.db.sql_ddl("""
+        CREATE TABLE IF NOT EXISTS `{table}` (
+            `company` VARCHAR(140) NOT NULL,
+            `posting_date` DATE NOT NULL,
+            `cost_center` VARCHAR(140) NOT NULL DEFAULT '',
+            `project` VARCHAR(140) NOT NULL DEFAULT '',
+            `invoice_count` INT NOT NULL DEFAULT 0,
+            `grand_total` DECIMAL(21, 9) NOT NULL DEFAULT 0,
+            PRIMARY KEY (`company`, `posting_date`, `cost_center`, `project`),
+            KEY `posting_date` (`posting_date`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """.format(table=SALES_ROLLUP_TABLE))
+
+
+def table_exists(table):
+    return bool(frappe.db.sql("SHOW TABLES LIKE %s", table))
+
+
+def has_dimension_columns(table):
+    return bool(frappe.db.sql(f"SHOW COLUMNS FROM `{table}` LIKE 'cost_center'"))
+
+
+def is_rollup_ready():
+    """هل اكتملت التعبئة الأولية ويمكن القراءة من جداول التجميع"""
+    return frappe.db.get_default(READY_DEFAULT) == "1"
+
+
+def refresh_days(from_date, to_date=None):
+    """إعادة حساب صفوف التجميع لأيام محددة من الجداول الأصلية"""
+    values = {"from_date": getdate(from_date), "to_date": getdate(to_date or from_date)}
+
+    frappe.db.sql("""
+        DELETE FROM `{table}`
+        WHERE posting_date BETWEEN %(from_date)s AND %(to_date)s
+    """.format(table=GL_ROLLUP_TABLE), values)
+
+    frappe.db.sql("""
+        INSERT INTO `{table}`
+            (company, posting_date, account, cost_center, project, root_type, account_type, debit, credit)
+        SELECT
+            gle.company, gle.posting_date, gle.account,
+            IFNULL(gle.cost_center, ''), IFNULL(gle.project, ''),
+            acc.root_type, acc.account_type,
+            SUM(gle.debit), SUM(gle.credit)
+        FROM `tabGL Entry` gle
+        INNER JOIN `tabAccount` acc ON acc.name = gle.account
+        WHERE gle.posting_date BETWEEN %(from_date)s AND %(to_date)s
+        AND gle.is_cancelled = 0
+        GROUP BY gle.company, gle.posting_date, gle.account,
+            IFNULL(gle.cost_center, ''), IFNULL(gle.project, ''),
+            acc.root_type, acc.account_type
+    """.format(table=GL_ROLLUP_TABLE), values)
+
+    frappe.db.sql("""
+        DELETE FROM `{table}`
+        WHERE posting_date BETWEEN %(from_date)s AND %(to_date)s
+    """.format(table=SALES_ROLLUP_TABLE), values)
+
+    frappe.db.sql("""
+        INSERT INTO `{table}`
+            (company, posting_date, cost_center, project, invoice_count, grand_total)
+        SELECT
+            company, posting_date, IFNULL(cost_center, ''), IFNULL(project, ''),
+            COUNT(*), SUM(grand_total)
+        FROM `tabSales Invoice`
+        WHERE posting_date BETWEEN %(from_date)s AND %(to_date)s
+        AND docstatus = 1
+        GROUP BY company, posting_date, IFNULL(cost_center, ''), IFNULL(project, '')
+    """.format(table=SALES_ROLLUP_TABLE), values)
+
+
+def mark_day_dirty(doc, method=None):
+    """doc_event: تسجيل يوم المستند لإعادة تجميعه في المهمة المجدولة"""
+    posting_date = doc.get("posting_date")
+    if posting_date:
+        # بعد الاعتماد فقط حتى لا تسبق المهمة المجدولة كتابة القيود
+        day = str(getdate(posting_date))
+        frappe.db.after_commit.add(lambda: frappe.cache().sadd(DIRTY_DAYS_KEY, day))
+
+
+def process_dirty_days():
+    """مهمة مجدولة: تحديث الأيام المتأثرة بالمستندات المعتمدة أو الملغاة"""
+    if not is_rollup_ready():
+        return
+
+    dirty_days = {day.decode() if isinstance(day, bytes) else day
+                  for day in frappe.cache().smembers(DIRTY_DAYS_KEY)}
+    dirty_days.add(str(getdate(nowdate())))
+
+    for day in sorted(dirty_days):
+        # الإزالة قبل التحديث: مستند يُعتمد أثناء التحديث يعيد إضافة اليوم فلا يضيع
+        frappe.cache().srem(DIRTY_DAYS_KEY, day)
+        try:
+            refresh_days(day)
+            frappe.db.commit()
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.cache().sadd(DIRTY_DAYS_KEY, day)
+            frappe.log_error(f"Dashboard rollup refresh failed for {day}: {str(e)}")
+
+
+def backfill(from_date=None, to_date=None):
+    """تعبئة جداول التجميع من كامل التاريخ المحاسبي على دفعات شهرية"""
+    ensure_rollup_tables()
+
+    if not from_date:
+        from_date = frappe.db.sql("SELECT MIN(posting_date) FROM `tabGL Entry`")[0][0]
+    to_date = getdate(to_date or nowdate())
+    if not from_date:
+        frappe.db.set_default(READY_DEFAULT, "1")
+        frappe.db.commit()
+        return
+
+    chunk_start = getdate(from_date)
+    while chunk_start <= to_date:
+        chunk_end = min(add_days(add_months(chunk_start, BACKFILL_CHUNK_MONTHS), -1), to_date)
+        refresh_days(chunk_start, chunk_end)
+        frappe.db.commit()
+        print(f"✅ تم تجميع الفترة {chunk_start} - {chunk_end}")
+        chunk_start = add_days(chunk_end, 1)
+
+    frappe.db.set_default(READY_DEFAULT, "1")
+    frappe.db.commit()
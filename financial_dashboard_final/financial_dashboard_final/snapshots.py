@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Snapshots
+Pre-warmed dashboard payloads built by background workers
+"""
+
+from __future__ import unicode_literals
+import time
+import inspect
+from datetime import datetime
+import frappe
+from frappe.utils import cint
+from financial_dashboard_final.financial_dashboard_final.realtime import REALTIME_EVENT
+
+SNAPSHOT_PREFIX = "financial_dashboard:snapshot"
+SCHEDULE_KEY = "financial_dashboard:snapshot_scheduled"
+BUILDING_PREFIX = "financial_dashboard:snapshot_building"
+# بصمة الأدوار -> آخر مستخدم طلب لقطة بها، لتبني المهمة المجدولة بنفس الصلاحيات
+ROLE_USERS_KEY = "financial_dashboard:snapshot_role_users"
+
+# لوحات التحكم الأربع + صفحة /dashboard القديمة
+SNAPSHOT_ENDPOINTS = [
+    "get_financial_overview",
+    "get_sales_analytics",
+    "get_inventory_analytics",
+    "get_advanced_analytics",
+    "get_dashboard_data",
+]
+
+# الفاصل الافتراضي بين كل تحديث للقطات (دقائق) - قابل للتغيير من site_config
+DEFAULT_INTERVAL = 10
+
+
+def schedule_snapshots():
+    """مهمة مجدولة: إطلاق بناء اللقطات لكل شركة ولكل بصمة أدوار طُلبت حسب الفاصل المحدد"""
+    interval = cint(frappe.conf.get("financial_dashboard_snapshot_interval")) or DEFAULT_INTERVAL
+    cache = frappe.cache()
+    if not cache.set(cache.make_key(SCHEDULE_KEY), 1, ex=interval * 60, nx=True):
+        return
+
+    users = set((cache.hgetall(ROLE_USERS_KEY) or {}).values())
+    for user in users:
+        for company in [None] + frappe.get_all("Company", pluck="name"):
+            frappe.enqueue(
+                "financial_dashboard_final.financial_dashboard_final.snapshots.build_snapshots",
+                queue="long",
+                company=company,
+                user=user
+            )
+
+
+def build_snapshots(company=None, user=None):
+    """بناء لقطات جميع لوحات التحكم لشركة واحدة (أو لكل الشركات إذا None)"""
+    for endpoint in SNAPSHOT_ENDPOINTS:
+        try:
+            build_snapshot(endpoint, company, user)
+        except Exception as e:
+            frappe.log_error(f"Dashboard snapshot {endpoint} failed: {str(e)}")
+
+
+def build_snapshot(endpoint, company=None, user=None, notify=False):
+    """حساب endpoint بدون الذاكرة المؤقتة وحفظ النتيجة كلقطة لبصمة أدوار user
+
+    notify: إبلاغ الصفحات المفتوحة بعد استبدال لقطة قديمة قُدمت لها حتى تعيد الطلب.
+    """
+    from financial_dashboard_final.financial_dashboard_final import api
+    from financial_dashboard_final.financial_dashboard_final.cache import (
+        is_cacheable, get_group_version_string, get_permission_hash
+    )
+
+    endpoint_fn = getattr(api, endpoint)
+    compute = endpoint_fn.compute
+    if company and "company" not in inspect.signature(compute).parameters:
+        return
+
+    # الحساب بصلاحيات المستخدم الذي طلب اللقطة لا بصلاحيات مستخدم المهمة
+    if user and user != frappe.session.user:
+        frappe.set_user(user)
+    permission_hash = get_permission_hash()
+
+    cache = frappe.cache()
+    group_versions = get_group_version_string(endpoint_fn.cache_groups)
+    payload = compute(company=company) if company else compute()
+    if is_cacheable(payload):
+        cache.set_value(get_snapshot_key(endpoint, company, permission_hash), {
+            "payload": payload,
+            "computed_at": time.time(),
+            "group_versions": group_versions
+        })
+        if notify:
+            frappe.publish_realtime(REALTIME_EVENT, {"groups": endpoint_fn.cache_groups or []})
+
+    cache.delete(cache.make_key(get_building_key(endpoint, company, permission_hash)))
+
+
+def get_snapshot(endpoint, company=None, group_versions=None):
+    """أحدث لقطة لأدوار المستخدم الحالي مع وقت بنائها (as_of) وعمرها بالثواني
+
+    لا تنتظر الحساب أبداً: إذا تغيرت البيانات بعد بناء اللقطة تُقدم كما هي مع as_of
+    وتُطلب إعادة بنائها في الخلفية، ثم يُبلغ الحدث الفوري الصفحات بالنسخة الجديدة.
+    بدون لقطة لهذه الأدوار تُرجع None (يحسب dashboard_cache النتيجة) وتُطلب لقطة للمرات التالية.
+    """
+    from financial_dashboard_final.financial_dashboard_final.cache import get_permission_hash
+
+    permission_hash = get_permission_hash()
+    snapshot = frappe.cache().get_value(get_snapshot_key(endpoint, company, permission_hash))
+    if not snapshot:
+        request_rebuild(endpoint, company, permission_hash)
+        return None
+
+    stale = group_versions is not None and snapshot["group_versions"] != group_versions
+    if stale:
+        request_rebuild(endpoint, company, permission_hash, notify=True)
+
+    payload = dict(snapshot["payload"])
+    payload["as_of"] = datetime.fromtimestamp(snapshot["computed_at"]).isoformat()
+    payload["snapshot_age"] = int(time.time() - snapshot["computed_at"])
+    if stale:
+        payload["stale"] = 1
+    return payload
+
+
+def request_rebuild(endpoint, company=None, permission_hash=None, notify=False):
+    """إطلاق مهمة واحدة فقط لإعادة بناء اللقطة مهما تعددت الطلبات"""
+    cache = frappe.cache()
+    cache.hset(ROLE_USERS_KEY, permission_hash, frappe.session.user)
+    if cache.set(cache.make_key(get_building_key(endpoint, company, permission_hash)), 1, ex=300, nx=True):
+        frappe.enqueue(
+            "financial_dashboard_final.financial_dashboard_final.snapshots.build_snapshot",
+            queue="long",
+            endpoint=endpoint,
+            company=company,
+            user=frappe.session.user,
+            notify=notify
+        )
+
+
+def get_snapshot_key(endpoint, company=None, permission_hash=None):
+    return f"{SNAPSHOT_PREFIX}:{endpoint}:{company or ''}:{permission_hash or ''}"
+
+
+def get_building_key(endpoint, company=None, permission_hash=None):
+    return f"{BUILDING_PREFIX}:{endpoint}:{company or ''}:{permission_hash or ''}"
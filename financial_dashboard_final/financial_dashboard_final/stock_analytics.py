@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Stock Analytics
+Monthly stock movement, top sellers and turnover from grouped Stock Ledger passes
+"""
+
+from __future__ import unicode_literals
+from collections import namedtuple
+import frappe
+from frappe.utils import flt, getdate, nowdate
+from financial_dashboard_final.financial_dashboard_final.aggregates import (
+    get_bucket_ranges, get_dashboard_filters, get_filters_key, get_dimension_conditions, _get_request_cache
+)
+from financial_dashboard_final.financial_dashboard_final.inventory import get_stock_valuation
+
+# المستندات التي يمثل خروج المخزون فيها مبيعات (تكلفة البضاعة المباعة)
+SALES_VOUCHERS = ("Sales Invoice", "Delivery Note")
+
+# أبعاد التصفية الموجودة في Stock Ledger Entry (لا يحمل مركز التكلفة)
+SLE_DIMENSIONS = ("company", "project")
+
+StockMovement = namedtuple("StockMovement", [
+    "from_date", "to_date", "inbound", "outbound", "cogs", "value_change"
+])
+
+
+def get_stock_movement_series(periods=12, to_date=None, filters=None):
+    """الكميات الواردة والصادرة وتكلفة المبيعات وتغير قيمة المخزون لكل شهر من استعلام GROUP BY واحد"""
+    key = ("stock_movement", int(periods), str(to_date or ""), get_filters_key(filters))
+    cache = _get_request_cache()
+    if key not in cache:
+        cache[key] = _query_stock_movement(int(periods), getdate(to_date or nowdate()), filters)
+    return cache[key]
+
+
+def _query_stock_movement(periods, to_date, filters=None):
+    ranges = get_bucket_ranges(periods, "month", to_date, include_current=True)
+    values = {
+        "from_date": ranges[0][0],
+        "to_date": ranges[-1][1],
+        "sales_vouchers": SALES_VOUCHERS
+    }
+    conditions = ["posting_date BETWEEN %(from_date)s AND %(to_date)s", "is_cancelled = 0"]
+    conditions += get_dimension_conditions(filters, values, dimensions=SLE_DIMENSIONS)
+
+    rows = frappe.db.sql("""
+        SELECT
+            YEAR(posting_date) * 100 + MONTH(posting_date) AS bucket,
+            COALESCE(SUM(CASE WHEN actual_qty > 0 THEN actual_qty END), 0),
+            COALESCE(SUM(CASE WHEN actual_qty < 0 THEN -actual_qty END), 0),
+            COALESCE(SUM(CASE WHEN actual_qty < 0 AND voucher_type IN %(sales_vouchers)s
+                THEN -stock_value_difference END), 0),
+            COALESCE(SUM(stock_value_difference), 0)
+        FROM `tabStock Ledger Entry`
+        WHERE {conditions}
+        GROUP BY bucket
+    """.format(conditions=" AND ".join(conditions)), values)
+
+    totals = {int(row[0]): row[1:] for row in rows}
+    series = []
+    for start, end, bucket_key in ranges:
+        inbound, outbound, cogs, value_change = totals.get(bucket_key, (0, 0, 0, 0))
+        series.append(StockMovement(start, end, flt(inbound), flt(outbound), flt(cogs), flt(value_change)))
+    return series
+
+
+def get_top_selling_items(limit=5, from_date=None, filters=None):
+    """أعلى الأصناف مبيعاً بالكمية منذ from_date (افتراضياً آخر 12 شهراً)"""
+    from_date = getdate(from_date) if from_date else get_bucket_ranges(12, "month", include_current=True)[0][0]
+    values = {"from_date": from_date, "sales_vouchers": SALES_VOUCHERS, "limit": int(limit)}
+    conditions = [
+        "sle.posting_date >= %(from_date)s",
+        "sle.is_cancelled = 0",
+        "sle.actual_qty < 0",
+        "sle.voucher_type IN %(sales_vouchers)s"
+    ] + get_dimension_conditions(filters, values, "sle", SLE_DIMENSIONS)
+    return frappe.db.sql("""
+        SELECT sle.item_code, i.item_name, SUM(-sle.actual_qty) AS qty
+        FROM `tabStock Ledger Entry` sle
+        INNER JOIN `tabItem` i ON i.name = sle.item_code
+        WHERE {conditions}
+        GROUP BY sle.item_code, i.item_name
+        ORDER BY qty DESC
+        LIMIT %(limit)s
+    """.format(conditions=" AND ".join(conditions)), values, as_dict=True)
+
+
+def get_stock_turnover(periods=12, filters=None):
+    """معدل دوران المخزون = تكلفة المبيعات ÷ متوسط قيمة المخزون لآخر periods شهراً
+
+    قيمة أول الفترة = القيمة الحالية − مجموع stock_value_difference داخل الفترة، من نفس
+    استعلام الحركة الشهرية بدلاً من البحث عن آخر قيد لكل صنف في كل الدفتر.
+    """
+    series = get_stock_movement_series(periods, filters=filters)
+    cogs = sum(month.cogs for month in series)
+
+    # قيمة المخزون تُصفى بالشركة فقط، فتغيرها يُقرأ بدون تصفية المشروع
+    value_series = series
+    if (filters or {}).get("project"):
+        value_series = get_stock_movement_series(
+            periods, filters=get_dashboard_filters((filters or {}).get("company"))
+        )
+
+    closing = get_stock_valuation(filters=filters).total
+    opening = closing - sum(month.value_change for month in value_series)
+    average_inventory = (opening + closing) / 2
+    return flt(cogs / average_inventory, 2) if average_inventory else 0
@@ -32,4 +32,103 @@ fixtures = [
 ]
 
 # Installation
-after_install = "financial_dashboard_final.install.after_install"
\ No newline at end of file
+after_install = "financial_dashboard_final.financial_dashboard_final.install.after_install"
+after_migrate = "financial_dashboard_final.financial_dashboard_final.install.after_migrate"
+
+# Document Events
+# - "*": أي مستند معتمد له posting_date يعيد تجميع يومه في جداول التجميع
+# - Account يبطل تصنيف الحسابات المخزن (accounts.py)
+# - باقي المستندات تعلّم مجموعات المؤشرات المتأثرة كمتغيرة لإبطال الذاكرة المؤقتة
+#   وتُبلغ اللوحات المفتوحة عبر socket.io بعد اعتماد التغيير
+doc_events = {
+    "*": {
+        "on_submit": [
+            "financial_dashboard_final.financial_dashboard_final.rollup.mark_day_dirty",
+            "financial_dashboard_final.financial_dashboard_final.columnar.mark_day_dirty"
+        ],
+        "on_cancel": [
+            "financial_dashboard_final.financial_dashboard_final.rollup.mark_day_dirty",
+            "financial_dashboard_final.financial_dashboard_final.columnar.mark_day_dirty"
+        ]
+    },
+    "Sales Invoice": {
+        "on_submit": [
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty",
+            "financial_dashboard_final.financial_dashboard_final.realtime.queue_push"
+        ],
+        "on_cancel": [
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty",
+            "financial_dashboard_final.financial_dashboard_final.realtime.queue_push"
+        ]
+    },
+    "GL Entry": {
+        "on_submit": [
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty",
+            "financial_dashboard_final.financial_dashboard_final.realtime.queue_push"
+        ],
+        "on_cancel": [
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty",
+            "financial_dashboard_final.financial_dashboard_final.realtime.queue_push"
+        ]
+    },
+    "Stock Ledger Entry": {
+        "on_submit": [
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty",
+            "financial_dashboard_final.financial_dashboard_final.realtime.queue_push",
+            "financial_dashboard_final.financial_dashboard_final.low_stock.on_stock_ledger_entry"
+        ],
+        "on_cancel": [
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty",
+            "financial_dashboard_final.financial_dashboard_final.realtime.queue_push",
+            "financial_dashboard_final.financial_dashboard_final.low_stock.on_stock_ledger_entry"
+        ]
+    },
+    "Stock Entry": {
+        "on_submit": [
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty",
+            "financial_dashboard_final.financial_dashboard_final.realtime.queue_push"
+        ],
+        "on_cancel": [
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty",
+            "financial_dashboard_final.financial_dashboard_final.realtime.queue_push"
+        ]
+    },
+    "Bin": {
+        "on_update": [
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty",
+            "financial_dashboard_final.financial_dashboard_final.realtime.queue_push",
+            "financial_dashboard_final.financial_dashboard_final.low_stock.on_bin_update"
+        ]
+    },
+    "Account": {
+        "on_update": [
+            "financial_dashboard_final.financial_dashboard_final.accounts.on_account_change",
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty"
+        ],
+        "on_trash": [
+            "financial_dashboard_final.financial_dashboard_final.accounts.on_account_change",
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty"
+        ],
+        "after_rename": [
+            "financial_dashboard_final.financial_dashboard_final.accounts.on_account_change",
+            "financial_dashboard_final.financial_dashboard_final.invalidation.mark_dirty"
+        ]
+    }
+}
+
+# Scheduled Tasks
+scheduler_events = {
+    "all": [
+        "financial_dashboard_final.financial_dashboard_final.rollup.process_dirty_days"
+    ],
+    "daily": [
+        "financial_dashboard_final.financial_dashboard_final.low_stock.rebuild_index",
+        "financial_dashboard_final.financial_dashboard_final.columnar.schedule_export"
+    ],
+    "cron": {
+        "* * * * *": [
+            "financial_dashboard_final.financial_dashboard_final.snapshots.schedule_snapshots",
+            "financial_dashboard_final.financial_dashboard_final.realtime.push_dashboard_updates"
+        ]
+    }
+}
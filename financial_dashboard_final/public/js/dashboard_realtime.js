@@ -0,0 +1,54 @@
+// تحديثات لوحات التحكم: أحداث الخادم الفورية مع استعلام دوري احتياطي
+//
+// subscribeToDashboardUpdates({
+//     groups: ['sales'],              // مجموعات المؤشرات التي تعيد تحميل الصفحة
+//     load: loadSalesAnalytics,       // دالة تحميل بيانات الصفحة
+//     pollInterval: 5 * 60 * 1000,    // الاستعلام الدوري بدون اتصال فوري
+//     events: {event: handler}        // أحداث إضافية خاصة بالصفحة
+// });
+(function () {
+    const DEFAULT_POLL_INTERVAL = 5 * 60 * 1000;
+    // أثناء الاتصال يبقى استعلام بطيء: مستخدمو الموقع (Website User) لا ينضمون لغرفة
+    // الموقع فلا تصلهم الأحداث رغم نجاح الاتصال
+    const CONNECTED_POLL_INTERVAL = 30 * 60 * 1000;
+
+    window.subscribeToDashboardUpdates = function (options) {
+        const groups = options.groups || [];
+        const load = options.load;
+        const pollInterval = options.pollInterval || DEFAULT_POLL_INTERVAL;
+        const connectedPollInterval = Math.max(options.connectedPollInterval || CONNECTED_POLL_INTERVAL, pollInterval);
+
+        let pollTimer = null;
+        function poll(interval) {
+            clearInterval(pollTimer);
+            pollTimer = setInterval(load, interval);
+        }
+
+        poll(pollInterval);
+        if (typeof io === 'undefined') return null;
+
+        const socket = io(window.location.origin + '/' + window.location.hostname, {
+            withCredentials: true,
+            reconnectionAttempts: 5
+        });
+        let disconnected = false;
+        socket.on('connect', () => {
+            poll(connectedPollInterval);
+            if (disconnected) {
+                // تغييرات فاتت أثناء الانقطاع
+                load();
+            }
+        });
+        socket.on('disconnect', () => {
+            disconnected = true;
+            poll(pollInterval);
+        });
+        socket.on('financial_dashboard_update', (message) => {
+            if (message.groups.some(group => groups.includes(group))) {
+                load();
+            }
+        });
+        Object.entries(options.events || {}).forEach(([event, handler]) => socket.on(event, handler));
+        return socket;
+    };
+})();
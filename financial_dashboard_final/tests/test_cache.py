@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Tests - Cache
+Which endpoint results may be stored in the shared cache
+"""
+
+from __future__ import unicode_literals
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from financial_dashboard_final.financial_dashboard_final.cache import dashboard_cache, is_cacheable
+from financial_dashboard_final.financial_dashboard_final.instrumentation import fallback
+
+
+class TestIsCacheable(FrappeTestCase):
+    def test_success_is_cacheable(self):
+        self.assertTrue(is_cacheable({"status": "success", "metrics": {}}))
+        # بدون status تُعامل النتيجة كنجاح
+        self.assertTrue(is_cacheable({"metrics": {}}))
+
+    def test_errors_and_fallbacks_are_not_cacheable(self):
+        for result in (
+            None,
+            [],
+            {"status": "error", "message": "boom"},
+            {"status": "success", "note": "بيانات احتياطية"},
+            {"status": "success", "degraded": ["metrics"]},
+        ):
+            with self.subTest(result=result):
+                self.assertFalse(is_cacheable(result))
+
+    def test_empty_degraded_is_cacheable(self):
+        self.assertTrue(is_cacheable({"status": "success", "degraded": []}))
+
+    def test_helper_fallback_marks_result_degraded(self):
+        # دالة داخلية قدمت بيانات احتياطية ومعالجة الخطأ تمت داخلها، فالنتيجة تبدو ناجحة
+        @dashboard_cache(ttl=60)
+        def endpoint():
+            return {"status": "success", "value": fallback("test_helper", 0, Exception("boom"))}
+
+        frappe.local.dashboard_fallbacks = []
+        result = endpoint.compute()
+        self.assertEqual(result["degraded"], ["test_helper"])
+        self.assertFalse(is_cacheable(result))
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Tests - Period Comparison
+Current and comparison windows for MTD/QTD/YTD/custom periods
+"""
+
+from __future__ import unicode_literals
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import getdate
+from financial_dashboard_final.financial_dashboard_final.comparison import get_comparison_windows
+
+
+def window(from_date, to_date):
+    return getdate(from_date), getdate(to_date)
+
+
+class TestComparisonWindows(FrappeTestCase):
+    def test_mtd_previous_period(self):
+        current, previous = get_comparison_windows("mtd", to_date="2025-06-15")
+        self.assertEqual(current, window("2025-06-01", "2025-06-15"))
+        self.assertEqual(previous, window("2025-05-01", "2025-05-15"))
+
+    def test_mtd_previous_period_clamps_month_end(self):
+        current, previous = get_comparison_windows("mtd", to_date="2025-03-31")
+        self.assertEqual(current, window("2025-03-01", "2025-03-31"))
+        self.assertEqual(previous, window("2025-02-01", "2025-02-28"))
+
+    def test_qtd_previous_period(self):
+        current, previous = get_comparison_windows("qtd", to_date="2025-05-20")
+        self.assertEqual(current, window("2025-04-01", "2025-05-20"))
+        self.assertEqual(previous, window("2025-01-01", "2025-02-20"))
+
+    def test_ytd_same_period_last_year(self):
+        current, previous = get_comparison_windows("ytd", "same_period_last_year", to_date="2024-02-29")
+        self.assertEqual(current, window("2024-01-01", "2024-02-29"))
+        self.assertEqual(previous, window("2023-01-01", "2023-02-28"))
+
+    def test_custom_previous_period_has_same_length(self):
+        current, previous = get_comparison_windows("custom", from_date="2025-01-10", to_date="2025-01-19")
+        self.assertEqual(current, window("2025-01-10", "2025-01-19"))
+        # الأيام العشرة السابقة مباشرة لبداية الفترة
+        self.assertEqual(previous, window("2024-12-31", "2025-01-09"))
+
+    def test_invalid_arguments(self):
+        for kwargs in (
+            {"period": "weekly"},
+            {"compare": "next_year"},
+            {"period": "custom", "to_date": "2025-01-19"},
+            {"period": "custom", "from_date": "2025-02-01", "to_date": "2025-01-19"},
+        ):
+            with self.subTest(**kwargs), self.assertRaises(frappe.ValidationError):
+                get_comparison_windows(**kwargs)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Tests - Low Stock Index
+Add/update/remove transitions of (item, warehouse) pairs and their counts
+"""
+
+from __future__ import unicode_literals
+from unittest.mock import patch
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from financial_dashboard_final.financial_dashboard_final import low_stock
+
+ITEM = "_Test Dashboard Low Stock Item"
+WAREHOUSES = ("_Test Dashboard Store 1", "_Test Dashboard Store 2")
+COMPANY = "_Test Dashboard Company"
+
+
+class TestLowStockTransitions(FrappeTestCase):
+    def setUp(self):
+        low_stock.ensure_index()
+        # المستودعات التجريبية غير موجودة، فشركتها ثابتة
+        company = patch.object(frappe, "get_cached_value", return_value=COMPANY)
+        company.start()
+        self.addCleanup(company.stop)
+        self.alerts = []
+        publish = patch.object(frappe, "publish_realtime", side_effect=lambda event, message: self.alerts.append(message))
+        publish.start()
+        self.addCleanup(publish.stop)
+        self.addCleanup(self.clear)
+        self.clear()
+        self.alerts.clear()
+        self.total = low_stock.get_low_stock_item_count()
+
+    def clear(self):
+        for warehouse in WAREHOUSES:
+            low_stock.apply_bin(ITEM, warehouse, 100, 10)
+
+    def get_entry(self, warehouse):
+        return frappe.cache().hget(low_stock.ENTRIES_KEY, low_stock.get_entry_field(ITEM, warehouse))
+
+    def test_crossing_adds_entry_and_alerts_once(self):
+        low_stock.apply_bin(ITEM, WAREHOUSES[0], 5, 10)
+        entry = self.get_entry(WAREHOUSES[0])
+        self.assertEqual(entry["shortfall"], 5)
+        self.assertEqual(entry["company"], COMPANY)
+        self.assertEqual(low_stock.get_low_stock_item_count(), self.total + 1)
+        self.assertEqual(low_stock.get_low_stock_item_count(COMPANY), 1)
+        self.assertEqual(len(self.alerts), 1)
+        self.assertEqual(self.alerts[0]["company"], COMPANY)
+        self.assertEqual(self.alerts[0]["company_count"], 1)
+
+        # البقاء تحت الحد يحدث التفاصيل فقط: لا تنبيه جديد ولا تغيير في العدد أو وقت العبور
+        low_stock.apply_bin(ITEM, WAREHOUSES[0], 2, 10)
+        updated = self.get_entry(WAREHOUSES[0])
+        self.assertEqual(updated["shortfall"], 8)
+        self.assertEqual(updated["crossed_at"], entry["crossed_at"])
+        self.assertEqual(low_stock.get_low_stock_item_count(), self.total + 1)
+        self.assertEqual(len(self.alerts), 1)
+
+    def test_recovery_removes_entry(self):
+        low_stock.apply_bin(ITEM, WAREHOUSES[0], 5, 10)
+        low_stock.apply_bin(ITEM, WAREHOUSES[0], 11, 10)
+        self.assertIsNone(self.get_entry(WAREHOUSES[0]))
+        self.assertEqual(low_stock.get_low_stock_item_count(), self.total)
+        self.assertEqual(low_stock.get_low_stock_item_count(COMPANY), 0)
+
+    def test_item_counted_once_across_warehouses(self):
+        for warehouse in WAREHOUSES:
+            low_stock.apply_bin(ITEM, warehouse, 0, 10)
+        self.assertEqual(low_stock.get_low_stock_item_count(), self.total + 1)
+
+        # يبقى الصنف منخفضاً حتى يتعافى آخر مستودع له
+        low_stock.apply_bin(ITEM, WAREHOUSES[0], 50, 10)
+        self.assertEqual(low_stock.get_low_stock_item_count(), self.total + 1)
+        low_stock.apply_bin(ITEM, WAREHOUSES[1], 50, 10)
+        self.assertEqual(low_stock.get_low_stock_item_count(), self.total)
+
+    def test_no_reorder_level_is_never_low(self):
+        low_stock.apply_bin(ITEM, WAREHOUSES[0], 0, 0)
+        self.assertIsNone(self.get_entry(WAREHOUSES[0]))
+        self.assertEqual(self.alerts, [])
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Dashboard Tests - Sales
+Keyset pagination cursors
+"""
+
+from __future__ import unicode_literals
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import getdate
+from financial_dashboard_final.financial_dashboard_final.sales import encode_cursor, decode_cursor
+
+
+class TestInvoiceCursor(FrappeTestCase):
+    def test_round_trip(self):
+        cursor = encode_cursor(getdate("2025-06-15"), "ACC-SINV-2025-00042")
+        self.assertEqual(decode_cursor(cursor), (getdate("2025-06-15"), "ACC-SINV-2025-00042"))
+
+    def test_name_with_separator(self):
+        # الفاصل يُقسم مرة واحدة فقط، فلا يضيع جزء من اسم الفاتورة
+        cursor = encode_cursor("2025-01-31", "SINV|A|B")
+        self.assertEqual(decode_cursor(cursor), (getdate("2025-01-31"), "SINV|A|B"))
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor("2025-01-31", "SINV-????>>>")
+        self.assertFalse(set(cursor) & set("+/"))
+
+    def test_invalid_cursor(self):
+        for cursor in ("not-a-cursor", encode_cursor("not-a-date", "SINV-1")):
+            with self.assertRaises(frappe.ValidationError):
+                decode_cursor(cursor)